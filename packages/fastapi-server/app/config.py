@@ -14,20 +14,154 @@ class Settings(BaseSettings):
     # API settings
     API_PREFIX: str = "/api/v1"
     MAX_CONCURRENT_RENDERS: int = 2
+    # Queue workers per job type, so that videos cannot hold up stills (their sum should
+    # not exceed MAX_BROWSER_INSTANCES); both 0 = MAX_CONCURRENT_RENDERS workers shared by all jobs
+    MAX_CONCURRENT_STILLS: int = 0
+    MAX_CONCURRENT_MEDIA: int = 0
+    # Idle workers of one pool take jobs queued for the other
+    QUEUE_WORK_STEALING: bool = False
 
     # Storage settings
     OUTPUT_DIR: str = "./outputs"
     BASE_URL: str = "http://localhost:8000"
 
+    # Per-job working directory for frames and in-progress outputs (tmpfs).
+    # Jobs fall back to OUTPUT_DIR/.scratch when the reservation does not fit.
+    SCRATCH_DIR: str = "/dev/shm/remotion-scratch"  # empty = always on disk
+    SCRATCH_MAX_BYTES: int = 4 * 1024 ** 3  # 0 = limited by free space only
+    SCRATCH_RESERVE_MEDIA_BYTES: int = 1024 ** 3
+    SCRATCH_RESERVE_STILL_BYTES: int = 64 * 1024 ** 2
+
+    # How the renderer's Chrome reaches this server (bundle mirror, local assets)
+    LOCAL_BASE_URL: str = "http://127.0.0.1:8000"
+
+    # Local mirror of remote serve_url bundles
+    BUNDLE_MIRROR_ENABLED: bool = False
+    BUNDLE_MIRROR_DIR: str = "./cache/bundles"
+    BUNDLE_MIRROR_MAX_BYTES: int = 2 * 1024 ** 3
+    BUNDLE_MIRROR_REVALIDATE_SECONDS: int = 300
+
+    # Caching proxy for http(s) media URLs in input props (rewritten by the Node worker)
+    MEDIA_PROXY_ENABLED: bool = False
+    MEDIA_PROXY_DIR: str = "./cache/media"
+    MEDIA_PROXY_MAX_BYTES: int = 10 * 1024 ** 3
+    MEDIA_PROXY_REVALIDATE_SECONDS: int = 3600  # when the origin sends no Cache-Control max-age
+    MEDIA_PROXY_HOSTS: str = ""  # comma-separated hosts to proxy, empty = all
+
+    # Uploaded bundles (POST /api/v1/bundles)
+    BUNDLES_DIR: str = "./bundles"
+    BUNDLE_MAX_BYTES: int = 1024 ** 3  # extracted size
+    BUNDLE_UPLOAD_MAX_BYTES: int = 512 * 1024 ** 2  # archive size, checked before it is hashed or unpacked
+
+    # Uploaded assets, referenced as asset://<sha256> in input props
+    ASSETS_DIR: str = "./assets"
+    ASSET_MAX_BYTES: int = 2 * 1024 ** 3
+
+    # Composition metadata cache (skips selectComposition on a hit)
+    COMPOSITION_CACHE_ENABLED: bool = True
+    COMPOSITION_CACHE_DIR: str = "./cache/compositions"
+    COMPOSITION_CACHE_MAX_ENTRIES: int = 10000
+    COMPOSITION_CACHE_MAX_ENTRY_BYTES: int = 64 * 1024
+    COMPOSITION_CACHE_TTL_SECONDS: int = 3600  # serve_url bundles, uploaded bundles never expire
+
+    # Identical submissions while a render is queued or running attach to it
+    RENDER_COALESCING_ENABLED: bool = True
+
+    # Cache of render outputs of uploaded bundles by options hash (hardlinked into RESULT_CACHE_DIR)
+    RESULT_CACHE_ENABLED: bool = False
+    RESULT_CACHE_DIR: str = ""  # empty = OUTPUT_DIR/.results (same filesystem, for hardlinks)
+    RESULT_CACHE_MAX_BYTES: int = 20 * 1024 ** 3
+    RESULT_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600  # 0 = no age limit
+
+    # Cache of the segments of segmented renders (segment_frames) of uploaded bundles
+    SEGMENT_CACHE_DIR: str = ""  # empty = OUTPUT_DIR/.segments
+    SEGMENT_CACHE_MAX_BYTES: int = 20 * 1024 ** 3
+    SEGMENT_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600  # 0 = no age limit
+
+    # Synchronous still endpoint (GET /still/{composition}): dedicated warm workers and disk LRU
+    # Each dedicated worker keeps a Node process and Chrome running, 0 = share the render worker pool
+    STILL_WORKERS: int = 0
+    STILL_TIMEOUT_MS: int = 10_000
+    STILL_CACHE_DIR: str = ""  # empty = OUTPUT_DIR/.stills
+    STILL_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    STILL_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600  # 0 = no age limit
+    STILL_MAX_AGE_SECONDS: int = 3600  # Cache-Control max-age sent to clients and CDNs
+    # Stills of a serve_url, which may be redeployed: Cache-Control max-age and disk cache age
+    STILL_MUTABLE_MAX_AGE_SECONDS: int = 60
+
     # Browser pool settings
     MAX_BROWSER_INSTANCES: int = 3
     MAX_BROWSER_IDLE_SECONDS: int = 300
 
+    # Node worker pool settings (pool size is MAX_BROWSER_INSTANCES)
+    WORKER_MAX_JOBS: int = 50
+    WORKER_HEALTH_CHECK_SECONDS: int = 30
+    WORKER_STARTUP_TIMEOUT_SECONDS: int = 60
+
+    # Worker protocol: "msgpack" (if installed) or "json" frames
+    IPC_CODEC: str = "msgpack"
+    # Maximum progress updates per second sent by a worker for one job
+    PROGRESS_MAX_HZ: float = 4.0
+
+    # Input props larger than this (bytes of JSON) are written to a file
+    # under PROPS_DIR and passed to Node by path, 0 = always inline
+    INPUT_PROPS_INLINE_MAX_BYTES: int = 256 * 1024
+    PROPS_DIR: str = "./props"
+
     # Queue settings
     JOB_CLEANUP_HOURS: int = 24
 
+    # Scheduling of queued jobs (see scheduler.py): priority 0 (most urgent) to 9
+    QUEUE_PRIORITY_INTERACTIVE: int = 2  # default priority of interactive jobs
+    QUEUE_PRIORITY_BATCH: int = 5  # default priority of batch jobs
+    QUEUE_AGING_SECONDS: float = 30.0  # waiting this long makes up for one priority level
+    QUEUE_SJF_SECONDS_PER_FRAME: float = 0.0  # > 0 = shorter renders first within similar priorities
+    # Most urgent priority an API key (X-API-Key) may request, "key:level,key:level";
+    # requests without a listed key are capped at QUEUE_PRIORITY_CAP
+    QUEUE_PRIORITY_KEY_CAPS: str = ""
+    QUEUE_PRIORITY_CAP: int = 0
+
+    # Per-job renderer log (stderr) ring buffer
+    JOB_LOG_MAX_LINES: int = 1000
+    JOB_LOG_MAX_LINE_LENGTH: int = 4096
+    JOB_LOG_ERROR_TAIL_LINES: int = 20
+
+    # Frames covered by the Chrome trace of profiled renders (0 = whole render)
+    PROFILE_TRACE_FRAMES: int = 30
+
+    # Interval of /proc sampling of each job's process tree, 0 = disabled
+    RESOURCE_SAMPLE_SECONDS: float = 1.0
+
+    # Seconds between SIGTERM and SIGKILL when a running render is cancelled
+    CANCEL_GRACE_SECONDS: float = 5.0
+
+    # Default render deadlines, overridable per job (timeout_ms / stall_timeout_ms)
+    RENDER_TIMEOUT_MS: int = 1_800_000  # total time limit, 0 = unlimited
+    RENDER_STALL_TIMEOUT_MS: int = 120_000  # max time without progress, 0 = unlimited
+    WATCHDOG_INTERVAL_SECONDS: float = 1.0
+    COMPOSITIONS_TIMEOUT_MS: int = 120_000
+    # Composition listings: concurrent evaluations and cache of the results
+    COMPOSITIONS_MAX_CONCURRENT: int = 1
+    COMPOSITIONS_CACHE_TTL_SECONDS: int = 300  # serve_url bundles, uploaded bundles never expire
+    COMPOSITIONS_CACHE_MAX_ENTRIES: int = 1000
+
+    # Isolation of each job's Node/Chrome/FFmpeg tree by priority class (Linux).
+    # IONICE is "best-effort[:0-7]" or "idle", CPUS a CPU list such as "0-3" (empty = all)
+    ISOLATION_ENABLED: bool = False
+    INTERACTIVE_NICE: int = 0
+    INTERACTIVE_IONICE: str = "best-effort:0"
+    INTERACTIVE_CPUS: str = ""
+    INTERACTIVE_CPU_WEIGHT: int = 1000  # cgroup v2 cpu.weight (1-10000)
+    BATCH_NICE: int = 10
+    BATCH_IONICE: str = "idle"
+    BATCH_CPUS: str = ""
+    BATCH_CPU_WEIGHT: int = 50
+    # Delegated cgroup v2 directory for the per-class sub-groups (empty = no cgroups)
+    ISOLATION_CGROUP_ROOT: str = ""
+
     # Node.js settings
     NODE_PATH: str = "node"
+    NODE_BINARY: str = "node"  # Runs the precompiled node/dist/renderer.js
 
     class Config:
         env_file = ".env"
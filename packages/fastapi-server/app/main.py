@@ -6,33 +6,49 @@ from contextlib import asynccontextmanager
 import asyncio
 
 from .config import settings
-from .routes import renders, compositions, health
-from .services.queue import RenderQueue
+from .routes import renders, compositions, health, mirror, bundles, assets, stills, media_proxy as media_proxy_routes
+from .services.bundle_mirror import bundle_mirror
+from .services.media_proxy import media_proxy
+from .services.queue import get_queue
+from .services.scratch import scratch
+from .services.startup import startup
+from .services.stills import still_service
 from .services.storage import storage
+from .services.worker_pool import worker_pool
 
 
-# Global queue instance
-queue: RenderQueue
+async def warm_up_workers():
+    """Start the Node worker pool in the background"""
+    await worker_pool.start()
+    startup.mark("workers_ready")
+    # Still endpoint workers open their browsers before the first request
+    await still_service.start()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
-    global queue
-    queue = RenderQueue(max_concurrent=settings.MAX_CONCURRENT_RENDERS)
+    storage.ensure_output_dir()
+    scratch.clear()
+
+    queue = get_queue()
     await queue.start()
 
-    # Make queue available to routes
-    import app.routes.renders
-    app.routes.renders.render_queue = queue
+    # Warm up Node workers without delaying startup
+    warmup = asyncio.create_task(warm_up_workers())
 
-    storage.ensure_output_dir()
+    startup.mark("app_ready")
 
     yield
 
     # Shutdown
     await queue.stop()
+    warmup.cancel()
+    await worker_pool.stop()
+    await still_service.stop()
+    await bundle_mirror.cache.close()
+    await media_proxy.cache.close()
 
 
 # Create FastAPI app
@@ -43,6 +59,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+
+class StartupMiddleware:
+    """Record when the first HTTP request is accepted"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not startup.has("first_request"):
+            startup.mark("first_request")
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(StartupMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,12 +84,17 @@ app.add_middleware(
 )
 
 # Mount static files for outputs
-app.mount("/outputs", StaticFiles(directory=settings.OUTPUT_DIR), name="outputs")
+app.mount("/outputs", StaticFiles(directory=settings.OUTPUT_DIR, check_dir=False), name="outputs")
 
 # Include routers
 app.include_router(renders.router, prefix=settings.API_PREFIX, tags=["renders"])
 app.include_router(compositions.router, prefix=settings.API_PREFIX, tags=["compositions"])
 app.include_router(health.router, prefix=settings.API_PREFIX, tags=["health"])
+app.include_router(mirror.router, prefix=settings.API_PREFIX, tags=["mirror"])
+app.include_router(bundles.router, prefix=settings.API_PREFIX, tags=["bundles"])
+app.include_router(assets.router, prefix=settings.API_PREFIX, tags=["assets"])
+app.include_router(stills.router, prefix=settings.API_PREFIX, tags=["stills"])
+app.include_router(media_proxy_routes.router, prefix=settings.API_PREFIX, tags=["media-proxy"])
 
 
 # WebSocket for progress updates
@@ -67,7 +103,7 @@ async def job_progress(websocket: WebSocket, job_id: str):
     """WebSocket endpoint for real-time progress updates"""
     await websocket.accept()
 
-    job = queue.get_job(job_id)
+    job = get_queue().get_job(job_id)
     if not job:
         await websocket.close(code=1008, reason="Job not found")
         return
@@ -88,3 +124,6 @@ async def job_progress(websocket: WebSocket, job_id: str):
         pass
     finally:
         await websocket.close()
+
+
+startup.mark("app_imported")
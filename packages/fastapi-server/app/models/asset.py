@@ -0,0 +1,15 @@
+"""Asset-related data models"""
+from pydantic import BaseModel
+from typing import Optional
+
+
+class AssetResponse(BaseModel):
+    """A stored asset"""
+    asset_id: str
+    size: int
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+    created_at: Optional[str] = None
+    # Reference to use in input props, and the URL it is rewritten to
+    ref: str
+    url: str
@@ -0,0 +1,27 @@
+"""Bundle-related data models"""
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BundleResponse(BaseModel):
+    """An uploaded bundle"""
+    bundle_id: str
+    name: Optional[str] = None
+    version: Optional[int] = None
+    size: int
+    created_at: str
+    serve_url: str
+
+
+class BundleInfo(BaseModel):
+    """A stored bundle and the name@version labels pointing to it"""
+    bundle_id: str
+    size: int
+    created_at: str
+    serve_url: str
+    versions: List[str] = []
+
+
+class ListBundlesResponse(BaseModel):
+    """Response model for listing bundles"""
+    bundles: List[BundleInfo]
@@ -2,7 +2,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 
 class JobStatus(str, Enum):
@@ -22,6 +22,17 @@ class RenderProgress(BaseModel):
     stitch_stage: Optional[str] = None
 
 
+class ResourceUsage(BaseModel):
+    """CPU, memory and I/O used by a job's Node/Chrome/FFmpeg process tree"""
+    cpu_seconds: float
+    peak_rss_bytes: int
+    read_bytes: int
+    write_bytes: int
+    max_threads: int
+    max_processes: int
+    samples: int
+
+
 class JobStatusResponse(BaseModel):
     """Response model for job status"""
     job_id: str
@@ -34,6 +45,18 @@ class JobStatusResponse(BaseModel):
     output_path: Optional[str] = None
     error: Optional[str] = None
     render_progress: Optional[RenderProgress] = None
+    resources: Optional[ResourceUsage] = None
+    profile: Optional[Dict[str, str]] = None
+    cached: bool = False  # output taken from the result cache
+    priority: Optional[int] = None  # queue priority, 0 = most urgent
+    media_cache: Optional[Dict[str, Optional[float]]] = None  # media proxy requests of the job
+
+
+class JobLogsResponse(BaseModel):
+    """Response model for a job's renderer log"""
+    job_id: str
+    lines: List[str]
+    total: int
 
 
 class ListJobsResponse(BaseModel):
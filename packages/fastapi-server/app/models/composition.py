@@ -1,6 +1,7 @@
 """Composition-related data models"""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, Dict, Any
+from .render import BundleSource
 
 
 class Composition(BaseModel):
@@ -13,11 +14,14 @@ class Composition(BaseModel):
     default_output: Optional[Dict[str, Any]] = None
 
 
-class GetCompositionsRequest(BaseModel):
+class GetCompositionsRequest(BundleSource):
     """Request to get available compositions"""
-    serve_url: str = Field(..., description="URL to the Remotion bundle")
-    input_props: Optional[Dict[str, Any]] = Field(default=None, description="Input props to pass")
-    env_variables: Optional[Dict[str, str]] = Field(default=None, description="Environment variables")
+    model_config = ConfigDict(populate_by_name=True)
+
+    serve_url: Optional[str] = Field(default=None, description="URL to the Remotion bundle (or use bundle_id)", serialization_alias="serveUrl", validation_alias="serve_url")
+    bundle_id: Optional[str] = Field(default=None, description="Uploaded bundle: content hash, name or name@version")
+    input_props: Optional[Dict[str, Any]] = Field(default=None, description="Input props to pass", serialization_alias="inputProps", validation_alias="input_props")
+    env_variables: Optional[Dict[str, str]] = Field(default=None, description="Environment variables", serialization_alias="envVariables", validation_alias="env_variables")
 
 
 class GetCompositionsResponse(BaseModel):
@@ -1,6 +1,6 @@
 """Render-related data models"""
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional, Dict, Any, Tuple
 from enum import Enum
 
 
@@ -21,6 +21,22 @@ class VideoCodec(str, Enum):
     PRORES = "prores"
 
 
+class PriorityClass(str, Enum):
+    """Scheduling class of the render processes"""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+class BundleSource(BaseModel):
+    """Requests render either a hosted bundle (serve_url) or an uploaded one (bundle_id)"""
+
+    @model_validator(mode="after")
+    def check_bundle_source(self):
+        if (self.serve_url is None) == (self.bundle_id is None):
+            raise ValueError("Exactly one of serve_url and bundle_id is required")
+        return self
+
+
 class ChromiumOptions(BaseModel):
     """Options for Chromium browser"""
     model_config = ConfigDict(populate_by_name=True)
@@ -32,11 +48,12 @@ class ChromiumOptions(BaseModel):
     user_agent: Optional[str] = Field(default=None, serialization_alias="userAgent", validation_alias="user_agent")
 
 
-class RenderMediaRequest(BaseModel):
+class RenderMediaRequest(BundleSource):
     """Request to render a video"""
     model_config = ConfigDict(populate_by_name=True)
 
-    serve_url: str = Field(..., description="URL to the Remotion bundle", serialization_alias="serveUrl", validation_alias="serve_url")
+    serve_url: Optional[str] = Field(default=None, description="URL to the Remotion bundle (or use bundle_id)", serialization_alias="serveUrl", validation_alias="serve_url")
+    bundle_id: Optional[str] = Field(default=None, description="Uploaded bundle: content hash, name or name@version")
     composition: str = Field(..., description="Composition ID to render")
     input_props: Optional[Dict[str, Any]] = Field(default={}, description="Props to pass to composition", serialization_alias="inputProps", validation_alias="input_props")
     output_path: Optional[str] = Field(default=None, description="Output file path", serialization_alias="outputPath", validation_alias="output_path")
@@ -56,6 +73,15 @@ class RenderMediaRequest(BaseModel):
     fps: Optional[int] = Field(default=None, ge=1, le=144, description="Output FPS (lower = faster)")
     enforce_audio_track: Optional[bool] = Field(default=None, description="Enforce audio track in output", serialization_alias="enforceAudioTrack", validation_alias="enforce_audio_track")
     ffmpeg_craneflag: Optional[list[str]] = Field(default=None, description="FFmpeg crane flags for optimization", serialization_alias="ffmpegCraneflag", validation_alias="ffmpeg_craneflag")
+    # Segmented rendering: only segments whose props changed are rendered again
+    segment_frames: Optional[int] = Field(default=None, ge=1, description="Render in cached segments of this many frames", serialization_alias="segmentFrames", validation_alias="segment_frames")
+    prop_frame_ranges: Optional[Dict[str, Tuple[int, int]]] = Field(default=None, description="Frames [start, end] each top-level prop affects (other props affect all segments)", serialization_alias="propFrameRanges", validation_alias="prop_frame_ranges")
+    # Deadlines enforced by the queue watchdog
+    timeout_ms: Optional[int] = Field(default=None, ge=1, description="Fail the job if it runs longer than this (default: RENDER_TIMEOUT_MS)")
+    stall_timeout_ms: Optional[int] = Field(default=None, ge=1, description="Fail the job if it reports no progress for this long (default: RENDER_STALL_TIMEOUT_MS)")
+    priority_class: PriorityClass = Field(default=PriorityClass.BATCH, description="CPU/IO priority of the render processes")
+    priority: Optional[int] = Field(default=None, ge=0, le=9, description="Queue priority, 0 = most urgent (default by priority_class, capped per API key)")
+    profile: bool = Field(default=False, description="Capture a Node.js CPU profile and a Chrome trace, linked from the job status")
 
 
 class RenderMediaResponse(BaseModel):
@@ -65,11 +91,12 @@ class RenderMediaResponse(BaseModel):
     message: str
 
 
-class RenderStillRequest(BaseModel):
+class RenderStillRequest(BundleSource):
     """Request to render a still image"""
     model_config = ConfigDict(populate_by_name=True)
 
-    serve_url: str = Field(..., description="URL to the Remotion bundle", serialization_alias="serveUrl", validation_alias="serve_url")
+    serve_url: Optional[str] = Field(default=None, description="URL to the Remotion bundle (or use bundle_id)", serialization_alias="serveUrl", validation_alias="serve_url")
+    bundle_id: Optional[str] = Field(default=None, description="Uploaded bundle: content hash, name or name@version")
     composition: str = Field(..., description="Composition ID to render")
     input_props: Optional[Dict[str, Any]] = Field(default={}, description="Props to pass to composition", serialization_alias="inputProps", validation_alias="input_props")
     output_path: Optional[str] = Field(default=None, description="Output file path", serialization_alias="outputPath", validation_alias="output_path")
@@ -78,6 +105,12 @@ class RenderStillRequest(BaseModel):
     jpeg_quality: int = Field(default=80, ge=1, le=100, description="JPEG quality (1-100)", serialization_alias="jpegQuality", validation_alias="jpeg_quality")
     scale: float = Field(default=1.0, ge=0.1, le=10.0, description="Scale factor")
     overwrite: bool = Field(default=False, description="Overwrite existing output")
+    # Deadlines enforced by the queue watchdog
+    timeout_ms: Optional[int] = Field(default=None, ge=1, description="Fail the job if it runs longer than this (default: RENDER_TIMEOUT_MS)")
+    stall_timeout_ms: Optional[int] = Field(default=None, ge=1, description="Fail the job if it reports no progress for this long (default: RENDER_STALL_TIMEOUT_MS)")
+    priority_class: PriorityClass = Field(default=PriorityClass.INTERACTIVE, description="CPU/IO priority of the render processes")
+    priority: Optional[int] = Field(default=None, ge=0, le=9, description="Queue priority, 0 = most urgent (default by priority_class, capped per API key)")
+    profile: bool = Field(default=False, description="Capture a Node.js CPU profile and a Chrome trace, linked from the job status")
 
 
 class RenderStillResponse(BaseModel):
@@ -0,0 +1,57 @@
+"""Asset upload and hosting endpoints"""
+import mimetypes
+from fastapi import APIRouter, File, Header, HTTPException, UploadFile, status
+from typing import Optional
+from ..models.asset import AssetResponse
+from ..services.assets import ASSET_SCHEME, AssetError, asset_store
+from ..services.storage import storage
+
+router = APIRouter()
+
+# Assets are stored by content hash, a URL never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def asset_response(record: dict) -> AssetResponse:
+    return AssetResponse(
+        **record,
+        ref=f"{ASSET_SCHEME}{record['asset_id']}",
+        url=asset_store.url(record["asset_id"])
+    )
+
+
+@router.post("/assets", response_model=AssetResponse)
+async def upload_asset(file: UploadFile = File(...)):
+    """Upload an image, audio or video file, referenced as asset://<asset_id> in input props"""
+    try:
+        record = await asset_store.store(file)
+    except AssetError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    return asset_response(record)
+
+
+@router.get("/assets/{asset_id}/info", response_model=AssetResponse)
+async def asset_info(asset_id: str):
+    """Metadata of a stored asset"""
+    record = asset_store.info(asset_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found")
+
+    return asset_response(record)
+
+
+@router.get("/assets/{asset_id}")
+async def asset_file(asset_id: str, range: Optional[str] = Header(default=None)):
+    """Serve a stored asset (byte ranges supported)"""
+    record = asset_store.info(asset_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found")
+
+    media_type = record.get("content_type") or mimetypes.guess_type(record.get("filename") or "")[0]
+    return storage.file_response(
+        asset_store.path(asset_id),
+        range,
+        media_type=media_type,
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
@@ -0,0 +1,49 @@
+"""Bundle upload, registry and hosting endpoints"""
+import mimetypes
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import FileResponse
+from typing import Optional
+from ..models.bundle import BundleResponse, ListBundlesResponse
+from ..services.bundles import BundleError, BundleTooLarge, bundle_registry
+
+router = APIRouter()
+
+# Bundles are stored by content hash, a URL never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.post("/bundles", response_model=BundleResponse)
+async def upload_bundle(file: UploadFile = File(...), name: Optional[str] = Form(default=None)):
+    """Upload a zipped Remotion bundle, optionally as the next version of a name"""
+    if name and ("@" in name or "/" in name):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bundle names cannot contain '@' or '/'")
+
+    try:
+        record = await bundle_registry.store(file.file, name)
+    except BundleTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except BundleError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return BundleResponse(**record)
+
+
+@router.get("/bundles", response_model=ListBundlesResponse)
+async def list_bundles():
+    """List stored bundles and their versions"""
+    return ListBundlesResponse(bundles=bundle_registry.list())
+
+
+@router.get("/bundles/{bundle_id}/{path:path}")
+async def bundle_file(bundle_id: str, path: str):
+    """Serve a file of a stored bundle"""
+    root = bundle_registry.path(bundle_id).resolve()
+    file_path = (root / (path or "index.html")).resolve()
+    if len(bundle_id) != 64 or not file_path.is_relative_to(root) or not file_path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    return FileResponse(
+        file_path,
+        media_type=mimetypes.guess_type(file_path.name)[0],
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
@@ -1,84 +1,49 @@
 """Composition-related endpoints"""
-import os
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
 from ..models.composition import GetCompositionsRequest, GetCompositionsResponse
-from ..services.renderer import NodeRenderer
+from ..services.bundles import bundle_registry
+from ..services.composition_list import composition_lists
+from ..services.options import to_node_options
+from ..services.renderer import get_renderer
+from ..services.sources import resolve_assets, resolve_serve_url
 
 router = APIRouter()
-renderer = NodeRenderer()
-
-
-def to_camel_case(snake_str: str) -> str:
-    """Convert snake_case to camelCase"""
-    components = snake_str.split('_')
-    return components[0] + ''.join(x.title() for x in components[1:])
-
-
-def convert_dict_to_camel_case(data: dict) -> dict:
-    """Convert all keys in a dictionary from snake_case to camelCase"""
-    result = {}
-    for key, value in data.items():
-        camel_key = to_camel_case(key)
-        # Handle nested objects like chromium_options and input_props
-        if isinstance(value, dict):
-            result[camel_key] = convert_dict_to_camel_case(value)
-        else:
-            result[camel_key] = value
-    return result
-
-
-def transform_serve_url(serve_url: str) -> str:
-    """Transform localhost URLs to internal Docker service URLs
-
-    Only transform localhost URLs to allow local development.
-    Public URLs should be used as-is for production deployments.
-    """
-    # Get the internal frontend URL from environment
-    internal_frontend_url = os.getenv("REMOTION_FRONTEND_URL", "http://remotion-frontend:3000")
-
-    # Only transform localhost URLs for local development
-    # Public URLs will work with bundle mode
-    if "localhost" in serve_url or "127.0.0.1" in serve_url:
-        print(f"DEBUG: Transforming localhost URL {serve_url} to {internal_frontend_url}", flush=True)
-        return internal_frontend_url
-
-    print(f"DEBUG: Using URL as-is: {serve_url}", flush=True)
-    return serve_url
 
 
 @router.post("/compositions", response_model=GetCompositionsResponse)
-async def get_compositions(request: GetCompositionsRequest):
-    """Get available compositions from a Remotion bundle"""
+async def get_compositions(
+    request: GetCompositionsRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """Get available compositions from a Remotion bundle (cached, see composition_list)"""
     try:
-        options = request.model_dump(exclude_none=True)
+        # Known fields are renamed for Node.js, input props are passed through untouched
+        options = to_node_options(request, exclude=("bundle_id",))
 
-        # Transform localhost URLs to internal Docker service URLs
-        if "serve_url" in options:
-            original_url = options["serve_url"]
-            options["serve_url"] = transform_serve_url(original_url)
-            print(f"DEBUG: Transformed URL from {original_url} to {options['serve_url']}", flush=True)
+        # Uploaded bundle, or serve_url (localhost mapped to the Docker service, remote bundles mirrored)
+        options["serveUrl"] = await resolve_serve_url(request)
 
-        # Ensure inputProps is an object, not None
-        if "input_props" in options:
-            if options["input_props"] is None:
-                options["input_props"] = {}
+        # Uploaded assets are loaded from this server instead of their origin
+        resolve_assets(options)
 
-        # Ensure envVariables is an object, not None
-        if "env_variables" in options:
-            if options["env_variables"] is None:
-                options["env_variables"] = {}
+        print(f"DEBUG: Options to Node.js: {sorted(options)}", flush=True)
 
-        # Convert snake_case to camelCase for Node.js wrapper
-        options = convert_dict_to_camel_case(options)
-
-        # Debug log
-        print(f"DEBUG: Options to Node.js: {options}", flush=True)
-
-        comps = await renderer.get_compositions(options)
+        listing = await composition_lists.get(
+            options,
+            get_renderer().get_compositions,
+            immutable=bundle_registry.is_bundle_url(options["serveUrl"])
+        )
+        # Clients revalidate with If-None-Match and get a 304 while the listing is unchanged
+        headers = {"ETag": listing.etag, "Cache-Control": "no-cache"}
+        if if_none_match and listing.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
 
         # Map durationInFrames to duration_in_frames (Python naming)
         mapped_comps = []
-        for comp in comps:
+        for comp in listing.compositions:
             mapped_comps.append({
                 "id": comp.get("id"),
                 "width": comp.get("width"),
@@ -90,8 +55,10 @@ async def get_compositions(request: GetCompositionsRequest):
 
         return GetCompositionsResponse(
             compositions=mapped_comps,
-            serve_url=request.serve_url
+            serve_url=request.serve_url or options["serveUrl"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"ERROR: {str(e)}\n{traceback.format_exc()}", flush=True)
@@ -1,6 +1,7 @@
 """Health check endpoint"""
 from fastapi import APIRouter
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 
 router = APIRouter()
 
@@ -11,6 +12,57 @@ class HealthResponse(BaseModel):
     version: str
 
 
+class BrowserPoolStats(BaseModel):
+    """Shared Chromium browser pool statistics"""
+    max_instances: int
+    open: int
+    launches: int
+    reuses: int
+    evictions: int
+    crashes: int
+    idle_timeout_seconds: int
+
+
+class PoolStatsResponse(BaseModel):
+    """Node worker and browser pool statistics"""
+    size: int
+    running: bool
+    idle: int
+    busy: int
+    crashes: int
+    recycled: int
+    workers: List[Dict[str, Any]]
+    browsers: BrowserPoolStats
+
+
+class StartupReportResponse(BaseModel):
+    """Seconds from process start to each startup milestone"""
+    process_started_at: float
+    app_imported: Optional[float] = None
+    app_ready: Optional[float] = None
+    workers_ready: Optional[float] = None
+    first_request: Optional[float] = None
+    first_still_completed: Optional[float] = None
+
+
+class CompositionUsageStats(BaseModel):
+    """Resource usage of the finished jobs of one composition"""
+    jobs: int
+    cpu_seconds: float
+    avg_cpu_seconds: float
+    max_cpu_seconds: float
+    peak_rss_bytes: int
+    avg_peak_rss_bytes: int
+    read_bytes: int
+    write_bytes: int
+    max_threads: int
+
+
+class UsageReportResponse(BaseModel):
+    """Per-composition resource usage"""
+    compositions: Dict[str, CompositionUsageStats]
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -20,3 +72,35 @@ async def health_check():
         status="healthy",
         version=settings.VERSION
     )
+
+
+@router.get("/pool", response_model=PoolStatsResponse)
+async def pool_stats():
+    """Node worker and browser pool statistics"""
+    from ..services.worker_pool import worker_pool
+
+    return PoolStatsResponse(**worker_pool.stats())
+
+
+@router.get("/startup", response_model=StartupReportResponse)
+async def startup_report():
+    """Cold start report: time to first accepted request and first completed still"""
+    from ..services.startup import startup
+
+    return StartupReportResponse(**startup.report())
+
+
+@router.get("/usage", response_model=UsageReportResponse)
+async def usage_report():
+    """CPU, peak memory and I/O of finished jobs, aggregated per composition"""
+    from ..services.resources import composition_usage
+
+    return UsageReportResponse(compositions=composition_usage.report())
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Server metrics: counters, gauges and latency histograms"""
+    from ..services.metrics import metrics
+
+    return metrics.snapshot()
@@ -0,0 +1,35 @@
+"""Caching proxy for remote media, loaded by the renderer's Chrome"""
+import mimetypes
+from fastapi import APIRouter, Header, HTTPException, status
+from typing import Optional
+from ..services.http_cache import Uncacheable, UpstreamError
+from ..services.media_proxy import MediaProxyError, media_proxy
+from ..services.storage import storage
+
+router = APIRouter()
+
+
+@router.get("/media-proxy/{token}/{encoded}/{name:path}")
+async def proxied_media(token: str, encoded: str, name: str, range: Optional[str] = Header(default=None)):
+    """Serve a remote file from the media cache, fetching it on a miss"""
+    try:
+        entry = await media_proxy.fetch(token, encoded)
+    except Uncacheable as e:
+        # no-store / private: streamed from the origin, never written to disk
+        return await _passthrough(e.url, range)
+    except MediaProxyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except UpstreamError as e:
+        code = e.status_code if 400 <= e.status_code < 500 else status.HTTP_502_BAD_GATEWAY
+        raise HTTPException(status_code=code, detail=str(e))
+
+    media_type = entry.content_type or mimetypes.guess_type(name)[0]
+    return storage.file_response(media_proxy.cache.blob_path(entry), range, media_type=media_type)
+
+
+async def _passthrough(url: str, range_header: Optional[str]):
+    try:
+        return await media_proxy.cache.stream(url, range_header)
+    except UpstreamError as e:
+        code = e.status_code if 400 <= e.status_code < 500 else status.HTTP_502_BAD_GATEWAY
+        raise HTTPException(status_code=code, detail=str(e))
@@ -0,0 +1,33 @@
+"""Local mirror of remote bundles, loaded by the renderer's Chrome"""
+import mimetypes
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse
+from ..services.bundle_mirror import bundle_mirror
+from ..services.http_cache import Uncacheable, UpstreamError
+
+router = APIRouter()
+
+
+@router.get("/bundle-mirror/{key}/{path:path}")
+async def mirrored_bundle_file(key: str, path: str, request: Request):
+    """Serve a bundle file from the mirror cache, fetching it from the origin on a miss"""
+    if ".." in path.split("/"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid path")
+
+    try:
+        entry = await bundle_mirror.fetch(key, path, request.url.query)
+    except Uncacheable as e:
+        # no-store / private: streamed from the origin, never written to disk
+        try:
+            return await bundle_mirror.cache.stream(e.url, request.headers.get("range"))
+        except UpstreamError as error:
+            code = error.status_code if 400 <= error.status_code < 500 else status.HTTP_502_BAD_GATEWAY
+            raise HTTPException(status_code=code, detail=str(error))
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown bundle")
+    except UpstreamError as e:
+        code = e.status_code if 400 <= e.status_code < 500 else status.HTTP_502_BAD_GATEWAY
+        raise HTTPException(status_code=code, detail=str(e))
+
+    media_type = entry.content_type or mimetypes.guess_type(path or "index.html")[0]
+    return FileResponse(bundle_mirror.cache.blob_path(entry), media_type=media_type)
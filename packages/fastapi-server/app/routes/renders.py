@@ -1,98 +1,75 @@
 """Render-related endpoints"""
-import os
+import asyncio
 from fastapi import APIRouter, HTTPException, status, Request
 from typing import Optional
 from ..models.render import RenderMediaRequest, RenderMediaResponse, RenderStillRequest, RenderStillResponse
-from ..models.common import JobStatusResponse, ListJobsResponse, JobStatus, CancelJobResponse
-from ..services.queue import queue as render_queue
+from ..models.common import JobStatusResponse, ListJobsResponse, JobStatus, CancelJobResponse, JobLogsResponse
+from ..config import settings
+from ..services.options import to_node_options
+from ..services.props_store import encode_props, props_store
+from ..services.queue import get_queue
+from ..services.scheduler import resolve_priority
+from ..services.sources import resolve_assets, resolve_serve_url
 
 router = APIRouter()
 
 
-def to_camel_case(snake_str: str) -> str:
-    """Convert snake_case to camelCase"""
-    components = snake_str.split('_')
-    return components[0] + ''.join(x.title() for x in components[1:])
+async def externalize_input_props(options: dict) -> dict:
+    """Replace large inputProps with inputPropsPath, a file Node.js reads
 
-
-def convert_dict_to_camel_case(data: dict) -> dict:
-    """Convert all keys in a dictionary from snake_case to camelCase"""
-    result = {}
-    for key, value in data.items():
-        camel_key = to_camel_case(key)
-        # Handle nested objects like chromium_options and input_props
-        if isinstance(value, dict):
-            result[camel_key] = convert_dict_to_camel_case(value)
-        else:
-            result[camel_key] = value
-    return result
-
-
-def transform_serve_url(serve_url: str) -> str:
-    """Transform localhost URLs to internal Docker service URLs
-
-    Only transform localhost URLs to allow local development.
-    Public URLs should be used as-is for production deployments.
+    Props whose JSON is below INPUT_PROPS_INLINE_MAX_BYTES stay inline.
     """
-    # Get the internal frontend URL from environment
-    internal_frontend_url = os.getenv("REMOTION_FRONTEND_URL", "http://remotion-frontend:3000")
+    limit = settings.INPUT_PROPS_INLINE_MAX_BYTES
+    if not limit or not options.get("inputProps"):
+        return options
+    # Encoded once, off the event loop: measured here and written as is when too large
+    payload = await asyncio.to_thread(encode_props, options["inputProps"])
+    if len(payload) > limit:
+        options.pop("inputProps")
+        options["inputPropsPath"] = await props_store.put_encoded(payload)
+    return options
 
-    # Only transform localhost URLs for local development
-    # Public URLs will work with bundle mode
-    if "localhost" in serve_url or "127.0.0.1" in serve_url:
-        print(f"DEBUG: Transforming localhost URL {serve_url} to {internal_frontend_url}", flush=True)
-        return internal_frontend_url
 
-    print(f"DEBUG: Using URL as-is: {serve_url}", flush=True)
-    return serve_url
+# Handled by the server, not passed to Node.js
+SERVER_FIELDS = ("timeout_ms", "stall_timeout_ms", "priority_class", "priority", "bundle_id")
 
 
 @router.post("/render/media", response_model=RenderMediaResponse)
 async def render_media(req_request: Request, request: RenderMediaRequest):
     """Submit a video render job"""
     try:
-        # Debug: log raw request body
-        import json
-        body = await req_request.body()
-        print(f"DEBUG: Raw request body: {body.decode()}", flush=True)
-
-        options = request.model_dump(exclude_none=True)
-        print(f"DEBUG: After model_dump: {options}", flush=True)
-
-        # Transform localhost URLs to internal Docker service URLs
-        if "serve_url" in options:
-            original_url = options["serve_url"]
-            options["serve_url"] = transform_serve_url(original_url)
-            print(f"DEBUG: Transformed URL from {original_url} to {options['serve_url']}", flush=True)
+        # Known fields are renamed for Node.js, input props are passed through untouched
+        options = to_node_options(request, exclude=SERVER_FIELDS)
 
-        # Ensure inputProps is an object, not None
-        if "input_props" in options and options["input_props"] is None:
-            options["input_props"] = {}
+        # Uploaded bundle, or serve_url (localhost mapped to the Docker service, remote bundles mirrored)
+        options["serveUrl"] = await resolve_serve_url(request)
 
-        # Debug: log inputProps before conversion
-        print(f"DEBUG: input_props before conversion: {options.get('input_props')}", flush=True)
+        # Uploaded assets are loaded from this server instead of their origin
+        resolve_assets(options)
 
-        # Convert codec enum to value
-        if "codec" in options and hasattr(options["codec"], "value"):
-            options["codec"] = options["codec"].value
+        # Large props are handed to Node.js as a file instead of being copied inline
+        await externalize_input_props(options)
 
-        # Convert image_format enum to value
-        if "image_format" in options and hasattr(options["image_format"], "value"):
-            options["image_format"] = options["image_format"].value
-
-        # Convert snake_case to camelCase for Node.js wrapper
-        options = convert_dict_to_camel_case(options)
-
-        # Debug: log after conversion
-        print(f"DEBUG: inputProps after conversion: {options.get('inputProps')}", flush=True)
+        job_id = await get_queue().enqueue(
+            "media",
+            options,
+            request.timeout_ms,
+            request.stall_timeout_ms,
+            request.priority_class.value,
+            resolve_priority(request.priority, request.priority_class.value, req_request.headers.get("x-api-key"))
+        )
 
-        job_id = await render_queue.enqueue("media", options)
+        # Identical renders are answered from the result cache without being queued
+        if get_queue().get_job(job_id).cached:
+            return RenderMediaResponse(job_id=job_id, status="completed", message="Render result taken from cache")
 
         return RenderMediaResponse(
             job_id=job_id,
             status="queued",
             message="Render job queued successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -101,35 +78,41 @@ async def render_media(req_request: Request, request: RenderMediaRequest):
 
 
 @router.post("/render/still", response_model=RenderStillResponse)
-async def render_still(request: RenderStillRequest):
+async def render_still(req_request: Request, request: RenderStillRequest):
     """Submit a still image render job"""
     try:
-        options = request.model_dump(exclude_none=True)
+        # Known fields are renamed for Node.js, input props are passed through untouched
+        options = to_node_options(request, exclude=SERVER_FIELDS)
 
-        # Transform localhost URLs to internal Docker service URLs
-        if "serve_url" in options:
-            original_url = options["serve_url"]
-            options["serve_url"] = transform_serve_url(original_url)
-            print(f"DEBUG: Transformed URL from {original_url} to {options['serve_url']}", flush=True)
+        # Uploaded bundle, or serve_url (localhost mapped to the Docker service, remote bundles mirrored)
+        options["serveUrl"] = await resolve_serve_url(request)
 
-        # Ensure inputProps is an object, not None
-        if "input_props" in options and options["input_props"] is None:
-            options["input_props"] = {}
+        # Uploaded assets are loaded from this server instead of their origin
+        resolve_assets(options)
 
-        # Convert image_format enum to value
-        if "image_format" in options and hasattr(options["image_format"], "value"):
-            options["image_format"] = options["image_format"].value
+        # Large props are handed to Node.js as a file instead of being copied inline
+        await externalize_input_props(options)
 
-        # Convert snake_case to camelCase for Node.js wrapper
-        options = convert_dict_to_camel_case(options)
+        job_id = await get_queue().enqueue(
+            "still",
+            options,
+            request.timeout_ms,
+            request.stall_timeout_ms,
+            request.priority_class.value,
+            resolve_priority(request.priority, request.priority_class.value, req_request.headers.get("x-api-key"))
+        )
 
-        job_id = await render_queue.enqueue("still", options)
+        # Identical renders are answered from the result cache without being queued
+        if get_queue().get_job(job_id).cached:
+            return RenderStillResponse(job_id=job_id, status="completed", message="Render result taken from cache")
 
         return RenderStillResponse(
             job_id=job_id,
             status="queued",
             message="Still render job queued successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -140,7 +123,7 @@ async def render_still(request: RenderStillRequest):
 @router.get("/jobs/{job_id}", response_model=JobStatusResponse)
 async def get_job_status(job_id: str):
     """Get status of a render job"""
-    job = render_queue.get_job(job_id)
+    job = get_queue().get_job(job_id)
 
     if not job:
         raise HTTPException(
@@ -151,10 +134,32 @@ async def get_job_status(job_id: str):
     return JobStatusResponse(**job.to_dict())
 
 
+@router.get("/jobs/{job_id}/logs", response_model=JobLogsResponse)
+async def get_job_logs(job_id: str, tail: Optional[int] = None):
+    """Get the renderer output (stderr) captured for a job"""
+    job = get_queue().get_job(job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    lines = list(job.logs)
+    if tail is not None:
+        lines = lines[-tail:] if tail > 0 else []
+
+    return JobLogsResponse(
+        job_id=job_id,
+        lines=lines,
+        total=len(job.logs)
+    )
+
+
 @router.delete("/jobs/{job_id}", response_model=CancelJobResponse)
 async def cancel_job(job_id: str):
     """Cancel a render job"""
-    success = await render_queue.cancel(job_id)
+    success = await get_queue().cancel(job_id)
 
     if not success:
         raise HTTPException(
@@ -162,7 +167,7 @@ async def cancel_job(job_id: str):
             detail="Could not cancel job"
         )
 
-    job = render_queue.get_job(job_id)
+    job = get_queue().get_job(job_id)
     status = job.status if job else JobStatus.CANCELLED
 
     return CancelJobResponse(
@@ -179,7 +184,7 @@ async def list_jobs(
     offset: int = 0
 ):
     """List all render jobs"""
-    jobs, total = render_queue.list_jobs(status, limit, offset)
+    jobs, total = get_queue().list_jobs(status, limit, offset)
 
     return ListJobsResponse(
         jobs=[JobStatusResponse(**job.to_dict()) for job in jobs],
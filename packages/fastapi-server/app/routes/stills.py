@@ -0,0 +1,119 @@
+"""Synchronous still image endpoint (see services/stills)"""
+import asyncio
+import json
+import time
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from typing import Optional
+from ..config import settings
+from ..models.render import RenderStillRequest, ValidStillImageFormats
+from ..services.bundles import bundle_registry
+from ..services.metrics import metrics
+from ..services.options import to_node_options
+from ..services.sources import resolve_assets, resolve_serve_url
+from ..services.stills import STILL_FORMATS, negotiate_format, still_key, still_service
+from .renders import SERVER_FIELDS
+
+router = APIRouter()
+
+# Job options that do not apply to a synchronous still
+STILL_EXCLUDED_FIELDS = SERVER_FIELDS + ("output_path", "overwrite", "profile")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag"""
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+@router.get("/still/{composition}")
+async def get_still(
+    composition: str,
+    serve_url: Optional[str] = Query(default=None, description="URL to the Remotion bundle (or use bundle_id)"),
+    bundle_id: Optional[str] = Query(default=None, description="Uploaded bundle: content hash, name or name@version"),
+    props: Optional[str] = Query(default=None, description="Input props as a JSON object"),
+    frame: int = Query(default=0, ge=0, description="Frame number to render"),
+    format: Optional[ValidStillImageFormats] = Query(default=None, description="Image format (default: negotiated from Accept)"),
+    scale: float = Query(default=1.0, ge=0.1, le=10.0, description="Scale factor"),
+    jpeg_quality: int = Query(default=80, ge=1, le=100, description="JPEG quality (1-100)"),
+    accept: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """Render a still image and return it, cached on disk and by clients (ETag, Cache-Control)"""
+    started = time.monotonic()
+    try:
+        input_props = json.loads(props) if props else {}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"props is not valid JSON: {str(e)}")
+    if not isinstance(input_props, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="props must be a JSON object")
+    if format == ValidStillImageFormats.PDF:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="PDF stills are only available as render jobs")
+
+    image_format = format.value if format else negotiate_format(accept)
+    try:
+        request = RenderStillRequest(
+            serve_url=serve_url,
+            bundle_id=bundle_id,
+            composition=composition,
+            input_props=input_props,
+            frame=frame,
+            image_format=image_format,
+            scale=scale,
+            jpeg_quality=jpeg_quality,
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False))
+
+    options = to_node_options(request, exclude=STILL_EXCLUDED_FIELDS)
+    if image_format != "jpeg":
+        options.pop("jpegQuality")
+    # Keyed on the bundle as requested (an uploaded bundle by its content), so a 304 needs no mirroring
+    options["serveUrl"] = await resolve_serve_url(request) if bundle_id else serve_url
+    key = still_key(options)
+    # Only an uploaded bundle is immutable, a serve_url can be redeployed with the same options
+    immutable = bundle_registry.is_bundle_url(options["serveUrl"])
+    max_age = settings.STILL_MAX_AGE_SECONDS if immutable else settings.STILL_MUTABLE_MAX_AGE_SECONDS
+
+    headers = {"Cache-Control": f"public, max-age={max_age}" + (", immutable" if immutable else "")}
+    if format is None:
+        headers["Vary"] = "Accept"
+    if immutable:
+        headers["ETag"] = f'"{key}"'
+        if etag_matches(if_none_match, headers["ETag"]):
+            metrics.inc("stills_not_modified")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        if not bundle_id:
+            # localhost mapped to the Docker service, remote bundles mirrored
+            options["serveUrl"] = await resolve_serve_url(request)
+        # Uploaded assets are loaded from this server instead of their origin
+        resolve_assets(options)
+        path = await still_service.get(key, options, None if immutable else max_age)
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        metrics.inc("stills_failed")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Still not rendered within {settings.STILL_TIMEOUT_MS} ms"
+        )
+    except Exception as e:
+        metrics.inc("stills_failed")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    if not immutable:
+        # Names this rendering of the still, which a redeployed serve_url may change
+        headers["ETag"] = f'"{key}-{path.stat().st_mtime_ns}"'
+        if etag_matches(if_none_match, headers["ETag"]):
+            metrics.inc("stills_not_modified")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    metrics.observe("still_request_seconds", time.monotonic() - started)
+    return FileResponse(path, media_type=STILL_FORMATS[image_format], headers=headers)
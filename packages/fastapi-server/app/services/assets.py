@@ -0,0 +1,116 @@
+"""Uploaded assets (images, audio, video) stored by content hash
+
+Assets are served by this server to the renderer's Chrome. Input props
+reference them as ``asset://<sha256>``, which is rewritten to the local
+URL of the asset before the job is queued.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import UploadFile
+
+from ..config import settings
+
+
+ASSET_SCHEME = "asset://"
+
+_ASSET_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class AssetError(ValueError):
+    """An upload or an asset reference is invalid"""
+
+
+def is_asset_id(asset_id: str) -> bool:
+    return bool(_ASSET_ID.fullmatch(asset_id))
+
+
+class AssetStore:
+    """Content-addressed asset files with their content type"""
+
+    def __init__(self):
+        self.root = Path(settings.ASSETS_DIR)
+        self.base_url = f"{settings.LOCAL_BASE_URL.rstrip('/')}{settings.API_PREFIX}/assets"
+
+    def path(self, asset_id: str) -> Path:
+        return self.root / asset_id
+
+    def url(self, asset_id: str) -> str:
+        """URL the renderer's Chrome loads the asset from"""
+        return f"{self.base_url}/{asset_id}"
+
+    def info(self, asset_id: str) -> Optional[dict]:
+        """Metadata of a stored asset, None if there is no such asset"""
+        if not is_asset_id(asset_id) or not self.path(asset_id).is_file():
+            return None
+        try:
+            return json.loads((self.root / f"{asset_id}.json").read_text())
+        except (OSError, ValueError):
+            return {"asset_id": asset_id, "size": self.path(asset_id).stat().st_size, "content_type": None}
+
+    async def store(self, upload: UploadFile) -> dict:
+        """Stream an upload to disk while hashing it, then file it under its hash"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := await upload.read(1024 * 1024):
+                    size += len(chunk)
+                    if size > settings.ASSET_MAX_BYTES:
+                        raise AssetError(f"Asset exceeds {settings.ASSET_MAX_BYTES} bytes")
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+
+            asset_id = digest.hexdigest()
+            record = {
+                "asset_id": asset_id,
+                "size": size,
+                "content_type": upload.content_type,
+                "filename": upload.filename,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            existing = self.info(asset_id)
+            if existing is not None:
+                return existing
+            await asyncio.to_thread(self._commit, tmp_path, asset_id, json.dumps(record))
+        finally:
+            Path(tmp_path).unlink(missing_ok=True)
+
+        print(f"DEBUG: Stored asset {asset_id} ({size} bytes, {upload.content_type})", flush=True)
+        return record
+
+    def _commit(self, tmp_path: str, asset_id: str, metadata: str):
+        """Write the metadata, then make the asset appear atomically (runs in a thread)"""
+        (self.root / f"{asset_id}.json").write_text(metadata)
+        os.replace(tmp_path, self.path(asset_id))
+
+    def rewrite(self, value: Any) -> Any:
+        """Replace asset://<sha256> references in input props with local URLs
+
+        Raises AssetError for a reference to an asset that is not stored.
+        """
+        if isinstance(value, str):
+            if not value.startswith(ASSET_SCHEME):
+                return value
+            asset_id = value[len(ASSET_SCHEME):]
+            if self.info(asset_id) is None:
+                raise AssetError(f"Unknown asset: {value}")
+            return self.url(asset_id)
+        if isinstance(value, dict):
+            return {key: self.rewrite(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.rewrite(item) for item in value]
+        return value
+
+
+# Global asset store instance
+asset_store = AssetStore()
@@ -0,0 +1,120 @@
+"""Local mirror of remote Remotion bundles
+
+A remote serve_url is rewritten to ``/bundle-mirror/<key>/`` on this server.
+Chrome then loads the bundle through the mirror route, which fetches every
+file from the origin once and serves it from the disk cache afterwards.
+Only bundles whose index.html references its files relatively can be
+mirrored: root-relative URLs (Remotion's default public path "/") would
+resolve against this server, so such bundles are loaded from their origin.
+Internal hosts are never mirrored, the route would expose them to clients.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict
+from urllib.parse import urlsplit
+
+from ..config import settings
+from .http_cache import CacheEntry, HttpCache, Uncacheable, UpstreamError, is_internal_host
+
+
+# A public path or script/stylesheet URL starting with a single "/"
+_ROOT_RELATIVE = re.compile(r"""(?:\b(?:src|href)\s*=\s*["']|remotion_publicPath\s*=\s*["'])/(?!/)""")
+
+
+def root_relative(html: str) -> bool:
+    """Whether a bundle's index.html loads files by root-relative URLs"""
+    return _ROOT_RELATIVE.search(html) is not None
+
+
+class BundleMirror:
+    """Map remote bundle origins to local mirror URLs"""
+
+    def __init__(self):
+        self.enabled = settings.BUNDLE_MIRROR_ENABLED
+        self.cache = HttpCache(
+            "bundle_mirror",
+            settings.BUNDLE_MIRROR_DIR,
+            settings.BUNDLE_MIRROR_MAX_BYTES,
+            settings.BUNDLE_MIRROR_REVALIDATE_SECONDS,
+            url_filter=self.allowed,
+        )
+        self.local_base = f"{settings.LOCAL_BASE_URL.rstrip('/')}{settings.API_PREFIX}/bundle-mirror"
+        # Mirror key -> origin base URL (ending with "/")
+        self.origins: Dict[str, str] = {}
+        self._origins_file = Path(settings.BUNDLE_MIRROR_DIR) / "origins.json"
+        self._loaded = False
+        # index.html blob -> whether the bundle can be served from the mirror
+        self._relocatable: Dict[str, bool] = {}
+
+    def allowed(self, url: str) -> bool:
+        """Whether the mirror may fetch a URL"""
+        host = urlsplit(url).hostname or ""
+        return bool(host) and not is_internal_host(host)
+
+    async def relocatable(self, index_url: str) -> bool:
+        """Whether a bundle still loads when served from under the mirror path"""
+        try:
+            entry = await self.cache.get(index_url)
+        except (Uncacheable, UpstreamError) as e:
+            print(f"DEBUG: Not mirroring {index_url}: {str(e)}", flush=True)
+            return False
+        if entry.blob not in self._relocatable:
+            html = await asyncio.to_thread(self.cache.blob_path(entry).read_text, "utf-8", "replace")
+            self._relocatable[entry.blob] = not root_relative(html)
+            if not self._relocatable[entry.blob]:
+                print(f"DEBUG: Not mirroring {index_url}: it uses root-relative URLs", flush=True)
+        return self._relocatable[entry.blob]
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            self.origins.update(json.loads(self._origins_file.read_text()))
+        except (OSError, ValueError):
+            pass
+
+    def _write_origins(self, payload: str):
+        self._origins_file.parent.mkdir(parents=True, exist_ok=True)
+        self._origins_file.write_text(payload)
+
+    async def local_url(self, serve_url: str) -> str:
+        """Return the mirror URL of a remote bundle (or serve_url unchanged if disabled)"""
+        if not self.enabled or urlsplit(serve_url).scheme not in ("http", "https") or not self.allowed(serve_url):
+            return serve_url
+        if serve_url.startswith(self.local_base):
+            return serve_url
+
+        # https://host/site/index.html -> origin https://host/site/ and page index.html
+        if serve_url.rsplit("/", 1)[-1].endswith(".html"):
+            origin, page = serve_url.rsplit("/", 1)
+            origin += "/"
+        else:
+            origin, page = serve_url.rstrip("/") + "/", ""
+
+        if not await self.relocatable(origin + (page or "index.html")):
+            return serve_url
+
+        self._load()
+        key = hashlib.sha256(origin.encode("utf-8")).hexdigest()[:16]
+        if self.origins.get(key) != origin:
+            self.origins[key] = origin
+            await asyncio.to_thread(self._write_origins, json.dumps(self.origins))
+            print(f"DEBUG: Mirroring bundle {origin} as {key}", flush=True)
+
+        return f"{self.local_base}/{key}/{page}"
+
+    async def fetch(self, key: str, path: str, query: str = "") -> CacheEntry:
+        """Return a file of a mirrored bundle; raises KeyError for an unknown key"""
+        self._load()
+        url = self.origins[key] + path
+        if query:
+            url += f"?{query}"
+        return await self.cache.get(url)
+
+
+# Global bundle mirror instance
+bundle_mirror = BundleMirror()
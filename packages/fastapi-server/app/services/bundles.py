@@ -0,0 +1,216 @@
+"""Uploaded Remotion bundles, stored by content hash, with a versioned name registry"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from ..config import settings
+
+
+class BundleError(ValueError):
+    """The uploaded archive is not a usable Remotion bundle"""
+
+
+class BundleTooLarge(BundleError):
+    """The uploaded archive exceeds BUNDLE_UPLOAD_MAX_BYTES"""
+
+
+_PUBLIC_PATH = re.compile(r'window\.remotion_publicPath = ("(?:[^"\\]|\\.)*");')
+
+
+def _safe_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Files of an archive, rejecting paths that escape the bundle and oversized content"""
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    total = 0
+    for info in members:
+        parts = Path(info.filename).parts
+        if info.filename.startswith("/") or ".." in parts:
+            raise BundleError(f"Invalid path in archive: {info.filename}")
+        total += info.file_size
+        if total > settings.BUNDLE_MAX_BYTES:
+            raise BundleError(f"Bundle exceeds {settings.BUNDLE_MAX_BYTES} bytes when extracted")
+    return members
+
+
+def _bundle_root(directory: Path) -> Path:
+    """Directory holding index.html (the archive may wrap the bundle in one folder)"""
+    if (directory / "index.html").is_file():
+        return directory
+    entries = list(directory.iterdir())
+    if len(entries) == 1 and (entries[0] / "index.html").is_file():
+        return entries[0]
+    raise BundleError("index.html not found at the root of the archive")
+
+
+def _rewrite_public_path(bundle_root: Path, public_path: str):
+    """Point the bundle's public path (script, favicon, staticFile()) at where it is served
+
+    Bundles are built for a public path, "/" by default. A relative one
+    works wherever the bundle is served. Chunks loaded lazily by webpack
+    keep the path the bundle was built with, so a bundle that has any and
+    was built for a root-relative path is rejected.
+    """
+    index_html = bundle_root / "index.html"
+    html = index_html.read_text(encoding="utf-8")
+    match = _PUBLIC_PATH.search(html)
+    if not match:
+        return
+    current = json.loads(match.group(1))
+    if current == public_path or not current.startswith("/") and "://" not in current:
+        return
+
+    # Only URLs under the public path, not protocol-relative ones ("//cdn...") when it is "/"
+    prefix = re.escape(current) + r"(?!/)"
+    scripts = set(re.findall(r'src="' + prefix + r'([^"?#]+\.js)', html))
+    chunks = [
+        path for path in bundle_root.rglob("*.js")
+        if path.relative_to(bundle_root).parts[0] != "public" and path.relative_to(bundle_root).as_posix() not in scripts
+    ]
+    if chunks and current.startswith("/"):
+        raise BundleError(
+            f"Bundle was built for public path {current} and loads chunks from it "
+            f"({chunks[0].name}), build it with a relative public path such as ./"
+        )
+
+    html = html.replace(match.group(0), f"window.remotion_publicPath = {json.dumps(public_path)};")
+    html = re.sub(r'((?:src|href)=")' + prefix, lambda reference: reference.group(1) + public_path, html)
+    index_html.write_text(html, encoding="utf-8")
+
+
+class BundleRegistry:
+    """Store bundle archives by content hash and track named versions"""
+
+    def __init__(self):
+        self.root = Path(settings.BUNDLES_DIR)
+        self.public_path = f"{settings.API_PREFIX}/bundles/"
+        # bundle id -> metadata, name -> bundle ids in version order
+        self.bundles: Dict[str, dict] = {}
+        self.names: Dict[str, List[str]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads((self.root / "registry.json").read_text())
+        except (OSError, ValueError):
+            return
+        self.bundles = data.get("bundles", {})
+        self.names = data.get("names", {})
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"bundles": self.bundles, "names": self.names}, f)
+        os.replace(tmp_path, self.root / "registry.json")
+
+    def path(self, bundle_id: str) -> Path:
+        return self.root / bundle_id
+
+    def serve_url(self, bundle_id: str) -> str:
+        """URL the renderer's Chrome loads the bundle from"""
+        return f"{settings.LOCAL_BASE_URL.rstrip('/')}{self.public_path}{bundle_id}/"
+
+    def is_bundle_url(self, url: str) -> bool:
+        """Whether a serve URL points at an uploaded (immutable) bundle"""
+        return url.startswith(f"{settings.LOCAL_BASE_URL.rstrip('/')}{self.public_path}")
+
+    def _extract(self, archive_file: BinaryIO) -> Tuple[str, int]:
+        """Hash and unpack an archive into bundles/<sha256> (runs in a thread)"""
+        archive_file.seek(0, os.SEEK_END)
+        if archive_file.tell() > settings.BUNDLE_UPLOAD_MAX_BYTES:
+            raise BundleTooLarge(f"Bundle archive exceeds {settings.BUNDLE_UPLOAD_MAX_BYTES} bytes")
+        digest = hashlib.sha256()
+        archive_file.seek(0)
+        for chunk in iter(lambda: archive_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+        bundle_id = digest.hexdigest()
+        target = self.path(bundle_id)
+        if target.is_dir():
+            return bundle_id, self.bundles.get(bundle_id, {}).get("size", 0)
+
+        archive_file.seek(0)
+        try:
+            archive = zipfile.ZipFile(archive_file)
+        except zipfile.BadZipFile:
+            raise BundleError("Upload is not a zip archive")
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.root, prefix=".upload-"))
+        try:
+            with archive:
+                members = _safe_members(archive)
+                archive.extractall(staging, members)
+            bundle_root = _bundle_root(staging)
+            _rewrite_public_path(bundle_root, f"{self.public_path}{bundle_id}/")
+            # Appears atomically: renders never see a half-extracted bundle
+            os.replace(bundle_root, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return bundle_id, sum(info.file_size for info in members)
+
+    async def store(self, archive_file: BinaryIO, name: Optional[str] = None) -> dict:
+        """Store an uploaded archive, registering it as the next version of name"""
+        async with self._lock:
+            self._load()
+            bundle_id, size = await asyncio.to_thread(self._extract, archive_file)
+
+            record = self.bundles.setdefault(bundle_id, {
+                "bundle_id": bundle_id,
+                "size": size,
+                "created_at": datetime.utcnow().isoformat(),
+            })
+            version = None
+            if name:
+                versions = self.names.setdefault(name, [])
+                # Re-uploading the latest version does not create a new one
+                if not versions or versions[-1] != bundle_id:
+                    versions.append(bundle_id)
+                version = len(versions) - versions[::-1].index(bundle_id)
+
+            await asyncio.to_thread(self._save)
+            print(f"DEBUG: Stored bundle {bundle_id} ({size} bytes) as {name}@{version}", flush=True)
+            return {**record, "name": name, "version": version, "serve_url": self.serve_url(bundle_id)}
+
+    def resolve(self, reference: str) -> str:
+        """Bundle id for "<sha256>", "<name>" (latest version) or "<name>@<version>"
+
+        Raises KeyError if there is no such bundle.
+        """
+        self._load()
+        if reference in self.bundles:
+            return reference
+        name, _, version = reference.partition("@")
+        versions = self.names[name]
+        if not version:
+            return versions[-1]
+        index = int(version) - 1 if version.isdigit() else -1
+        if not 0 <= index < len(versions):
+            raise KeyError(reference)
+        return versions[index]
+
+    def list(self) -> List[dict]:
+        """Every stored bundle with the names and versions it is registered under"""
+        self._load()
+        labels: Dict[str, List[str]] = {}
+        for name, versions in self.names.items():
+            for number, bundle_id in enumerate(versions, start=1):
+                labels.setdefault(bundle_id, []).append(f"{name}@{number}")
+        return [
+            {**record, "versions": labels.get(bundle_id, []), "serve_url": self.serve_url(bundle_id)}
+            for bundle_id, record in self.bundles.items()
+        ]
+
+
+# Global bundle registry instance
+bundle_registry = BundleRegistry()
@@ -0,0 +1,121 @@
+"""Persistent cache of composition metadata (selectComposition results)
+
+Keyed by (bundle, composition id, input props hash). Uploaded bundles are
+immutable, so their entries never expire; other serve URLs can be
+redeployed and are trusted for COMPOSITION_CACHE_TTL_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .metrics import metrics
+
+
+def composition_key(options: Dict[str, Any]) -> Optional[str]:
+    """Cache key of the composition a render options dict refers to"""
+    serve_url = options.get("serveUrl")
+    composition = options.get("composition")
+    if not serve_url or not composition:
+        return None
+
+    props_path = options.get("inputPropsPath")
+    if props_path:
+        # Props files are already named after the hash of their content
+        props_hash = Path(props_path).stem
+    else:
+        props = json.dumps(options.get("inputProps") or {}, sort_keys=True, separators=(",", ":"))
+        props_hash = hashlib.sha256(props.encode("utf-8")).hexdigest()
+
+    return hashlib.sha256(f"{serve_url}\n{composition}\n{props_hash}".encode("utf-8")).hexdigest()
+
+
+class CompositionCache:
+    """LRU of composition metadata, one JSON file per entry in COMPOSITION_CACHE_DIR"""
+
+    def __init__(self):
+        self.enabled = settings.COMPOSITION_CACHE_ENABLED
+        self.directory = Path(settings.COMPOSITION_CACHE_DIR)
+        self.max_entries = settings.COMPOSITION_CACHE_MAX_ENTRIES
+        # key -> {"metadata": ..., "stored_at": ..., "immutable": ...}, least recently used first
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._loaded = False
+
+    def _load(self):
+        """Read the entries persisted by a previous run, oldest first"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            files = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        except OSError:
+            return
+        for path in files:
+            try:
+                self.entries[path.stem] = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+    def _write(self, key: str, payload: str):
+        """Write one entry atomically (runs in a thread)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.directory / f"{key}.json")
+
+    def _remove(self, key: str):
+        self.entries.pop(key, None)
+        (self.directory / f"{key}.json").unlink(missing_ok=True)
+
+    def get(self, key: Optional[str]) -> Optional[dict]:
+        """Cached metadata for a key, or None"""
+        if not self.enabled or key is None:
+            return None
+        self._load()
+        entry = self.entries.get(key)
+        if entry is not None and not entry["immutable"]:
+            if time.time() - entry["stored_at"] > settings.COMPOSITION_CACHE_TTL_SECONDS:
+                self._remove(key)
+                entry = None
+        if entry is None:
+            metrics.inc("composition_cache_misses")
+            return None
+        self.entries.move_to_end(key)
+        metrics.inc("composition_cache_hits")
+        return entry["metadata"]
+
+    def peek(self, key: Optional[str]) -> Optional[dict]:
+        """Cached metadata for a key, without counting a lookup or refreshing it (estimates)"""
+        if not self.enabled or key is None:
+            return None
+        self._load()
+        entry = self.entries.get(key)
+        return entry["metadata"] if entry is not None else None
+
+    async def put(self, key: Optional[str], metadata: dict, immutable: bool = False):
+        """Store the metadata reported by the renderer"""
+        if not self.enabled or key is None:
+            return
+        entry = {"metadata": metadata, "stored_at": time.time(), "immutable": immutable}
+        payload = json.dumps(entry)
+        # Resolved props are part of the metadata, do not keep huge ones around
+        if len(payload) > settings.COMPOSITION_CACHE_MAX_ENTRY_BYTES:
+            return
+
+        self._load()
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+        await asyncio.to_thread(self._write, key, payload)
+
+
+# Global composition cache instance
+composition_cache = CompositionCache()
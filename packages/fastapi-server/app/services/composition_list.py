@@ -0,0 +1,116 @@
+"""Cache of composition listings (POST /compositions)
+
+Listing evaluates the whole bundle in a browser tab. Results are kept per
+(serve URL, input props, env variables) for COMPOSITIONS_CACHE_TTL_SECONDS,
+concurrent identical requests share one evaluation, and at most
+COMPOSITIONS_MAX_CONCURRENT evaluations hold a worker at once so that
+listings cannot take over the render capacity.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..config import settings
+from .metrics import metrics
+
+
+@dataclass
+class CompositionList:
+    """Compositions of a bundle and the ETag of the listing"""
+    compositions: List[Dict[str, Any]]
+    etag: str
+    # time.time() after which the listing is evaluated again, None = never
+    expires_at: Optional[float] = None
+
+
+def listing_key(options: Dict[str, Any]) -> str:
+    """Cache key of the listing requested by a getCompositions options dict"""
+    identity = {
+        "serveUrl": options.get("serveUrl"),
+        "inputProps": options.get("inputProps") or {},
+        "envVariables": options.get("envVariables") or {},
+    }
+    payload = json.dumps(identity, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompositionListCache:
+    """TTL cache with single-flight evaluation and a concurrency limit"""
+
+    def __init__(self):
+        self.ttl = settings.COMPOSITIONS_CACHE_TTL_SECONDS
+        self.max_entries = settings.COMPOSITIONS_CACHE_MAX_ENTRIES
+        self.entries: "OrderedDict[str, CompositionList]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(settings.COMPOSITIONS_MAX_CONCURRENT)
+
+    def _cached(self, key: str) -> Optional[CompositionList]:
+        listing = self.entries.get(key)
+        if listing is None:
+            return None
+        if listing.expires_at is not None and time.time() >= listing.expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return listing
+
+    async def get(
+        self,
+        options: Dict[str, Any],
+        load: Callable[[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]],
+        immutable: bool = False
+    ) -> CompositionList:
+        """Return the listing for options, calling load(options) on a miss"""
+        key = listing_key(options)
+        listing = self._cached(key)
+        if listing is not None:
+            metrics.inc("compositions_cache_hits")
+            return listing
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc("compositions_coalesced")
+        else:
+            metrics.inc("compositions_cache_misses")
+            # The evaluation is not owned by one request: a caller going away does not cancel it for the others
+            task = asyncio.create_task(self._evaluate(key, options, load, immutable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Retrieve the error even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    async def _evaluate(
+        self,
+        key: str,
+        options: Dict[str, Any],
+        load: Callable[[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]],
+        immutable: bool
+    ) -> CompositionList:
+        async with self._semaphore:
+            compositions = await load(options)
+
+        body = json.dumps(compositions, sort_keys=True, separators=(",", ":"), default=str)
+        listing = CompositionList(
+            compositions=compositions,
+            etag=f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"',
+            expires_at=None if immutable else time.time() + self.ttl,
+        )
+        # Errors are not cached, the next request evaluates again
+        if self.ttl > 0 or immutable:
+            self.entries[key] = listing
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return listing
+
+
+# Global composition listing cache instance
+composition_lists = CompositionListCache()
@@ -0,0 +1,362 @@
+"""Disk cache for remote HTTP resources with revalidation and LRU eviction
+
+Bodies are stored once per content hash (``blobs/<sha256>``); an index maps
+each URL to its blob and validators (ETag / Last-Modified). A stale entry is
+revalidated with a conditional request, and concurrent misses for the same
+URL share one download. Responses stay fresh for their Cache-Control max-age
+(no-cache: revalidated on every use), or revalidate_seconds when the origin
+does not say. Responses marked no-store or private are never written to
+disk: get() raises Uncacheable and the caller streams them with stream().
+"""
+import asyncio
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from .metrics import metrics
+
+
+class UpstreamError(Exception):
+    """The origin answered with an error or could not be reached"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Uncacheable(Exception):
+    """The origin forbids storing the response (no-store, private), it must be streamed through"""
+
+    def __init__(self, url: str):
+        super().__init__(f"{url} may not be cached")
+        self.url = url
+
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*\"?(\d+)")
+
+
+def freshness_lifetime(cache_control: Optional[str]) -> Optional[float]:
+    """Seconds a response may be used without revalidation, None if Cache-Control does not say"""
+    if not cache_control:
+        return None
+    directives = cache_control.lower()
+    if "no-cache" in directives:
+        return 0.0
+    ages = dict(_MAX_AGE.findall(directives))
+    # s-maxage applies to shared caches such as this one
+    age = ages.get("s-maxage", ages.get("max-age"))
+    return float(age) if age is not None else None
+
+
+def storable(cache_control: Optional[str]) -> bool:
+    """Whether a shared cache may store a response"""
+    directives = {item.split("=", 1)[0].strip() for item in (cache_control or "").lower().split(",")}
+    return not directives & {"no-store", "private"}
+
+
+# Names only used inside private networks
+_INTERNAL_SUFFIXES = (".localhost", ".internal", ".local", ".lan", ".home.arpa")
+
+
+def is_internal_host(host: str) -> bool:
+    """Loopback, private, link-local (cloud metadata), single-label (Docker service) or private-network names"""
+    host = host.lower().strip("[]").rstrip(".")
+    if host == "localhost" or host.endswith(_INTERNAL_SUFFIXES):
+        return True
+    try:
+        return not ipaddress.ip_address(host).is_global
+    except ValueError:
+        return "." not in host
+
+
+async def resolve_addresses(host: str, port: int) -> List[str]:
+    """IP addresses a host name resolves to"""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+# Response headers passed on when a response is streamed through
+_PASSTHROUGH_HEADERS = (
+    "content-type",
+    "content-length",
+    "content-range",
+    "content-encoding",
+    "accept-ranges",
+    "cache-control",
+    "etag",
+    "last-modified",
+)
+
+
+@dataclass
+class CacheEntry:
+    """Cached response for one URL"""
+    url: str
+    blob: str
+    size: int
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    validated_at: float = 0.0
+    last_used: float = 0.0
+    # Freshness lifetime from Cache-Control, None = the cache's revalidate_seconds
+    max_age: Optional[float] = None
+
+
+class HttpCache:
+    """Content-addressed disk cache of GET responses, bounded by size"""
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        max_bytes: int,
+        revalidate_seconds: float,
+        url_filter: Optional[Callable[[str], bool]] = None
+    ):
+        self.name = name
+        # Checked for every request, redirects included: False refuses the URL, and so
+        # does a host resolving to an internal address
+        self.url_filter = url_filter
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.entries: Dict[str, CacheEntry] = {}
+        self._loaded = False
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # URL -> time.time() until which it is streamed through without asking the origin again
+        self._uncacheable: Dict[str, float] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def blob_dir(self) -> Path:
+        return self.directory / "blobs"
+
+    @property
+    def size(self) -> int:
+        """Bytes used by the distinct blobs"""
+        return sum({entry.blob: entry.size for entry in self.entries.values()}.values())
+
+    def blob_path(self, entry: CacheEntry) -> Path:
+        return self.blob_dir / entry.blob
+
+    def _client_for_requests(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                event_hooks={"request": [self._check_request]} if self.url_filter else None,
+            )
+        return self._client
+
+    async def _check_request(self, request: httpx.Request):
+        if not self.url_filter(str(request.url)):
+            raise UpstreamError(403, f"Refused to fetch {request.url}")
+        # A public name can point at a private address
+        host = request.url.host
+        try:
+            addresses = await resolve_addresses(host, request.url.port or 443)
+        except OSError as e:
+            raise UpstreamError(502, f"Could not resolve {host}: {str(e)}")
+        if any(is_internal_host(address.split("%", 1)[0]) for address in addresses):
+            raise UpstreamError(403, f"Refused to fetch {request.url}: {host} resolves to an internal address")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _load(self):
+        """Read the index once, dropping entries whose blob is missing"""
+        if self._loaded:
+            return
+        self._loaded = True
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            data = json.loads((self.directory / "index.json").read_text())
+        except (OSError, ValueError):
+            return
+        for item in data.get("entries", []):
+            try:
+                entry = CacheEntry(**item)
+            except TypeError:
+                continue
+            if self.blob_path(entry).exists():
+                self.entries[entry.url] = entry
+
+    async def save(self):
+        """Persist the index"""
+        payload = json.dumps({"entries": [asdict(entry) for entry in self.entries.values()]})
+        await asyncio.to_thread(self._write_index, payload)
+
+    def _write_index(self, payload: str):
+        """Write the index atomically (runs in a thread)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.directory / "index.json")
+
+    def is_fresh(self, entry: CacheEntry, now: float) -> bool:
+        lifetime = self.revalidate_seconds if entry.max_age is None else entry.max_age
+        return now - entry.validated_at < lifetime
+
+    async def get(self, url: str, outcomes: Optional[Dict[str, int]] = None) -> CacheEntry:
+        """Return the cached entry for a URL, downloading or revalidating it if needed
+
+        outcomes, if given, counts how the request was served: "hits",
+        "misses", "revalidated" or "coalesced".
+        """
+        self._load()
+        now = time.time()
+        if self._uncacheable.get(url, 0.0) > now:
+            self._count(outcomes, "misses")
+            raise Uncacheable(url)
+        entry = self.entries.get(url)
+        if entry is not None and self.is_fresh(entry, now):
+            entry.last_used = now
+            metrics.inc(f"{self.name}_hits")
+            self._count(outcomes, "hits")
+            return entry
+
+        # Single-flight: concurrent requests for the same URL wait for one fetch.
+        # The fetch is not owned by one request: a caller going away does not cancel it for the others
+        task = self._inflight.get(url)
+        if task is not None:
+            self._count(outcomes, "coalesced")
+            return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._fetch(url, entry))
+        self._inflight[url] = task
+        task.add_done_callback(lambda done: self._finished(url, done))
+        try:
+            fetched = await asyncio.shield(task)
+        except Uncacheable:
+            self._count(outcomes, "misses")
+            raise
+        self._count(outcomes, "revalidated" if fetched is entry else "misses")
+        return fetched
+
+    def _finished(self, url: str, task: asyncio.Task):
+        self._inflight.pop(url, None)
+        # Retrieve the error even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    @staticmethod
+    def _count(outcomes: Optional[Dict[str, int]], outcome: str):
+        if outcomes is not None:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    async def _fetch(self, url: str, stale: Optional[CacheEntry]) -> CacheEntry:
+        """Download a URL, or revalidate a stale entry with a conditional request"""
+        headers = {}
+        if stale is not None:
+            if stale.etag:
+                headers["If-None-Match"] = stale.etag
+            if stale.last_modified:
+                headers["If-Modified-Since"] = stale.last_modified
+
+        client = self._client_for_requests()
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and stale is not None:
+                    stale.validated_at = stale.last_used = time.time()
+                    stale.max_age = freshness_lifetime(response.headers.get("cache-control"))
+                    metrics.inc(f"{self.name}_revalidated")
+                    return stale
+                if response.status_code != 200:
+                    raise UpstreamError(response.status_code, f"{url} returned HTTP {response.status_code}")
+                if not storable(response.headers.get("cache-control")):
+                    self._uncacheable[url] = time.time() + self.revalidate_seconds
+                    if self.entries.pop(url, None) is not None:
+                        await self.save()
+                    raise Uncacheable(url)
+
+                blob, size = await self._store_body(response)
+                entry = CacheEntry(
+                    url=url,
+                    blob=blob,
+                    size=size,
+                    content_type=response.headers.get("content-type"),
+                    etag=response.headers.get("etag"),
+                    last_modified=response.headers.get("last-modified"),
+                    validated_at=time.time(),
+                    last_used=time.time(),
+                    max_age=freshness_lifetime(response.headers.get("cache-control")),
+                )
+        except httpx.HTTPError as e:
+            raise UpstreamError(502, f"Could not fetch {url}: {str(e)}")
+
+        metrics.inc(f"{self.name}_misses")
+        metrics.inc(f"{self.name}_bytes_fetched", size)
+        self.entries[url] = entry
+        self._evict(keep=url)
+        await self.save()
+        return entry
+
+    async def stream(self, url: str, range_header: Optional[str] = None) -> StreamingResponse:
+        """Pass a response the cache may not store through to the client, without writing it to disk"""
+        client = self._client_for_requests()
+        headers = {"Range": range_header} if range_header else {}
+        try:
+            response = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+        except httpx.HTTPError as e:
+            raise UpstreamError(502, f"Could not fetch {url}: {str(e)}")
+        if response.status_code not in (200, 206, 416):
+            await response.aclose()
+            raise UpstreamError(response.status_code, f"{url} returned HTTP {response.status_code}")
+
+        metrics.inc(f"{self.name}_passthrough")
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={name: response.headers[name] for name in _PASSTHROUGH_HEADERS if name in response.headers},
+            background=BackgroundTask(response.aclose),
+        )
+
+    async def _store_body(self, response: httpx.Response) -> tuple:
+        """Stream a response body to a blob named after its hash"""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            blob = digest.hexdigest()
+            os.replace(tmp_path, self.blob_dir / blob)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return blob, size
+
+    def _evict(self, keep: str):
+        """Drop least recently used entries until the cache fits"""
+        used = self.size
+        if self.max_bytes and used > self.max_bytes:
+            for entry in sorted(self.entries.values(), key=lambda entry: entry.last_used):
+                if used <= self.max_bytes:
+                    break
+                if entry.url == keep:
+                    continue
+                del self.entries[entry.url]
+                metrics.inc(f"{self.name}_evictions")
+                # A blob shared by several URLs is only freed with the last of them
+                if not any(other.blob == entry.blob for other in self.entries.values()):
+                    self.blob_path(entry).unlink(missing_ok=True)
+                    used -= entry.size
+        metrics.set_gauge(f"{self.name}_bytes", used)
@@ -0,0 +1,74 @@
+"""Length-prefixed framing for the Node worker protocol
+
+Every message is a frame made of a 4-byte big-endian payload length, a
+1-byte codec tag and the payload. The payload is msgpack when the
+``msgpack`` package is installed (and IPC_CODEC allows it), JSON otherwise.
+Both sides tag each frame, so they decode whatever the other side sends.
+"""
+import asyncio
+import json
+import struct
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+HEADER = struct.Struct(">IB")
+CODEC_JSON = ord("j")
+CODEC_MSGPACK = ord("m")
+
+# Refuse frames larger than this (protects against a corrupted stream)
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+
+class FrameError(RuntimeError):
+    """Raised when the worker stream does not contain a valid frame"""
+
+
+def resolve_codec(name: str) -> int:
+    """Map a configured codec name to a codec tag, falling back to JSON"""
+    if name == "msgpack" and msgpack is not None:
+        return CODEC_MSGPACK
+    return CODEC_JSON
+
+
+def encode_frame(message: Any, codec: int = CODEC_JSON) -> bytes:
+    """Serialize a message into a frame"""
+    if codec == CODEC_MSGPACK:
+        payload = msgpack.packb(message, use_bin_type=True)
+    else:
+        payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(payload), codec) + payload
+
+
+def decode_payload(codec: int, payload: bytes) -> Any:
+    """Deserialize the payload of a frame"""
+    if codec == CODEC_JSON:
+        return json.loads(payload)
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise FrameError("Received a msgpack frame but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    raise FrameError(f"Unknown frame codec: {codec}")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Any]:
+    """Read one message, or None at end of stream"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    length, codec = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+    return decode_payload(codec, payload)
@@ -0,0 +1,175 @@
+"""Per-priority-class CPU and I/O isolation of a worker's process tree (Linux)
+
+Before a job runs, the Node/Chrome/FFmpeg tree of its worker is given the
+nice level, I/O priority, CPU affinity and cgroup v2 sub-group of the job's
+priority class. Processes started later (FFmpeg, new Chrome renderers)
+inherit them from their parent.
+"""
+import ctypes
+import os
+import platform
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Set
+from ..config import settings
+from .process_tree import process_tree
+
+
+PRIORITY_CLASSES = ("interactive", "batch")
+
+# ioprio_set(2) is not exposed by the os module
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}
+_IOPRIO_CLASSES = {"best-effort": 2, "idle": 3}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+
+
+def parse_cpus(spec: str) -> Set[int]:
+    """Parse a CPU list such as "0-3,6" (empty = no pinning)"""
+    cpus: Set[int] = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def parse_ionice(spec: str) -> Optional[int]:
+    """Parse "<class>[:<level>]" (best-effort or idle) into an ioprio value"""
+    if not spec:
+        return None
+    name, _, level = spec.partition(":")
+    io_class = _IOPRIO_CLASSES.get(name)
+    if io_class is None:
+        raise ValueError(f"Unsupported I/O priority class: {name}")
+    return (io_class << _IOPRIO_CLASS_SHIFT) | int(level or 0)
+
+
+@dataclass
+class IsolationPolicy:
+    """Scheduling settings applied to the processes of one priority class"""
+    name: str
+    nice: int
+    ioprio: Optional[int]
+    cpus: Set[int]
+    cpu_weight: int
+
+    @classmethod
+    def from_settings(cls, name: str) -> "IsolationPolicy":
+        prefix = name.upper()
+        return cls(
+            name=name,
+            nice=getattr(settings, f"{prefix}_NICE"),
+            ioprio=parse_ionice(getattr(settings, f"{prefix}_IONICE")),
+            cpus=parse_cpus(getattr(settings, f"{prefix}_CPUS")),
+            cpu_weight=getattr(settings, f"{prefix}_CPU_WEIGHT"),
+        )
+
+
+class ProcessIsolation:
+    """Apply priority class policies to worker process trees"""
+
+    def __init__(self):
+        self.enabled = settings.ISOLATION_ENABLED
+        self.policies: Dict[str, IsolationPolicy] = {
+            name: IsolationPolicy.from_settings(name) for name in PRIORITY_CLASSES
+        }
+        self.cgroup_root = Path(settings.ISOLATION_CGROUP_ROOT) if settings.ISOLATION_CGROUP_ROOT else None
+        self._cgroups: Dict[str, Optional[Path]] = {}
+        self._ioprio_syscall = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+        self._libc = None
+        # Failures are reported once per kind, they repeat for every process otherwise
+        self._reported: Set[str] = set()
+
+    def _report(self, kind: str, error: Exception):
+        if kind not in self._reported:
+            self._reported.add(kind)
+            print(f"DEBUG: Process isolation: cannot apply {kind}: {str(error)}", flush=True)
+
+    def _set_ioprio(self, pid: int, ioprio: int):
+        if self._ioprio_syscall is None:
+            raise OSError(f"ioprio_set is not supported on {platform.machine()}")
+        if self._libc is None:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+        if self._libc.syscall(self._ioprio_syscall, _IOPRIO_WHO_PROCESS, pid, ioprio) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def _cgroup(self, policy: IsolationPolicy) -> Optional[Path]:
+        """Create (once) the cgroup v2 sub-group of a priority class"""
+        if self.cgroup_root is None:
+            return None
+        if policy.name in self._cgroups:
+            return self._cgroups[policy.name]
+
+        group = self.cgroup_root / policy.name
+        try:
+            for controller in ("cpu", "cpuset", "io"):
+                try:
+                    (self.cgroup_root / "cgroup.subtree_control").write_text(f"+{controller}")
+                except OSError as e:
+                    self._report(f"cgroup controller {controller}", e)
+            group.mkdir(exist_ok=True)
+            (group / "cpu.weight").write_text(str(policy.cpu_weight))
+            if policy.cpus:
+                (group / "cpuset.cpus").write_text(",".join(str(cpu) for cpu in sorted(policy.cpus)))
+        except OSError as e:
+            self._report("cgroup", e)
+            group = None
+
+        self._cgroups[policy.name] = group
+        return group
+
+    def apply(self, pid: int, priority_class: str) -> bool:
+        """Move a process and its descendants into a priority class
+
+        Best effort: settings the process is not allowed to change (lowering
+        the nice level without CAP_SYS_NICE, a cgroup that is not delegated)
+        are skipped. Returns False if any of them was.
+        """
+        policy = self.policies[priority_class]
+        pids = process_tree(pid)
+        cpus = policy.cpus & os.sched_getaffinity(0) if policy.cpus else os.sched_getaffinity(0)
+        group = self._cgroup(policy)
+        applied = group is not None or self.cgroup_root is None
+
+        for member in pids:
+            try:
+                os.setpriority(os.PRIO_PROCESS, member, policy.nice)
+            except ProcessLookupError:
+                continue
+            except OSError as e:
+                self._report("nice", e)
+                applied = False
+
+            if policy.ioprio is not None:
+                try:
+                    self._set_ioprio(member, policy.ioprio)
+                except OSError as e:
+                    self._report("ionice", e)
+                    applied = False
+
+            if cpus:
+                try:
+                    os.sched_setaffinity(member, cpus)
+                except OSError as e:
+                    self._report("CPU affinity", e)
+                    applied = False
+
+            if group is not None:
+                try:
+                    (group / "cgroup.procs").write_text(str(member))
+                except OSError as e:
+                    self._report("cgroup membership", e)
+                    applied = False
+
+        print(f"DEBUG: {'Applied' if applied else 'Partially applied'} '{priority_class}' isolation to {len(pids)} processes of PID {pid}", flush=True)
+        return applied
+
+
+# Global isolation instance
+isolation = ProcessIsolation()
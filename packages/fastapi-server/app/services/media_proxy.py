@@ -0,0 +1,100 @@
+"""Caching proxy for remote media referenced by input props
+
+Remotion launches Chrome with a fixed ``--proxy-server='direct://'``, so
+renders cannot be pointed at a forward proxy. Instead, the Node worker
+rewrites the http(s) URLs in a render's props to
+``/media-proxy/<token>/<base64 url>/<name>`` on this server, which serves
+them from a shared HttpCache: concurrent renders of the same template
+download each file once. The token attributes requests to the render
+for its hit ratio; requests without the token of a running render are
+refused, and so are hosts outside MEDIA_PROXY_HOSTS and internal hosts,
+by name or by the addresses they resolve to (also after redirects), so
+the route cannot be used as an open proxy.
+"""
+import base64
+import binascii
+import uuid
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from ..config import settings
+from .http_cache import CacheEntry, HttpCache, is_internal_host
+
+
+def encode_url(url: str) -> str:
+    return base64.urlsafe_b64encode(url.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_url(encoded: str) -> Optional[str]:
+    """URL of a proxied path segment, None if it is not a valid http(s) URL"""
+    try:
+        url = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return url if urlsplit(url).scheme in ("http", "https") else None
+
+
+class MediaProxyError(Exception):
+    """A proxied request is refused"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MediaProxy:
+    """Shared media cache and the per-render request counters"""
+
+    def __init__(self):
+        self.enabled = settings.MEDIA_PROXY_ENABLED
+        self.cache = HttpCache(
+            "media_proxy",
+            settings.MEDIA_PROXY_DIR,
+            settings.MEDIA_PROXY_MAX_BYTES,
+            settings.MEDIA_PROXY_REVALIDATE_SECONDS,
+            url_filter=self.allowed,
+        )
+        self.base_url = f"{settings.LOCAL_BASE_URL.rstrip('/')}{settings.API_PREFIX}/media-proxy"
+        self.hosts = [host.strip().lower() for host in settings.MEDIA_PROXY_HOSTS.split(",") if host.strip()]
+        # Token of a running render -> its outcome counters
+        self.sessions: Dict[str, Dict[str, int]] = {}
+
+    def open_session(self, outcomes: Dict[str, int]) -> Dict[str, object]:
+        """Start counting the proxied requests of a render, returns its Node.js mediaProxy option"""
+        token = uuid.uuid4().hex
+        self.sessions[token] = outcomes
+        return {"baseUrl": self.base_url, "token": token, "hosts": self.hosts}
+
+    def close_session(self, option: Dict[str, object]):
+        self.sessions.pop(option["token"], None)
+
+    def allowed(self, url: str) -> bool:
+        """Whether the proxy may fetch a URL"""
+        host = (urlsplit(url).hostname or "").lower()
+        if not host or is_internal_host(host):
+            return False
+        return not self.hosts or host in self.hosts
+
+    async def fetch(self, token: str, encoded: str) -> CacheEntry:
+        """Return a proxied file; raises MediaProxyError for a refused request"""
+        outcomes = self.sessions.get(token)
+        if outcomes is None:
+            raise MediaProxyError(404, "Unknown or expired media proxy token")
+        url = decode_url(encoded)
+        if url is None:
+            raise MediaProxyError(400, "Invalid proxied URL")
+        if not self.allowed(url):
+            raise MediaProxyError(403, f"Host not allowed: {urlsplit(url).hostname}")
+        return await self.cache.get(url, outcomes)
+
+
+def hit_ratio(outcomes: Dict[str, int]) -> Optional[float]:
+    """Share of proxied requests that did not download the file again"""
+    total = sum(outcomes.values())
+    if not total:
+        return None
+    return round((total - outcomes.get("misses", 0)) / total, 4)
+
+
+# Global media proxy instance
+media_proxy = MediaProxy()
@@ -0,0 +1,41 @@
+"""Map request models to the camelCase options read by the Node.js renderer"""
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Tuple, Type
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def alias_map(model: Type[BaseModel]) -> Tuple[Tuple[str, str], ...]:
+    """(field name, Node.js option name) pairs of a model, computed once per model
+
+    The option name is the field's serialization_alias, or the field name
+    when it has none.
+    """
+    return tuple(
+        (name, field.serialization_alias or name)
+        for name, field in model.model_fields.items()
+    )
+
+
+def to_node_options(request: BaseModel, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Build renderer options from a request using its alias map
+
+    Only the model's own fields are renamed. Their values (input props,
+    environment variables, ...) are passed through as-is, without being
+    copied or re-keyed; nested models are mapped with their own alias map
+    and enums are replaced by their value. None values are omitted.
+    """
+    options: Dict[str, Any] = {}
+    for name, option in alias_map(type(request)):
+        if name in exclude:
+            continue
+        value = getattr(request, name)
+        if value is None:
+            continue
+        if isinstance(value, BaseModel):
+            value = to_node_options(value)
+        elif isinstance(value, Enum):
+            value = value.value
+        options[option] = value
+    return options
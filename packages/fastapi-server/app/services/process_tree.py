@@ -0,0 +1,73 @@
+"""Helpers for the Node/Chrome/FFmpeg process tree of a worker (Linux /proc)"""
+import os
+import signal
+from typing import Dict, List
+
+
+def _parent_map() -> Dict[int, int]:
+    """Map of pid -> parent pid for every visible process"""
+    parents: Dict[int, int] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return parents
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, fields resume after the last ")"
+                fields = f.read().rsplit(")", 1)[1].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def process_tree(pid: int) -> List[int]:
+    """Return pid followed by all of its descendants"""
+    children: Dict[int, List[int]] = {}
+    for child, parent in _parent_map().items():
+        children.setdefault(parent, []).append(child)
+
+    tree = [pid]
+    index = 0
+    while index < len(tree):
+        tree.extend(children.get(tree[index], []))
+        index += 1
+    return tree
+
+
+def signal_process_tree(pid: int, sig: int = signal.SIGTERM) -> List[int]:
+    """Send a signal to a process and all of its descendants
+
+    Returns the pids that were found, so that processes orphaned by their
+    parent exiting can still be signalled later with signal_pids().
+    """
+    pids = process_tree(pid)
+    signal_pids(pids, sig)
+    return pids
+
+
+def signal_pids(pids: List[int], sig: int):
+    """Send a signal to processes and the process groups they lead
+
+    Chrome is started in its own process group, so every process group
+    led by one of the processes is signalled as well as the processes themselves.
+    """
+    own_group = os.getpgrp()
+
+    for member in pids:
+        try:
+            group = os.getpgid(member)
+            if group == member and group != own_group:
+                os.killpg(group, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    for member in pids:
+        try:
+            os.kill(member, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
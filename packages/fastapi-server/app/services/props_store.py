@@ -0,0 +1,70 @@
+"""Content-addressed storage for large input props passed to Node by path"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+from ..config import settings
+
+
+def encode_props(props: Any) -> bytes:
+    """Compact JSON of input props, as stored and as Node.js receives them"""
+    return json.dumps(props, separators=(",", ":")).encode("utf-8")
+
+
+class PropsStore:
+    """Write input props to disk once, keyed by the hash of their JSON"""
+
+    def __init__(self):
+        self.props_dir = Path(settings.PROPS_DIR)
+        # Number of jobs referencing each file
+        self.refs: Dict[str, int] = {}
+
+    def _write(self, path: Path, payload: bytes):
+        """Write a props file atomically (runs in a thread)"""
+        if path.exists():
+            return
+        self.props_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.props_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    async def put(self, props: Any) -> str:
+        """Store props and return the path of their file"""
+        return await self.put_encoded(await asyncio.to_thread(encode_props, props))
+
+    async def put_encoded(self, payload: bytes) -> str:
+        """Store props already encoded with encode_props and return the path of their file"""
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.props_dir / f"{digest}.json"
+
+        # Take the reference first so a concurrent release() cannot remove the file
+        key = str(path)
+        self.refs[key] = self.refs.get(key, 0) + 1
+        try:
+            await asyncio.to_thread(self._write, path, payload)
+        except BaseException:
+            self.release(key)
+            raise
+
+        print(f"DEBUG: Stored {len(payload)} bytes of input props at {key}", flush=True)
+        return key
+
+    def release(self, path: str):
+        """Drop a job's reference to a props file, removing it when unused"""
+        count = self.refs.get(path, 0) - 1
+        if count > 0:
+            self.refs[path] = count
+            return
+        self.refs.pop(path, None)
+        try:
+            Path(path).unlink(missing_ok=True)
+        except OSError as e:
+            print(f"DEBUG: Could not remove {path}: {str(e)}", flush=True)
+
+
+# Global props store instance
+props_store = PropsStore()
@@ -2,14 +2,30 @@
 import asyncio
 import uuid
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
-
-from .renderer import NodeRenderer
+from pathlib import Path
+
+from ..config import settings
+from .bundles import bundle_registry
+from .media_proxy import hit_ratio
+from .metrics import metrics
+from .props_store import props_store
+from .renderer import RenderContext, get_renderer
+from .resources import composition_usage
+from .result_cache import result_cache, result_key
+from .scheduler import JobScheduler, expected_frames, resolve_priority, sort_key
+from .scratch import scratch
+from .segments import can_segment, render_segmented
+from .startup import startup
 from .storage import storage
 
 
+# Job types, each with its own queue (see scheduler.JobScheduler)
+JOB_TYPES = ("still", "media")
+
+
 class JobStatus(str, Enum):
     """Status of a render job"""
     QUEUED = "queued"
@@ -34,32 +50,79 @@ class Job:
     output_url: Optional[str] = None
     error: Optional[str] = None
     cancel_requested: bool = False
+    cancel_requested_at: Optional[float] = None  # event loop time
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    # Deadlines in milliseconds (None = server default, 0 = unlimited)
+    timeout_ms: Optional[int] = None
+    stall_timeout_ms: Optional[int] = None
+    # Set by the watchdog when it kills the job
+    abort_reason: Optional[str] = None
+    priority_class: str = "batch"  # "interactive" or "batch"
+    # Scheduling priority, 0 (most urgent) to 9, and when the job was queued (event loop time)
+    priority: int = 5
+    enqueued_monotonic: Optional[float] = None
+    # URLs of the CPU profile and Chrome trace of a profiled job
+    profile_urls: Dict[str, str] = field(default_factory=dict)
+    # Hash of the options (result cache and coalescing), whether the output may be
+    # stored in the result cache, and whether it came from it
+    result_key: Optional[str] = None
+    cacheable: bool = False
+    cached: bool = False
+    # Identical submissions coalesced into this job's render (see RenderQueue.enqueue),
+    # or the job whose render this one mirrors
+    followers: List[str] = field(default_factory=list)
+    leader_id: Optional[str] = None
+    # Cancelled by its submitter while followers still wait for the render
+    detached: bool = False
+    context: RenderContext = field(default_factory=RenderContext, repr=False)
+
+    @property
+    def visible_status(self) -> JobStatus:
+        """Status reported to the submitter of the job"""
+        return JobStatus.CANCELLED if self.detached else self.status
+
+    @property
+    def logs(self):
+        """Bounded ring buffer of the renderer's stderr output"""
+        return self.context.log
 
     def to_dict(self) -> dict:
         """Convert job to dictionary"""
         return {
             "job_id": self.id,
-            "status": self.status,
+            "status": self.visible_status,
             "progress": self.progress,
             "created_at": self.created_at.isoformat(),
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "output_url": self.output_url,
             "output_path": self.output_path,
-            "error": self.error
+            "error": self.error,
+            "resources": self.context.usage.to_dict() if self.context.usage.samples else None,
+            "profile": self.profile_urls or None,
+            "cached": self.cached,
+            "priority": self.priority,
+            "media_cache": {**self.context.media, "hit_ratio": hit_ratio(self.context.media)} if self.context.media else None
         }
 
 
 class RenderQueue:
-    """Async job queue for rendering tasks"""
+    """Async job queue for rendering tasks, served in priority order (see scheduler.py)"""
 
-    def __init__(self, max_concurrent: int = 2):
+    def __init__(self, max_concurrent: int = 2, pools: Optional[Dict[str, int]] = None, work_stealing: bool = False):
         self.jobs: Dict[str, Job] = {}
-        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queue = JobScheduler(JOB_TYPES)
         self.max_concurrent = max_concurrent
+        # Workers per job type; None = max_concurrent workers shared by all job types
+        self.pools = pools
+        # Whether a pool takes jobs of the other types while its own queue is empty
+        self.work_stealing = work_stealing
         self.active_tasks: set = set()
-        self.renderer = NodeRenderer()
+        # Result key -> id of the queued or running job rendering it
+        self.inflight: Dict[str, str] = {}
+        self.renderer = get_renderer()
         self._workers: List[asyncio.Task] = []
+        self._watchdog_task: Optional[asyncio.Task] = None
         self._running = False
 
     async def start(self):
@@ -69,42 +132,101 @@ class RenderQueue:
             return
 
         self._running = True
-        print(f"DEBUG: Starting {self.max_concurrent} queue workers", flush=True)
-        for i in range(self.max_concurrent):
-            worker = asyncio.create_task(self._worker(f"worker-{i}"))
-            self._workers.append(worker)
+        if self.pools is None:
+            print(f"DEBUG: Starting {self.max_concurrent} queue workers", flush=True)
+            for i in range(self.max_concurrent):
+                worker = asyncio.create_task(self._worker(f"worker-{i}", JOB_TYPES))
+                self._workers.append(worker)
+        else:
+            if sum(self.pools.values()) > self.renderer.pool.size:
+                # Extra queue workers would wait for a Node worker behind the other pools
+                print(f"DEBUG: Queue pools {self.pools} exceed the {self.renderer.pool.size} Node workers", flush=True)
+            # Job types without workers of their own are always taken by the other pools
+            unserved = tuple(job_type for job_type in JOB_TYPES if not self.pools.get(job_type))
+            for job_type, size in self.pools.items():
+                others = tuple(other for other in JOB_TYPES if other != job_type)
+                fallback = others if self.work_stealing else unserved
+                print(f"DEBUG: Starting {size} {job_type} queue workers (fallback: {fallback or 'none'})", flush=True)
+                for i in range(size):
+                    worker = asyncio.create_task(self._worker(f"{job_type}-{i}", (job_type,), fallback))
+                    self._workers.append(worker)
         print(f"DEBUG: {len(self._workers)} workers started", flush=True)
 
+        self._watchdog_task = asyncio.create_task(self._watchdog())
+
     async def stop(self):
         """Stop queue workers"""
         self._running = False
-        for worker in self._workers:
-            worker.cancel()
-        await asyncio.gather(*self._workers, return_exceptions=True)
+        tasks = [*self._workers, self._watchdog_task] if self._watchdog_task else list(self._workers)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _watchdog(self):
+        """Fail in-progress jobs that exceed their deadline or stop reporting progress"""
+        while True:
+            await asyncio.sleep(settings.WATCHDOG_INTERVAL_SECONDS)
+            now = asyncio.get_event_loop().time()
+
+            for job in list(self.jobs.values()):
+                if job.status != JobStatus.IN_PROGRESS or job.task is None or job.task.done():
+                    continue
+                if job.cancel_requested or job.abort_reason:
+                    continue
+
+                reason = self._deadline_exceeded(job, now)
+                if reason:
+                    print(f"DEBUG: Watchdog aborting job {job.id}: {reason}", flush=True)
+                    metrics.inc("jobs_timed_out")
+                    job.abort_reason = reason
+                    job.task.cancel()
 
-    async def _worker(self, name: str):
-        """Worker process that pulls from queue"""
+    def _deadline_exceeded(self, job: Job, now: float) -> Optional[str]:
+        """Return why a job must be aborted, or None if it is within its deadlines"""
+        timeout_ms = settings.RENDER_TIMEOUT_MS if job.timeout_ms is None else job.timeout_ms
+        stall_ms = settings.RENDER_STALL_TIMEOUT_MS if job.stall_timeout_ms is None else job.stall_timeout_ms
+
+        # Both clocks start once the job has a worker (see NodeRenderer._execute)
+        if timeout_ms and job.context.started is not None:
+            if (now - job.context.started) * 1000 > timeout_ms:
+                return f"Render exceeded its timeout of {timeout_ms} ms"
+
+        if stall_ms and job.context.last_activity is not None:
+            if (now - job.context.last_activity) * 1000 > stall_ms:
+                return f"Render made no progress for {stall_ms} ms"
+
+        return None
+
+    async def _worker(self, name: str, job_types: Tuple[str, ...], fallback: Tuple[str, ...] = ()):
+        """Worker process that pulls jobs of job_types from the queue, or of fallback when there are none"""
         print(f"DEBUG: Worker {name} started", flush=True)
         while self._running:
-            try:
-                print(f"DEBUG: Worker {name} waiting for job...", flush=True)
-                job_id = await self.queue.get()
-                print(f"DEBUG: Worker {name} got job {job_id}", flush=True)
+            print(f"DEBUG: Worker {name} waiting for job...", flush=True)
+            job_id = await self.queue.get(job_types, fallback)
+            print(f"DEBUG: Worker {name} got job {job_id}", flush=True)
 
+            try:
                 job = self.jobs.get(job_id)
                 if not job:
                     print(f"DEBUG: Worker {name} - job {job_id} not found", flush=True)
                     continue
 
-                if job.cancel_requested:
+                if job.cancel_requested or job.status == JobStatus.CANCELLED:
                     print(f"DEBUG: Worker {name} - job {job_id} was cancelled", flush=True)
                     job.status = JobStatus.CANCELLED
-                    job.completed_at = datetime.utcnow()
+                    job.completed_at = job.completed_at or datetime.utcnow()
                     continue
 
+                wait = asyncio.get_event_loop().time() - job.enqueued_monotonic
+                metrics.observe("queue_wait_seconds", wait)
+                metrics.observe(f"queue_wait_seconds_{job.type}", wait)
+                if job.type not in job_types:
+                    metrics.inc(f"queue_stolen_{job.type}")
+                    print(f"DEBUG: Worker {name} takes {job.type} job {job_id} while its queue is empty", flush=True)
+
                 # Process the job
                 print(f"DEBUG: Worker {name} processing job {job_id}", flush=True)
-                await self._process_job(job)
+                await self._run_job(job)
                 print(f"DEBUG: Worker {name} finished job {job_id}", flush=True)
 
             except Exception as e:
@@ -118,75 +240,109 @@ class RenderQueue:
                     job.completed_at = datetime.utcnow()
 
             finally:
-                self.queue.task_done()
                 self.active_tasks.discard(job_id)
+                job = self.jobs.get(job_id)
+                if job and job.options.get('inputPropsPath'):
+                    props_store.release(job.options['inputPropsPath'])
+                if job:
+                    await self._settle_followers(job)
+
+    async def _run_job(self, job: Job):
+        """Run a job in its own task so that cancellation can interrupt it"""
+        job.task = asyncio.create_task(self._process_job(job))
+        try:
+            await asyncio.wait([job.task])
+        except asyncio.CancelledError:
+            # The queue itself is shutting down
+            job.task.cancel()
+            raise
+
+        if job.task.cancelled():
+            self._finish_interrupted(job)
+        else:
+            job.task.result()
+
+    def _finish_interrupted(self, job: Job):
+        """Mark a job interrupted by cancellation or the watchdog and remove its partial output"""
+        job.completed_at = datetime.utcnow()
+
+        output_path = job.options.get('outputPath') or job.options.get('output_path')
+        if output_path:
+            storage.remove_file(output_path)
+
+        if job.abort_reason:
+            job.status = JobStatus.FAILED
+            job.error = job.abort_reason
+            return
+
+        job.status = JobStatus.CANCELLED
+        metrics.inc("jobs_cancelled")
+        if job.cancel_requested_at is not None:
+            latency = asyncio.get_event_loop().time() - job.cancel_requested_at
+            metrics.observe("cancel_to_slot_free_seconds", latency)
+            print(f"DEBUG: Job {job.id} cancelled, slot freed after {latency:.3f}s", flush=True)
 
     async def _process_job(self, job: Job):
         """Execute a single render job"""
         print(f"DEBUG: Processing job {job.id} (type: {job.type})", flush=True)
-        print(f"DEBUG: Job options: {job.options}", flush=True)
+        print(f"DEBUG: Job options: {sorted(job.options)}", flush=True)
 
         job.status = JobStatus.IN_PROGRESS
         job.started_at = datetime.utcnow()
         self.active_tasks.add(job.id)
+        self._mirror(job)
 
         # Progress callback
         async def on_progress(data: dict):
             job.progress = data.get('progress', 0.0)
+            self._mirror(job)
             print(f"DEBUG: Job {job.id} progress: {job.progress}", flush=True)
 
+        # Render and encode in a RAM-backed working directory (TMPDIR of the Node.js job)
+        area = scratch.allocate(job.id, job.type)
+        job.options['scratchDir'] = str(area.path)
+        if job.options.get('profile'):
+            job.options.setdefault('profileTraceFrames', settings.PROFILE_TRACE_FRAMES)
+
         try:
             if job.type == "media":
-                # Determine extension based on codec
-                codec = job.options.get('codec', 'h264')  # Changed default to h264
-                if codec == 'prores':
-                    extension = 'mov'
-                else:
-                    extension = 'mp4'
-
-                output_path = job.options.get('output_path')
+                output_path = self._output_path(job)
 
-                if output_path:
-                    # Verify or correct the file extension
-                    from pathlib import Path
-                    path_obj = Path(output_path)
-                    current_ext = path_obj.suffix.lstrip('.')
-
-                    if current_ext != extension:
-                        # Wrong extension, replace it
-                        output_path = str(path_obj.with_suffix(f'.{extension}'))
-                        print(f"DEBUG: Corrected output extension from .{current_ext} to .{extension}", flush=True)
-                else:
-                    # No output path specified, generate one
-                    output_path = storage.get_output_path(job.id, extension)
-
-                # Update BOTH output_path (snake_case) AND outputPath (camelCase)
+                # output_path is the final location, Node.js renders to outputPath in scratch
                 job.options['output_path'] = output_path
-                job.options['outputPath'] = output_path  # Node.js reads this field
-                print(f"DEBUG: Rendering media to {output_path} (codec: {codec})", flush=True)
+                job.options['outputPath'] = str(area.path / Path(output_path).name)
+                print(f"DEBUG: Rendering media to {output_path} (codec: {job.options.get('codec', 'h264')})", flush=True)
 
-                await self.renderer.render_media(job.options, on_progress)
+                if can_segment(job.options):
+                    await render_segmented(self.renderer, job.options, job.context, area.path, on_progress)
+                else:
+                    await self.renderer.render_media(job.options, on_progress, job.context)
+                await asyncio.to_thread(storage.store_output, job.options['outputPath'], output_path)
 
                 job.output_path = output_path
                 job.output_url = storage.get_url(output_path)
                 print(f"DEBUG: Media rendered successfully to {output_path}", flush=True)
 
             elif job.type == "still":
-                output_path = job.options.get('output_path') or \
-                    storage.get_output_path(job.id, 'png')
+                output_path = self._output_path(job)
 
                 job.options['output_path'] = output_path
+                job.options['outputPath'] = str(area.path / Path(output_path).name)
                 print(f"DEBUG: Rendering still to {output_path}", flush=True)
 
-                await self.renderer.render_still(job.options, on_progress)
+                await self.renderer.render_still(job.options, on_progress, job.context)
+                await asyncio.to_thread(storage.store_output, job.options['outputPath'], output_path)
 
                 job.output_path = output_path
                 job.output_url = storage.get_url(output_path)
                 print(f"DEBUG: Still rendered successfully to {output_path}", flush=True)
+                startup.mark("first_still_completed")
 
             job.status = JobStatus.COMPLETED
             job.progress = 1.0
             print(f"DEBUG: Job {job.id} completed successfully", flush=True)
+            if job.cacheable:
+                await result_cache.put(job.result_key, job.output_path)
 
         except Exception as e:
             print(f"DEBUG: Job {job.id} failed: {str(e)}", flush=True)
@@ -197,37 +353,241 @@ class RenderQueue:
             raise
 
         finally:
+            if job.options.get('profile'):
+                await self._collect_profile(job, area.path)
+            scratch.release(area)
+            composition_usage.record(job.options.get('composition', 'unknown'), job.context.usage)
             job.completed_at = datetime.utcnow()
 
-    async def enqueue(self, job_type: str, options: dict) -> str:
+    def _output_path(self, job: Job) -> str:
+        """Final location of a job's output, with the extension of its format"""
+        if job.type == "still":
+            return job.options.get('output_path') or storage.get_output_path(job.id, 'png')
+
+        # Determine extension based on codec
+        codec = job.options.get('codec', 'h264')  # Changed default to h264
+        if codec == 'prores':
+            extension = 'mov'
+        else:
+            extension = 'mp4'
+
+        output_path = job.options.get('output_path')
+
+        if output_path:
+            # Verify or correct the file extension
+            path_obj = Path(output_path)
+            current_ext = path_obj.suffix.lstrip('.')
+
+            if current_ext != extension:
+                # Wrong extension, replace it
+                output_path = str(path_obj.with_suffix(f'.{extension}'))
+                print(f"DEBUG: Corrected output extension from .{current_ext} to .{extension}", flush=True)
+            return output_path
+
+        # No output path specified, generate one
+        return storage.get_output_path(job.id, extension)
+
+    async def _complete_from_cache(self, job: Job) -> bool:
+        """Complete a job with the cached output of an identical render, if there is one"""
+        output_path = self._output_path(job)
+        if not await result_cache.fetch(job.result_key, output_path):
+            return False
+
+        job.options['output_path'] = output_path
+        job.output_path = output_path
+        job.output_url = storage.get_url(output_path)
+        job.cached = True
+        job.status = JobStatus.COMPLETED
+        job.progress = 1.0
+        job.started_at = job.completed_at = datetime.utcnow()
+        if job.options.get('inputPropsPath'):
+            props_store.release(job.options['inputPropsPath'])
+        print(f"DEBUG: Job {job.id} completed from the result cache", flush=True)
+        return True
+
+    def _mirror(self, job: Job):
+        """Copy the state of a running render to the jobs coalesced into it"""
+        for follower_id in job.followers:
+            follower = self.jobs.get(follower_id)
+            if follower is not None and follower.status != JobStatus.CANCELLED:
+                follower.status = job.status
+                follower.started_at = job.started_at
+                follower.progress = job.progress
+
+    async def _settle_followers(self, job: Job):
+        """Give the result of a finished render to the jobs coalesced into it"""
+        if job.result_key and self.inflight.get(job.result_key) == job.id:
+            del self.inflight[job.result_key]
+
+        for follower_id in job.followers:
+            follower = self.jobs.get(follower_id)
+            if follower is None or follower.status == JobStatus.CANCELLED:
+                continue
+            follower.completed_at = datetime.utcnow()
+            if job.status != JobStatus.COMPLETED:
+                follower.status = JobStatus.FAILED
+                follower.error = job.error or "The shared render was cancelled"
+                continue
+            # Every job gets its own output file, a hardlink of the render's
+            output_path = self._output_path(follower)
+            try:
+                await asyncio.to_thread(storage.link_output, job.output_path, output_path)
+            except OSError as e:
+                follower.status = JobStatus.FAILED
+                follower.error = f"Could not store output: {str(e)}"
+                continue
+            follower.options['output_path'] = output_path
+            follower.output_path = output_path
+            follower.output_url = storage.get_url(output_path)
+            follower.status = JobStatus.COMPLETED
+            follower.progress = 1.0
+
+        if job.detached:
+            # Rendered for the followers only, its submitter had cancelled it
+            if job.output_path:
+                storage.remove_file(job.output_path)
+            job.output_path = job.output_url = None
+            job.status = JobStatus.CANCELLED
+
+    def _attach(self, job: Job, leader: Job):
+        """Make a job mirror the render of an identical queued or running job"""
+        job.leader_id = leader.id
+        job.status = leader.status
+        job.started_at = leader.started_at
+        job.progress = leader.progress
+        leader.followers.append(job.id)
+        # The follower never runs, its props file is not needed
+        if job.options.get('inputPropsPath'):
+            props_store.release(job.options['inputPropsPath'])
+        metrics.inc("jobs_coalesced")
+        print(f"DEBUG: Job {job.id} coalesced into job {leader.id}", flush=True)
+
+    async def _collect_profile(self, job: Job, work_dir: Path):
+        """Move the profile files written by the worker next to the job's output"""
+        for name, source, extension in (
+            ("cpuprofile", "renderer.cpuprofile", "cpuprofile"),
+            ("trace", "chrome-trace.json", "trace.json"),
+        ):
+            if not (work_dir / source).exists():
+                continue
+            destination = storage.get_output_path(job.id, extension)
+            try:
+                await asyncio.to_thread(storage.store_output, str(work_dir / source), destination)
+                job.profile_urls[name] = storage.get_url(destination)
+            except OSError as e:
+                print(f"DEBUG: Could not store {name} of job {job.id}: {str(e)}", flush=True)
+
+    async def enqueue(
+        self,
+        job_type: str,
+        options: dict,
+        timeout_ms: Optional[int] = None,
+        stall_timeout_ms: Optional[int] = None,
+        priority_class: str = "batch",
+        priority: Optional[int] = None
+    ) -> str:
         """Add a new job to the queue"""
         job_id = str(uuid.uuid4())
 
+        if priority is None:
+            priority = resolve_priority(None, priority_class)
         job = Job(
             id=job_id,
             type=job_type,
-            options=options
+            options=options,
+            timeout_ms=timeout_ms,
+            stall_timeout_ms=stall_timeout_ms,
+            priority_class=priority_class,
+            priority=priority
         )
+        job.context.priority_class = priority_class
 
         self.jobs[job_id] = job
-        print(f"DEBUG: Enqueueing job {job_id} (type: {job_type})", flush=True)
-        await self.queue.put(job_id)
+        # Profiled renders are never answered from (or stored in) the result cache, and only
+        # uploaded bundles are immutable: a serve_url can be redeployed with the same options
+        if result_cache.enabled and not options.get('profile') and bundle_registry.is_bundle_url(options.get('serveUrl') or ''):
+            job.result_key = result_key(job_type, options)
+            job.cacheable = True
+            if await self._complete_from_cache(job):
+                return job_id
+
+        # Identical submissions while a render is queued or running share it
+        if settings.RENDER_COALESCING_ENABLED and not options.get('profile'):
+            job.result_key = job.result_key or result_key(job_type, options)
+            leader = self.jobs.get(self.inflight.get(job.result_key, ""))
+            if leader is not None and leader.status in (JobStatus.QUEUED, JobStatus.IN_PROGRESS):
+                self._attach(job, leader)
+                return job_id
+            self.inflight[job.result_key] = job_id
+
+        print(f"DEBUG: Enqueueing job {job_id} (type: {job_type}, priority: {priority})", flush=True)
+        job.enqueued_monotonic = asyncio.get_event_loop().time()
+        self.queue.put(job_id, sort_key(job.enqueued_monotonic, priority, expected_frames(job_type, options)), job_type)
         print(f"DEBUG: Job {job_id} added to queue, queue size: {self.queue.qsize()}", flush=True)
 
         return job_id
 
     async def cancel(self, job_id: str) -> bool:
-        """Cancel a job"""
+        """Cancel a job
+
+        A shared render is only stopped once its own job and every job
+        coalesced into it are cancelled.
+        """
         job = self.jobs.get(job_id)
         if not job:
             return False
 
+        if job.leader_id:
+            return self._unsubscribe(job)
+
+        active = (JobStatus.QUEUED, JobStatus.IN_PROGRESS)
+        if job.status in active and not job.detached and self._has_followers(job):
+            job.detached = True
+            job.completed_at = datetime.utcnow()
+            print(f"DEBUG: Job {job_id} cancelled, its render continues for coalesced jobs", flush=True)
+            return True
+        if job.detached:
+            return False
+
+        return self._cancel_render(job)
+
+    def _has_followers(self, job: Job) -> bool:
+        return any(
+            self.jobs[follower_id].status != JobStatus.CANCELLED
+            for follower_id in job.followers if follower_id in self.jobs
+        )
+
+    def _unsubscribe(self, follower: Job) -> bool:
+        """Cancel a coalesced job, and the shared render if nobody else waits for it"""
+        if follower.status not in (JobStatus.QUEUED, JobStatus.IN_PROGRESS):
+            return False
+        follower.status = JobStatus.CANCELLED
+        follower.completed_at = datetime.utcnow()
+
+        leader = self.jobs.get(follower.leader_id)
+        if leader is not None and leader.detached and not self._has_followers(leader):
+            print(f"DEBUG: Last subscriber of job {leader.id} cancelled, stopping its render", flush=True)
+            self._cancel_render(leader)
+        return True
+
+    def _cancel_render(self, job: Job) -> bool:
+        """Cancel a job's own render"""
         if job.status == JobStatus.QUEUED:
             job.status = JobStatus.CANCELLED
             job.completed_at = datetime.utcnow()
+            # Taken out of the queue at once rather than when a worker reaches it
+            if self.queue.remove(job.id):
+                if job.options.get('inputPropsPath'):
+                    props_store.release(job.options['inputPropsPath'])
+                if job.result_key and self.inflight.get(job.result_key) == job.id:
+                    del self.inflight[job.result_key]
             return True
         elif job.status == JobStatus.IN_PROGRESS:
             job.cancel_requested = True
+            job.cancel_requested_at = asyncio.get_event_loop().time()
+            # Interrupt the render: the renderer kills the worker's process tree
+            if job.task and not job.task.done():
+                job.task.cancel()
             return True
 
         return False
@@ -246,12 +606,27 @@ class RenderQueue:
         jobs = list(self.jobs.values())
 
         if status:
-            jobs = [j for j in jobs if j.status == status]
+            jobs = [j for j in jobs if j.visible_status == status]
 
         jobs.sort(key=lambda j: j.created_at, reverse=True)
 
         return jobs[offset:offset+limit], len(jobs)
 
 
-# Global queue instance (will be initialized in main.py)
+# Global queue instance (created on startup in main.py, or lazily on first use)
 queue: Optional[RenderQueue] = None
+
+
+def get_queue() -> RenderQueue:
+    """Return the global queue, creating it on first use"""
+    global queue
+    if queue is None:
+        pools = None
+        if settings.MAX_CONCURRENT_STILLS or settings.MAX_CONCURRENT_MEDIA:
+            pools = {"still": settings.MAX_CONCURRENT_STILLS, "media": settings.MAX_CONCURRENT_MEDIA}
+        queue = RenderQueue(
+            max_concurrent=settings.MAX_CONCURRENT_RENDERS,
+            pools=pools,
+            work_stealing=settings.QUEUE_WORK_STEALING
+        )
+    return queue
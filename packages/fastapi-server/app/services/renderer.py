@@ -1,169 +1,286 @@
-"""Node.js renderer subprocess wrapper"""
-import json
-import subprocess
+"""Node.js renderer worker wrapper"""
 import asyncio
-import os
+from collections import deque
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, Callable, Awaitable
-from pathlib import Path
 from ..config import settings
+from .bundles import bundle_registry
+from .composition_cache import composition_cache, composition_key
+from .isolation import isolation
+from .media_proxy import media_proxy
+from .resources import ResourceTracker, ResourceUsage
+from .worker_pool import NodeWorker, WorkerPool, worker_pool
+
+
+def new_log_buffer() -> deque:
+    """Create a bounded ring buffer for a job's renderer output"""
+    return deque(maxlen=settings.JOB_LOG_MAX_LINES)
+
+
+def format_log_tail(log: Optional[deque]) -> str:
+    """Format the last lines of a job log for inclusion in an error"""
+    if not log:
+        return ""
+    tail = list(log)[-settings.JOB_LOG_ERROR_TAIL_LINES:]
+    return "\nstderr (last {} lines):\n{}".format(len(tail), "\n".join(tail))
+
+
+@dataclass
+class RenderContext:
+    """Per-job state shared between the queue and the renderer"""
+    # Bounded ring buffer of the renderer's stderr output
+    log: deque = field(default_factory=new_log_buffer)
+    # Event loop time the job first got a worker, its timeout counts from there
+    started: Optional[float] = None
+    # Event loop time of the last message received from the worker (None while waiting for one)
+    last_activity: Optional[float] = None
+    # Worker currently executing the job
+    worker: Optional[NodeWorker] = None
+    # Process isolation class of the job ("interactive" or "batch")
+    priority_class: Optional[str] = None
+    # CPU, memory and I/O of the job's process tree
+    usage: ResourceUsage = field(default_factory=ResourceUsage)
+    # Composition metadata reported by the worker (selectComposition result)
+    composition: Optional[Dict[str, Any]] = None
+    # How the job's requests to the media proxy were served (hits, misses, ...)
+    media: Dict[str, int] = field(default_factory=dict)
 
 
 class NodeRenderer:
     """Wrapper for Node.js renderer process"""
 
-    def __init__(self):
-        # Go up from services/ to app/, then to node/
-        base_path = Path(__file__).parent.parent.parent
-        self.node_path = base_path / "node" / "renderer.ts"
-        self.node_modules_path = base_path / "node" / "node_modules"
-        if not self.node_path.exists():
-            raise RuntimeError(f"Node renderer not found at {self.node_path}")
+    def __init__(self, pool: Optional[WorkerPool] = None):
+        self.pool = pool or worker_pool
 
     async def render_media(
         self,
         options: Dict[str, Any],
-        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        context: Optional[RenderContext] = None
     ) -> Dict[str, Any]:
-        """Execute renderMedia command in Node.js subprocess"""
-        input_data = {
-            "command": "renderMedia",
-            "options": options
-        }
-        return await self._execute(input_data, on_progress)
+        """Execute renderMedia command on a Node.js worker"""
+        return await self._render("renderMedia", options, on_progress, context)
 
     async def render_still(
         self,
         options: Dict[str, Any],
-        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        context: Optional[RenderContext] = None
+    ) -> Dict[str, Any]:
+        """Execute renderStill command on a Node.js worker"""
+        return await self._render("renderStill", options, on_progress, context)
+
+    async def _render(
+        self,
+        command: str,
+        options: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        context: Optional[RenderContext]
     ) -> Dict[str, Any]:
-        """Execute renderStill command in Node.js subprocess"""
+        """Run a render, reusing cached composition metadata instead of selectComposition"""
+        if context is None:
+            context = RenderContext()
+        key = composition_key(options)
+        metadata = composition_cache.get(key)
+        if metadata is not None:
+            options = {**options, "compositionMetadata": metadata}
+            context.composition = metadata
+
+        # Remote media in the props is fetched through the local caching proxy
+        proxy = media_proxy.open_session(context.media) if media_proxy.enabled else None
+        if proxy:
+            options = {**options, "mediaProxy": proxy}
+
+        try:
+            return await self._execute({"command": command, "options": options}, on_progress, context)
+        finally:
+            if proxy:
+                media_proxy.close_session(proxy)
+            # The worker reports the composition before rendering, keep it even if the render fails
+            if metadata is None and context.composition is not None:
+                immutable = bundle_registry.is_bundle_url(options.get("serveUrl", ""))
+                await composition_cache.put(key, context.composition, immutable=immutable)
+
+    async def select_composition(
+        self,
+        options: Dict[str, Any],
+        context: Optional[RenderContext] = None
+    ) -> Dict[str, Any]:
+        """Metadata of the composition a render would use (cached, see composition_cache)"""
+        if context is None:
+            context = RenderContext()
+        await self._render("selectComposition", options, None, context)
+        return context.composition
+
+    async def combine_segments(
+        self,
+        options: Dict[str, Any],
+        context: Optional[RenderContext] = None
+    ) -> Dict[str, Any]:
+        """Concatenate rendered segments (stream copy) on a Node.js worker"""
         input_data = {
-            "command": "renderStill",
+            "command": "combineSegments",
             "options": options
         }
-        return await self._execute(input_data, on_progress)
+        return await self._execute(input_data, None, context)
 
     async def get_compositions(
         self,
         options: Dict[str, Any]
     ) -> list[Dict[str, Any]]:
-        """Execute getCompositions command in Node.js subprocess"""
+        """Execute getCompositions command on a Node.js worker"""
         input_data = {
             "command": "getCompositions",
             "options": options
         }
-        result = await self._execute(input_data, None)
+        # Composition listing is not a queued job, bound it here instead of the watchdog
+        result = await asyncio.wait_for(
+            self._execute(input_data, None),
+            timeout=settings.COMPOSITIONS_TIMEOUT_MS / 1000
+        )
         return result.get("data", [])
 
+    async def warm_up(self):
+        """Launch the browser of every worker ahead of the first job"""
+        # Each request holds its worker until done, so every worker gets one
+        results = await asyncio.gather(
+            *(self._execute({"command": "warmUp", "options": {}}) for _ in range(self.pool.size)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"DEBUG: Browser warm-up failed: {str(result)}", flush=True)
+
     async def _execute(
         self,
         input_data: Dict[str, Any],
-        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        context: Optional[RenderContext] = None
     ) -> Dict[str, Any]:
-        """Execute Node.js process and handle output"""
-        # Use tsx to run TypeScript directly
-        tsx_path = self.node_modules_path / ".bin" / "tsx"
-
-        # Debug logging
-        print(f"DEBUG: Executing Node.js with input: {json.dumps(input_data, indent=2)}", flush=True)
-
-        process = await asyncio.create_subprocess_exec(
-            str(tsx_path),
-            str(self.node_path),
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=str(self.node_path.parent),
-            env={**{"NODE_PATH": os.environ.get("NODE_PATH", "/usr/local/lib/node_modules")}, **os.environ}
-        )
+        """Run a command on a pooled Node.js worker and handle its output"""
+        # Never log the options themselves: input props can be several megabytes
+        print(f"DEBUG: Executing {input_data['command']} with options: {sorted(input_data['options'])}", flush=True)
 
-        print(f"DEBUG: Process started with PID: {process.pid}", flush=True)
+        # Resources are only accounted for jobs, which pass their context
+        track_resources = context is not None and settings.RESOURCE_SAMPLE_SECONDS > 0
+        if context is None:
+            context = RenderContext()
 
-        # Write input to stdin
-        stdin_json = json.dumps(input_data) + "\n"
-        process.stdin.write(stdin_json.encode('utf-8'))
-        process.stdin.close()
+        # Waiting for a worker shared with other jobs is not a stall
+        context.last_activity = None
+        async with self.pool.lease() as worker:
+            # Collect the worker's stderr into this job's ring buffer
+            worker.log_sink = context.log
+            context.worker = worker
+            context.last_activity = asyncio.get_event_loop().time()
+            if context.started is None:
+                context.started = context.last_activity
+            request_id = None
+            tracker = sampler = None
+            try:
+                await self._isolate(worker, context.priority_class)
+                if track_resources:
+                    tracker = await asyncio.to_thread(ResourceTracker, worker.pid, context.usage)
+                    sampler = asyncio.create_task(self._sample_resources(tracker))
+                request_id = await worker.send(input_data["command"], input_data["options"])
+                print(f"DEBUG: Request {request_id} sent to worker {worker.id} (PID: {worker.pid})", flush=True)
+                result = await self._read_messages(worker, request_id, on_progress, context)
+                if tracker:
+                    await asyncio.to_thread(tracker.sample)
+                return result
+            except asyncio.CancelledError:
+                # Job cancelled or timed out: stop Node, Chrome and FFmpeg, the pool replaces the worker
+                print(f"DEBUG: Request {request_id} cancelled, terminating worker {worker.id}", flush=True)
+                await worker.terminate(settings.CANCEL_GRACE_SECONDS)
+                raise
+            finally:
+                if sampler:
+                    sampler.cancel()
+                worker.log_sink = None
+                context.worker = None
+                if request_id is not None:
+                    worker.finish(request_id)
 
-        # Read output line by line with timeout
-        final_result = {}
-        line_count = 0
-        last_progress_time = asyncio.get_event_loop().time()
-        timeout_seconds = 1800  # 30 minutes timeout (for encoding with large videos)
-        per_line_timeout = 120.0  # 120 seconds timeout per line (FFmpeg can be slow)
+    async def _isolate(self, worker: NodeWorker, priority_class: Optional[str]):
+        """Move the worker's process tree into the job's priority class"""
+        if not isolation.enabled or not priority_class or worker.priority_class == priority_class:
+            return
+        previous = worker.priority_class
+        # Recorded even if only partly applied: the nice level may have been raised all the same
+        worker.priority_class = priority_class
+        if not await asyncio.to_thread(isolation.apply, worker.pid, priority_class) and previous is not None:
+            # Possibly stuck in the previous class (an unprivileged process cannot lower its nice
+            # level again), a fresh worker starts from the server's own settings
+            print(f"DEBUG: Worker {worker.id} could not leave '{previous}' isolation, retiring it", flush=True)
+            worker.retire = True
+
+    async def _sample_resources(self, tracker: ResourceTracker):
+        """Sample the job's process tree until cancelled"""
+        while True:
+            await asyncio.sleep(settings.RESOURCE_SAMPLE_SECONDS)
+            await asyncio.to_thread(tracker.sample)
+
+    async def _read_messages(
+        self,
+        worker: NodeWorker,
+        request_id: int,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        context: RenderContext
+    ) -> Dict[str, Any]:
+        """Consume the messages of one request until it completes
 
-        print(f"DEBUG: Started reading process output (timeout: {timeout_seconds}s total, {per_line_timeout}s per line)", flush=True)
+        There is no timeout here: deadlines and stalls are enforced by the
+        queue's watchdog, which cancels the job (see RenderQueue._watchdog).
+        """
+        message_count = 0
 
         while True:
-            try:
-                # Wait for output with timeout
-                line = await asyncio.wait_for(
-                    process.stdout.readline(),
-                    timeout=per_line_timeout
+            data = await worker.receive(request_id)
+
+            if data is None:
+                print(f"DEBUG: Worker {worker.id} exited after {message_count} messages", flush=True)
+                # Give the stderr reader a moment to collect the last words of the worker
+                await asyncio.sleep(0.1)
+                raise RuntimeError(
+                    f"Node.js worker exited unexpectedly (return code: {worker.process.returncode}){format_log_tail(context.log)}"
                 )
-            except asyncio.TimeoutError:
-                # Check if process is still running
-                if process.returncode is not None:
-                    break
-
-                # Check if we've exceeded total timeout
-                current_time = asyncio.get_event_loop().time()
-                time_since_progress = current_time - last_progress_time
-                if time_since_progress > timeout_seconds:
-                    print(f"DEBUG: Process timeout after {timeout_seconds}s with no progress", flush=True)
-                    process.kill()
-                    raise RuntimeError(f"Process timeout after {timeout_seconds} seconds")
-
-                # Log timeout but continue waiting (FFmpeg encoding is slow)
-                print(f"DEBUG: No output for {int(time_since_progress)}s, continuing to wait... (timeout at {timeout_seconds}s)", flush=True)
-                continue
-
-            if not line:
-                print(f"DEBUG: EOF reached after {line_count} lines", flush=True)
-                break
-
-            line_count += 1
-            line_str = line.decode('utf-8').strip()
 
-            try:
-                data = json.loads(line_str)
-
-                if data.get('type') == 'progress':
-                    last_progress_time = asyncio.get_event_loop().time()  # Update last activity
-                    progress_data = data.get('data')
-                    progress_pct = progress_data.get('progress', 0) * 100
-                    stage = progress_data.get('stitchStage', 'unknown')
-                    encoded = progress_data.get('encodedFrames', 0)
-                    rendered = progress_data.get('renderedFrames', 0)
-
-                    print(f"DEBUG: Progress: {progress_pct:.1f}% | Stage: {stage} | Encoded: {encoded}/{rendered}", flush=True)
-
-                    if on_progress:
-                        await on_progress(progress_data)
-                elif data.get('type') == 'complete':
-                    print(f"DEBUG: Received complete signal", flush=True)
-                    final_result = {'status': 'success'}
-                elif data.get('type') == 'compositions':
-                    print(f"DEBUG: Received compositions", flush=True)
-                    final_result = data
-                elif data.get('type') == 'error':
-                    print(f"DEBUG: Received error: {data.get('message')}", flush=True)
-                    raise RuntimeError(data.get('message'))
-                elif data.get('type') == 'info':
-                    last_progress_time = asyncio.get_event_loop().time()  # Update last activity
-                    print(f"DEBUG: [info] {data.get('message')}", flush=True)
-
-            except json.JSONDecodeError:
-                print(f"DEBUG: Failed to parse JSON: {line_str[:100]}", flush=True)
-                continue
-
-        await process.wait()
-
-        print(f"DEBUG: Process finished with return code: {process.returncode}", flush=True)
-
-        if process.returncode != 0:
-            stderr_output = await process.stderr.read()
-            error_msg = stderr_output.decode('utf-8')
-            print(f"DEBUG: Process stderr: {error_msg}", flush=True)
-            raise RuntimeError(f"Node.js process failed: {error_msg}")
-
-        return final_result
+            message_count += 1
+            context.last_activity = asyncio.get_event_loop().time()
+
+            if data.get('type') == 'progress':
+                progress_data = data.get('data')
+                progress_pct = progress_data.get('progress', 0) * 100
+                stage = progress_data.get('stitchStage', 'unknown')
+                encoded = progress_data.get('encodedFrames', 0)
+                rendered = progress_data.get('renderedFrames', 0)
+
+                print(f"DEBUG: Progress: {progress_pct:.1f}% | Stage: {stage} | Encoded: {encoded}/{rendered}", flush=True)
+
+                if on_progress:
+                    await on_progress(progress_data)
+            elif data.get('type') == 'complete':
+                print(f"DEBUG: Received complete signal", flush=True)
+                return {'status': 'success'}
+            elif data.get('type') == 'compositions':
+                print(f"DEBUG: Received compositions", flush=True)
+                return data
+            elif data.get('type') == 'composition':
+                context.composition = data.get('data')
+            elif data.get('type') == 'error':
+                print(f"DEBUG: Received error: {data.get('message')}", flush=True)
+                raise RuntimeError(f"{data.get('message')}{format_log_tail(context.log)}")
+            elif data.get('type') == 'info':
+                print(f"DEBUG: [info] {data.get('message')}", flush=True)
+
+
+# Global renderer instance (created lazily on first use)
+_renderer: Optional[NodeRenderer] = None
+
+
+def get_renderer() -> NodeRenderer:
+    """Return the shared renderer, creating it on first use"""
+    global _renderer
+    if _renderer is None:
+        _renderer = NodeRenderer()
+    return _renderer
@@ -0,0 +1,160 @@
+"""Resource accounting of a job's Node/Chrome/FFmpeg process tree (Linux /proc)"""
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from .process_tree import process_tree
+
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_process(pid: int) -> Optional[Tuple[float, int, int, int, int]]:
+    """(cpu seconds, rss bytes, read bytes, write bytes, threads) of a process, or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, fields resume after the last ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS  # utime + stime
+        threads = int(fields[17])
+        rss = int(fields[21]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "read_bytes":
+                    read_bytes = int(value)
+                elif name == "write_bytes":
+                    write_bytes = int(value)
+    except (OSError, ValueError):
+        pass  # not readable without ptrace access
+
+    return cpu, rss, read_bytes, write_bytes, threads
+
+
+@dataclass
+class ResourceUsage:
+    """Resources used by a job, measured by sampling its process tree"""
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    max_threads: int = 0
+    max_processes: int = 0
+    samples: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "max_threads": self.max_threads,
+            "max_processes": self.max_processes,
+            "samples": self.samples,
+        }
+
+
+class ResourceTracker:
+    """Accumulate the usage of a process tree from periodic samples
+
+    Workers outlive jobs, so CPU time and I/O are counted from a baseline
+    taken when the job starts. Peak RSS and threads are the largest sums
+    over the tree seen in one sample (shared memory is counted once per
+    process). Whatever a short-lived process does between two samples is
+    not seen.
+    """
+
+    def __init__(self, pid: int, usage: Optional[ResourceUsage] = None):
+        self.pid = pid
+        self.usage = usage or ResourceUsage()
+        # pid -> (cpu seconds, read bytes, write bytes) at the baseline / since the baseline
+        self._baseline: Dict[int, Tuple[float, int, int]] = {}
+        self._totals: Dict[int, Tuple[float, int, int]] = {}
+        for member in process_tree(pid):
+            stats = read_process(member)
+            if stats:
+                self._baseline[member] = (stats[0], stats[2], stats[3])
+
+    def sample(self) -> ResourceUsage:
+        """Read the process tree once and update the usage"""
+        rss = threads = processes = 0
+        for member in process_tree(self.pid):
+            stats = read_process(member)
+            if stats is None:
+                continue
+            cpu, member_rss, read_bytes, write_bytes, member_threads = stats
+            base_cpu, base_read, base_write = self._baseline.get(member, (0.0, 0, 0))
+            self._totals[member] = (cpu - base_cpu, read_bytes - base_read, write_bytes - base_write)
+            rss += member_rss
+            threads += member_threads
+            processes += 1
+
+        usage = self.usage
+        usage.cpu_seconds = sum(total[0] for total in self._totals.values())
+        usage.read_bytes = sum(total[1] for total in self._totals.values())
+        usage.write_bytes = sum(total[2] for total in self._totals.values())
+        usage.peak_rss_bytes = max(usage.peak_rss_bytes, rss)
+        usage.max_threads = max(usage.max_threads, threads)
+        usage.max_processes = max(usage.max_processes, processes)
+        usage.samples += 1
+        return usage
+
+
+@dataclass
+class CompositionUsage:
+    """Resource usage of all finished jobs of one composition"""
+    jobs: int = 0
+    cpu_seconds: float = 0.0
+    max_cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    total_peak_rss_bytes: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    max_threads: int = 0
+
+    def record(self, usage: ResourceUsage):
+        self.jobs += 1
+        self.cpu_seconds += usage.cpu_seconds
+        self.max_cpu_seconds = max(self.max_cpu_seconds, usage.cpu_seconds)
+        self.peak_rss_bytes = max(self.peak_rss_bytes, usage.peak_rss_bytes)
+        self.total_peak_rss_bytes += usage.peak_rss_bytes
+        self.read_bytes += usage.read_bytes
+        self.write_bytes += usage.write_bytes
+        self.max_threads = max(self.max_threads, usage.max_threads)
+
+    def to_dict(self) -> dict:
+        return {
+            "jobs": self.jobs,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "avg_cpu_seconds": round(self.cpu_seconds / self.jobs, 3) if self.jobs else 0.0,
+            "max_cpu_seconds": round(self.max_cpu_seconds, 3),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "avg_peak_rss_bytes": self.total_peak_rss_bytes // self.jobs if self.jobs else 0,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "max_threads": self.max_threads,
+        }
+
+
+class UsageByComposition:
+    """Per-composition aggregate of job resource usage"""
+
+    def __init__(self):
+        self.compositions: Dict[str, CompositionUsage] = {}
+
+    def record(self, composition: str, usage: ResourceUsage):
+        if not usage.samples:
+            return
+        self.compositions.setdefault(composition, CompositionUsage()).record(usage)
+
+    def report(self) -> Dict[str, dict]:
+        return {name: entry.to_dict() for name, entry in self.compositions.items()}
+
+
+# Global per-composition usage instance
+composition_usage = UsageByComposition()
@@ -0,0 +1,189 @@
+"""Content-addressed cache of render outputs
+
+Identical renders (same bundle, composition, props and encoding options)
+produce the same file. Finished outputs are hardlinked into
+RESULT_CACHE_DIR under the hash of their normalized options, and a job
+whose options hash to a cached output completes at once by linking it to
+its own output path. Only renders of uploaded bundles are cached, since
+their URL names their content while a serve_url can be redeployed.
+Entries older than RESULT_CACHE_MAX_AGE_SECONDS are dropped, and the least
+recently used are evicted beyond RESULT_CACHE_MAX_BYTES. The segment cache of segmented
+renders is another ResultCache instance (see segments).
+"""
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .metrics import metrics
+from .storage import storage
+
+
+# Options that differ between identical renders: paths and diagnostics
+VOLATILE_OPTIONS = (
+    "outputPath",
+    "output_path",
+    "scratchDir",
+    "inputProps",
+    "inputPropsPath",
+    "compositionMetadata",
+    "profile",
+    "profileTraceFrames",
+)
+
+
+def result_key(job_type: str, options: Dict[str, Any]) -> str:
+    """Canonical hash of the options that determine a render's output"""
+    normalized = {name: value for name, value in options.items() if name not in VOLATILE_OPTIONS}
+    if options.get("inputPropsPath"):
+        # Props files are already named after the hash of their content
+        props = Path(options["inputPropsPath"]).stem
+    else:
+        props = options.get("inputProps") or {}
+    payload = json.dumps(
+        {"type": job_type, "options": normalized, "props": props},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedResult:
+    """One cached output file"""
+    path: Path
+    size: int
+    stored_at: float
+    last_used: float
+
+
+class ResultCache:
+    """Render outputs by options hash, bounded by size and age"""
+
+    def __init__(self, name: str, directory: str, max_bytes: int, max_age: float, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.entries: Dict[str, CachedResult] = {}
+        self._loaded = False
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def _load(self):
+        """Index the files cached by a previous run"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            files = list(self.directory.iterdir())
+        except OSError:
+            return
+        for path in files:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file() and not path.name.startswith("."):
+                key = path.name.split(".", 1)[0]
+                self.entries[key] = CachedResult(path, stat.st_size, stat.st_mtime, stat.st_mtime)
+
+    def _expired(self, entry: CachedResult, now: float, max_age: Optional[float] = None) -> bool:
+        max_age = self.max_age if max_age is None else max_age
+        return bool(max_age) and now - entry.stored_at > max_age
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            storage.remove_file(str(entry.path))
+
+    def _update_metrics(self):
+        hits = metrics.counters.get(f"{self.name}_hits", 0)
+        lookups = hits + metrics.counters.get(f"{self.name}_misses", 0)
+        metrics.set_gauge(f"{self.name}_hit_ratio", hits / lookups if lookups else 0.0)
+        metrics.set_gauge(f"{self.name}_bytes", self.size)
+
+    def lookup(self, key: str, max_age: Optional[float] = None) -> Optional[Path]:
+        """Path of the cached output of key, None on a miss (or if older than max_age, when given)"""
+        if not self.enabled:
+            return None
+        self._load()
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and self._expired(entry, now, max_age):
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            entry.last_used = now
+
+        metrics.inc(f"{self.name}_hits" if entry else f"{self.name}_misses")
+        self._update_metrics()
+        return entry.path if entry else None
+
+    async def fetch(self, key: str, destination: str) -> bool:
+        """Link the cached output of key to destination, False on a miss"""
+        path = self.lookup(key)
+        if path is None:
+            return False
+        try:
+            await asyncio.to_thread(storage.link_output, str(path), destination)
+            return True
+        except OSError as e:
+            print(f"DEBUG: Cached result {path} unusable: {str(e)}", flush=True)
+            self._remove(key)
+            return False
+
+    async def put(self, key: str, output_path: str) -> Optional[Path]:
+        """Cache a finished output (as a hardlink, it takes no extra space), returns its cached path"""
+        if not self.enabled:
+            return None
+        self._load()
+        destination = self.directory / f"{key}{''.join(Path(output_path).suffixes)}"
+        try:
+            await asyncio.to_thread(storage.link_output, output_path, str(destination))
+            size = destination.stat().st_size
+        except OSError as e:
+            print(f"DEBUG: Could not cache result {output_path}: {str(e)}", flush=True)
+            return None
+        now = time.time()
+        self.entries[key] = CachedResult(destination, size, now, now)
+        self._evict(now, keep=key)
+        self._update_metrics()
+        return destination
+
+    def _evict(self, now: float, keep: str):
+        """Drop expired entries, then the least recently used until the cache fits"""
+        for key, entry in list(self.entries.items()):
+            if key != keep and self._expired(entry, now):
+                self._remove(key)
+                metrics.inc(f"{self.name}_evictions")
+
+        used = self.size
+        if not self.max_bytes or used <= self.max_bytes:
+            return
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1].last_used):
+            if used <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            used -= entry.size
+            metrics.inc(f"{self.name}_evictions")
+
+
+# Global result cache instance
+result_cache = ResultCache(
+    "result_cache",
+    settings.RESULT_CACHE_DIR or str(Path(settings.OUTPUT_DIR) / ".results"),
+    settings.RESULT_CACHE_MAX_BYTES,
+    settings.RESULT_CACHE_MAX_AGE_SECONDS,
+    enabled=settings.RESULT_CACHE_ENABLED,
+)
@@ -0,0 +1,226 @@
+"""Priority scheduling of queued render jobs
+
+Queued jobs wait in an indexed binary heap ordered by a sort key fixed at
+submission:
+
+    enqueue time + priority * QUEUE_AGING_SECONDS + expected frames * QUEUE_SJF_SECONDS_PER_FRAME
+
+Priority 0 is the most urgent, 9 the least. A job is only overtaken by a
+more urgent job submitted less than (difference in priority) *
+QUEUE_AGING_SECONDS after it, so waiting raises a job's effective
+priority and nothing starves; since keys never change, aging needs no
+re-sorting. With QUEUE_SJF_SECONDS_PER_FRAME > 0, shorter renders (by the
+cached composition duration, when known) go first among jobs of similar
+priority. The heap index makes removing a cancelled job O(log n). Each
+job type has its own heap, served by its own pool of queue workers.
+"""
+import asyncio
+import itertools
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from .composition_cache import composition_cache, composition_key
+from .metrics import metrics
+from .segments import parse_frame_range
+
+
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+
+
+def parse_priority_caps(value: str) -> Dict[str, int]:
+    """API key -> most urgent priority it may request, from "key:level,key:level" """
+    caps = {}
+    for item in value.split(","):
+        key, _, level = item.strip().rpartition(":")
+        if key and level.strip().isdigit():
+            caps[key] = int(level)
+    return caps
+
+
+def resolve_priority(requested: Optional[int], priority_class: str, api_key: Optional[str] = None) -> int:
+    """Priority a job is queued with: the requested one (or its class default), capped for the API key"""
+    if requested is None:
+        requested = settings.QUEUE_PRIORITY_INTERACTIVE if priority_class == "interactive" else settings.QUEUE_PRIORITY_BATCH
+    cap = parse_priority_caps(settings.QUEUE_PRIORITY_KEY_CAPS).get(api_key or "", settings.QUEUE_PRIORITY_CAP)
+    if requested < cap:
+        print(f"DEBUG: Priority {requested} capped to {cap}", flush=True)
+        metrics.inc("queue_priority_capped")
+    return min(max(requested, cap, MIN_PRIORITY), MAX_PRIORITY)
+
+
+def expected_frames(job_type: str, options: Dict[str, Any]) -> Optional[int]:
+    """Frames a job will render, None if its composition has not been seen yet"""
+    if job_type == "still":
+        return 1
+    metadata = composition_cache.peek(composition_key(options))
+    if not metadata or not metadata.get("durationInFrames"):
+        return None
+    try:
+        start, end = parse_frame_range(options.get("frameRange"), metadata["durationInFrames"])
+    except (TypeError, ValueError, IndexError):
+        return None
+    return (end - start) // max(options.get("everyNthFrame") or 1, 1) + 1
+
+
+def sort_key(enqueued_at: float, priority: int, frames: Optional[int]) -> float:
+    """Position of a job in the queue, lowest first"""
+    key = enqueued_at + priority * settings.QUEUE_AGING_SECONDS
+    if frames and settings.QUEUE_SJF_SECONDS_PER_FRAME > 0:
+        key += frames * settings.QUEUE_SJF_SECONDS_PER_FRAME
+    return key
+
+
+class IndexedHeap:
+    """Binary min-heap of items by sort key, with O(log n) removal of any item"""
+
+    def __init__(self):
+        # (sort key, insertion order, item); the order keeps equal keys FIFO
+        self._heap: List[Tuple[float, int, str]] = []
+        self._index: Dict[str, int] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._index
+
+    def push(self, item: str, key: float):
+        self._heap.append((key, next(self._counter), item))
+        self._index[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def peek(self) -> Tuple[float, int]:
+        """Sort key of the item pop() would return"""
+        return self._heap[0][:2]
+
+    def pop(self) -> str:
+        """Remove and return the item with the lowest key"""
+        item = self._heap[0][2]
+        self._delete(0)
+        return item
+
+    def remove(self, item: str) -> bool:
+        """Remove an item wherever it is in the heap, False if it is not there"""
+        position = self._index.get(item)
+        if position is None:
+            return False
+        self._delete(position)
+        return True
+
+    def _delete(self, position: int):
+        last = len(self._heap) - 1
+        if position != last:
+            self._swap(position, last)
+        del self._index[self._heap.pop()[2]]
+        if position < len(self._heap):
+            self._sift_down(position)
+            self._sift_up(position)
+
+    def _swap(self, a: int, b: int):
+        self._heap[a], self._heap[b] = self._heap[b], self._heap[a]
+        self._index[self._heap[a][2]] = a
+        self._index[self._heap[b][2]] = b
+
+    def _sift_up(self, position: int):
+        while position > 0:
+            parent = (position - 1) // 2
+            if self._heap[position] >= self._heap[parent]:
+                return
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position: int):
+        size = len(self._heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
+
+
+class JobScheduler:
+    """Queued job ids per job type in priority order, awaited by the queue workers
+
+    Every job type has its own heap, so a pool of workers can serve one type
+    and take work from the others only when its own queue is empty.
+    """
+
+    def __init__(self, job_types: Sequence[str] = ("still", "media")):
+        self.heaps: Dict[str, IndexedHeap] = {job_type: IndexedHeap() for job_type in job_types}
+        # Queued job id -> its job type
+        self._types: Dict[str, str] = {}
+        # (future, job types the waiting worker takes)
+        self._waiters: deque = deque()
+
+    def qsize(self, job_type: Optional[str] = None) -> int:
+        if job_type is not None:
+            return len(self.heaps[job_type])
+        return len(self._types)
+
+    def _update_metrics(self, job_type: str):
+        metrics.set_gauge(f"queue_depth_{job_type}", len(self.heaps[job_type]))
+        metrics.set_gauge("queue_depth", len(self._types))
+
+    def put(self, job_id: str, key: float, job_type: str):
+        self.heaps[job_type].push(job_id, key)
+        self._types[job_id] = job_type
+        self._update_metrics(job_type)
+        self._wake(job_type)
+
+    def remove(self, job_id: str) -> bool:
+        """Take a queued job out of the queue (cancellation)"""
+        job_type = self._types.pop(job_id, None)
+        if job_type is None:
+            return False
+        self.heaps[job_type].remove(job_id)
+        self._update_metrics(job_type)
+        return True
+
+    def _take(self, job_types: Sequence[str]) -> Optional[str]:
+        """Pop the most urgent job of any of job_types"""
+        candidates = [self.heaps[job_type] for job_type in job_types if self.heaps[job_type]]
+        if not candidates:
+            return None
+        heap = min(candidates, key=lambda candidate: candidate.peek())
+        job_id = heap.pop()
+        job_type = self._types.pop(job_id)
+        self._update_metrics(job_type)
+        return job_id
+
+    async def get(self, job_types: Sequence[str], fallback: Sequence[str] = ()) -> str:
+        """Wait for and remove the most urgent job of job_types, or of fallback if those are empty"""
+        while True:
+            job_id = self._take(job_types) or self._take(fallback)
+            if job_id is not None:
+                return job_id
+            waiter = asyncio.get_event_loop().create_future()
+            entry = (waiter, tuple(job_types), tuple(fallback))
+            self._waiters.append(entry)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken for a job it will not take, pass it on
+                    self._wake(waiter.result())
+                elif entry in self._waiters:
+                    self._waiters.remove(entry)
+                raise
+
+    def _wake(self, job_type: str):
+        """Wake the longest waiting worker of job_type's pool, or else one that may steal it"""
+        for stealing in (False, True):
+            for entry in list(self._waiters):
+                waiter, job_types, fallback = entry
+                if waiter.done():
+                    self._waiters.remove(entry)
+                elif job_type in (fallback if stealing else job_types):
+                    self._waiters.remove(entry)
+                    waiter.set_result(job_type)
+                    return
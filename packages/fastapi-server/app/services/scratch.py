@@ -0,0 +1,103 @@
+"""RAM-backed scratch space where jobs render and encode before their output is stored"""
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from ..config import settings
+from .metrics import metrics
+
+
+# Working directories are named with this prefix, clear() leaves anything else in SCRATCH_DIR alone
+AREA_PREFIX = "remotion-job-"
+
+
+@dataclass
+class ScratchArea:
+    """Working directory of one job"""
+    job_id: str
+    path: Path
+    reserved: int
+    # False when scratch was full and the job fell back to the disk
+    in_memory: bool
+
+
+class ScratchSpace:
+    """Hand out per-job working directories on tmpfs, falling back to disk
+
+    Admission is by reservation: a job is placed in scratch if its reserved
+    size fits both under SCRATCH_MAX_BYTES (together with the other jobs)
+    and in the free space of the filesystem.
+    """
+
+    def __init__(self):
+        self.root = Path(settings.SCRATCH_DIR) if settings.SCRATCH_DIR else None
+        # On the output volume, so that moving the finished file is a rename
+        self.fallback_root = Path(settings.OUTPUT_DIR) / ".scratch"
+        self.max_bytes = settings.SCRATCH_MAX_BYTES
+        self.areas: Dict[str, ScratchArea] = {}
+
+    @property
+    def reserved(self) -> int:
+        return sum(area.reserved for area in self.areas.values() if area.in_memory)
+
+    def _free_bytes(self) -> int:
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            stat = os.statvfs(self.root)
+        except OSError:
+            return 0
+        return stat.f_bavail * stat.f_frsize
+
+    def _fits(self, size: int) -> bool:
+        if self.root is None:
+            return False
+        if self.max_bytes and self.reserved + size > self.max_bytes:
+            return False
+        return self._free_bytes() - self.reserved >= size
+
+    def clear(self):
+        """Remove working directories left over by a previous run"""
+        for root in (self.root, self.fallback_root):
+            if root is not None and root.is_dir():
+                for entry in root.glob(f"{AREA_PREFIX}*"):
+                    shutil.rmtree(entry, ignore_errors=True)
+
+    def allocate(self, job_id: str, job_type: str) -> ScratchArea:
+        """Create the working directory of a job"""
+        size = settings.SCRATCH_RESERVE_MEDIA_BYTES if job_type == "media" else settings.SCRATCH_RESERVE_STILL_BYTES
+
+        name = f"{AREA_PREFIX}{job_id}"
+        in_memory = False
+        if self._fits(size):
+            try:
+                (self.root / name).mkdir(parents=True, exist_ok=True)
+                in_memory = True
+            except OSError as e:
+                print(f"DEBUG: Scratch directory unavailable: {str(e)}", flush=True)
+
+        if in_memory:
+            path = self.root / name
+            metrics.inc("scratch_jobs_in_memory")
+        else:
+            path = self.fallback_root / name
+            path.mkdir(parents=True, exist_ok=True)
+            metrics.inc("scratch_jobs_on_disk")
+            print(f"DEBUG: Scratch full, job {job_id} works on disk", flush=True)
+
+        area = ScratchArea(job_id=job_id, path=path, reserved=size, in_memory=in_memory)
+        self.areas[job_id] = area
+        metrics.set_gauge("scratch_reserved_bytes", self.reserved)
+        return area
+
+    def release(self, area: Optional[ScratchArea]):
+        """Delete a job's working directory and everything left in it"""
+        if area is None:
+            return
+        shutil.rmtree(area.path, ignore_errors=True)
+        self.areas.pop(area.job_id, None)
+        metrics.set_gauge("scratch_reserved_bytes", self.reserved)
+
+
+# Global scratch instance
+scratch = ScratchSpace()
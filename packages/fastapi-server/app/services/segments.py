@@ -0,0 +1,189 @@
+"""Segmented rendering of videos with a cache of rendered segments
+
+A render with segment_frames is split into fixed frame ranges. Each
+segment is cached under the hash of the bundle, composition, its range,
+the encoding options and the props it depends on, so a later render
+whose props changed only re-renders the segments they affect. Props
+listed in prop_frame_ranges only affect the segments overlapping their
+range; other props affect every segment. The segments are joined by
+Remotion's combineChunks (video stream copy, no re-encoding). Only
+segments of uploaded bundles are cached: a serve_url can be redeployed,
+and a render would then join segments of both versions.
+"""
+import asyncio
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from .bundles import bundle_registry
+from .metrics import metrics
+from .renderer import NodeRenderer, RenderContext
+from .result_cache import ResultCache, result_key
+from .storage import storage
+
+
+# Default audio codec of each video codec, and the extension of its separate audio file
+AUDIO_EXTENSIONS = {"h264": "aac", "h265": "aac", "vp8": "opus", "vp9": "opus", "prores": "wav"}
+
+# Options of the segmented job that are not passed on to the segment renders
+SEGMENT_FIELDS = ("segmentFrames", "propFrameRanges", "frameRange", "inputPropsPath")
+
+
+def parse_frame_range(value: Any, duration: int) -> Tuple[int, int]:
+    """First and last frame of "start-end", a single frame, [start, end] or None (whole video)"""
+    if value is None or value == "":
+        return 0, duration - 1
+    if isinstance(value, str):
+        start, _, end = value.partition("-")
+        if not end:
+            return int(start), int(start)
+        return int(start), min(int(end), duration - 1)
+    if isinstance(value, int):
+        return value, value
+    return int(value[0]), min(int(value[1]), duration - 1)
+
+
+def plan_segments(start: int, end: int, size: int) -> List[Tuple[int, int]]:
+    """Split [start, end] into ranges of size frames, aligned on multiples of size"""
+    segments = []
+    first = start
+    while first <= end:
+        last = min((first // size + 1) * size - 1, end)
+        segments.append((first, last))
+        first = last + 1
+    return segments
+
+
+def segment_props(props: Dict[str, Any], prop_frame_ranges: Dict[str, List[int]], start: int, end: int) -> Dict[str, Any]:
+    """The props a segment depends on"""
+    return {
+        name: value for name, value in props.items()
+        if name not in prop_frame_ranges
+        or (prop_frame_ranges[name][0] <= end and prop_frame_ranges[name][1] >= start)
+    }
+
+
+def segment_key(options: Dict[str, Any], metadata: Dict[str, Any], props: Dict[str, Any], start: int, end: int) -> str:
+    """Cache key of one segment"""
+    identity = {name: value for name, value in options.items() if name not in SEGMENT_FIELDS}
+    identity["inputProps"] = segment_props(props, options.get("propFrameRanges") or {}, start, end)
+    identity["frameRange"] = [start, end]
+    # Props can change the composition's size or duration (calculateMetadata)
+    identity["compositionSize"] = [metadata.get(name) for name in ("width", "height", "fps", "durationInFrames")]
+    return result_key("segment", identity)
+
+
+async def load_props(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Input props of a job, inline or from their file"""
+    path = options.get("inputPropsPath")
+    if not path:
+        return options.get("inputProps") or {}
+    return json.loads(await asyncio.to_thread(Path(path).read_text))
+
+
+def can_segment(options: Dict[str, Any]) -> bool:
+    """Whether a media job is rendered in segments"""
+    return bool(options.get("segmentFrames")) and options.get("everyNthFrame", 1) == 1 and not options.get("profile")
+
+
+async def render_segmented(
+    renderer: NodeRenderer,
+    options: Dict[str, Any],
+    context: RenderContext,
+    work_dir: Path,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+):
+    """Render options["outputPath"] from cached and newly rendered segments"""
+    metadata = await renderer.select_composition(options, context)
+    start, end = parse_frame_range(options.get("frameRange"), metadata["durationInFrames"])
+    size = options["segmentFrames"]
+    segments = plan_segments(start, end, size)
+    props = await load_props(options)
+    extension = Path(options["outputPath"]).suffix
+    audio_extension = None if options.get("muted") else AUDIO_EXTENSIONS.get(options.get("codec", "h264"), "aac")
+    total_frames = end - start + 1
+
+    base = {name: value for name, value in options.items() if name not in ("segmentFrames", "propFrameRanges")}
+    if audio_extension:
+        # Every segment needs an audio file, even a silent one, for the audio to be joined
+        base["enforceAudioTrack"] = True
+
+    reusable = bundle_registry.is_bundle_url(options.get("serveUrl") or "")
+    # Segments are pinned by hardlinks in the cache's filesystem until they are joined
+    segment_cache.directory.mkdir(parents=True, exist_ok=True)
+    pinned = Path(tempfile.mkdtemp(dir=segment_cache.directory, prefix=".job-"))
+    try:
+        video_files, audio_files = [], []
+        done_frames = reused = 0
+        for index, (first, last) in enumerate(segments):
+            key = segment_key(options, metadata, props, first, last)
+            video = pinned / f"{index:05d}{extension}"
+            audio = pinned / f"{index:05d}.{audio_extension}" if audio_extension else None
+            video_files.append(str(video))
+            if audio:
+                audio_files.append(str(audio))
+
+            if reusable and await segment_cache.fetch(key, str(video)) and (
+                audio is None or await segment_cache.fetch(f"{key}-audio", str(audio))
+            ):
+                reused += 1
+                metrics.inc("segments_reused")
+            else:
+                frames_before = done_frames
+
+                async def on_segment_progress(data: dict, frames_before=frames_before, frames=last - first + 1):
+                    if on_progress:
+                        rendered = frames_before + data.get("progress", 0.0) * frames
+                        await on_progress({**data, "progress": 0.95 * rendered / total_frames})
+
+                rendered_video = work_dir / f"segment-{index}{extension}"
+                rendered_audio = work_dir / f"segment-{index}.{audio_extension}" if audio else None
+                await renderer.render_media(
+                    {
+                        **base,
+                        "frameRange": [first, last],
+                        "outputPath": str(rendered_video),
+                        "separateAudioTo": str(rendered_audio) if rendered_audio else None,
+                    },
+                    on_segment_progress,
+                    context
+                )
+                await asyncio.to_thread(storage.store_output, str(rendered_video), str(video))
+                if reusable:
+                    await segment_cache.put(key, str(video))
+                if audio:
+                    await asyncio.to_thread(storage.store_output, str(rendered_audio), str(audio))
+                    if reusable:
+                        await segment_cache.put(f"{key}-audio", str(audio))
+                metrics.inc("segments_rendered")
+
+            done_frames += last - first + 1
+            if on_progress:
+                await on_progress({"progress": 0.95 * done_frames / total_frames})
+
+        print(f"DEBUG: Joining {len(segments)} segments ({reused} from cache)", flush=True)
+        await renderer.combine_segments({
+            "videoFiles": video_files,
+            "audioFiles": audio_files,
+            "outputPath": options["outputPath"],
+            "codec": options.get("codec", "h264"),
+            "fps": metadata["fps"],
+            "framesPerChunk": size,
+            "compositionDurationInFrames": metadata["durationInFrames"],
+            "frameRange": [start, end],
+            "audioBitrate": options.get("audioBitrate"),
+        }, context)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, pinned, True)
+
+
+# Global segment cache instance
+segment_cache = ResultCache(
+    "segment_cache",
+    settings.SEGMENT_CACHE_DIR or str(Path(settings.OUTPUT_DIR) / ".segments"),
+    settings.SEGMENT_CACHE_MAX_BYTES,
+    settings.SEGMENT_CACHE_MAX_AGE_SECONDS,
+)
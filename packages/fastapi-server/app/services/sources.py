@@ -0,0 +1,60 @@
+"""Where a render request's bundle and assets are loaded from
+
+Shared by the render, still and composition endpoints: the bundle is an
+uploaded one (bundle_id) or serve_url, with localhost mapped to the Docker
+service and remote bundles mirrored; asset:// references in the input
+props point at this server.
+"""
+import os
+
+from fastapi import HTTPException, status
+
+from .assets import AssetError, asset_store
+from .bundle_mirror import bundle_mirror
+from .bundles import bundle_registry
+
+
+async def resolve_serve_url(request) -> str:
+    """URL the renderer loads the bundle from: an uploaded bundle, or serve_url (mirrored if remote)"""
+    if request.bundle_id:
+        try:
+            return bundle_registry.serve_url(bundle_registry.resolve(request.bundle_id))
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Bundle not found: {request.bundle_id}"
+            )
+
+    transformed = transform_serve_url(request.serve_url)
+    if transformed != request.serve_url:
+        return transformed
+    return await bundle_mirror.local_url(request.serve_url)
+
+
+def transform_serve_url(serve_url: str) -> str:
+    """Transform localhost URLs to internal Docker service URLs
+
+    Only transform localhost URLs to allow local development.
+    Public URLs should be used as-is for production deployments.
+    """
+    # Get the internal frontend URL from environment
+    internal_frontend_url = os.getenv("REMOTION_FRONTEND_URL", "http://remotion-frontend:3000")
+
+    # Only transform localhost URLs for local development
+    # Public URLs will work with bundle mode
+    if "localhost" in serve_url or "127.0.0.1" in serve_url:
+        print(f"DEBUG: Transforming localhost URL {serve_url} to {internal_frontend_url}", flush=True)
+        return internal_frontend_url
+
+    print(f"DEBUG: Using URL as-is: {serve_url}", flush=True)
+    return serve_url
+
+
+def resolve_assets(options: dict) -> dict:
+    """Rewrite asset://<sha256> references in the input props to local asset URLs"""
+    if options.get("inputProps"):
+        try:
+            options["inputProps"] = asset_store.rewrite(options["inputProps"])
+        except AssetError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return options
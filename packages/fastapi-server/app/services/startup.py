@@ -0,0 +1,56 @@
+"""Startup-time report for cold start tuning"""
+import os
+import time
+from typing import Dict, Optional
+
+
+def _process_start_time() -> float:
+    """Wall-clock time at which this process was started"""
+    try:
+        # Field 22 of /proc/self/stat is the start time in clock ticks since boot
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class StartupTimer:
+    """Record when startup milestones are first reached"""
+
+    def __init__(self):
+        self.process_started = _process_start_time()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        """Record a milestone the first time it is reached"""
+        if name not in self.marks:
+            self.marks[name] = time.time()
+            print(f"DEBUG: Startup milestone '{name}' after {self.marks[name] - self.process_started:.3f}s", flush=True)
+
+    def has(self, name: str) -> bool:
+        return name in self.marks
+
+    def elapsed(self, name: str) -> Optional[float]:
+        """Seconds between process start and a milestone"""
+        if name not in self.marks:
+            return None
+        return round(self.marks[name] - self.process_started, 3)
+
+    def report(self) -> dict:
+        """Seconds from process start to each milestone"""
+        return {
+            "process_started_at": self.process_started,
+            "app_imported": self.elapsed("app_imported"),
+            "app_ready": self.elapsed("app_ready"),
+            "workers_ready": self.elapsed("workers_ready"),
+            "first_request": self.elapsed("first_request"),
+            "first_still_completed": self.elapsed("first_still_completed"),
+        }
+
+
+# Global startup timer instance
+startup = StartupTimer()
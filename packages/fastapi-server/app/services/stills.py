@@ -0,0 +1,149 @@
+"""Synchronous still images (GET /still/{composition}) for OG images and thumbnails
+
+Stills are rendered outside the job queue on a small pool of dedicated
+workers whose browsers stay open, so a request never waits behind video
+renders or for Chrome to launch, and the composition metadata cache
+saves the selectComposition round trip. Remotion's renderStill opens a
+fresh tab per call, so "warm" here is the browser, not the page. Results
+are kept in a disk LRU keyed by the hash of the bundle, composition,
+frame, props and image options, which is also the ETag of the response
+for uploaded bundles. A plain serve_url can be redeployed, so its stills
+are only kept for STILL_MUTABLE_MAX_AGE_SECONDS.
+"""
+import asyncio
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .metrics import metrics
+from .renderer import NodeRenderer, RenderContext, get_renderer
+from .result_cache import ResultCache, result_key
+from .scratch import scratch
+from .worker_pool import WorkerPool
+
+
+# Formats the endpoint negotiates, in order of preference when the client accepts several equally
+STILL_FORMATS = {"webp": "image/webp", "png": "image/png", "jpeg": "image/jpeg"}
+
+
+def negotiate_format(accept: Optional[str], default: str = "png") -> str:
+    """Still format best matching an Accept header (q-values respected, explicit types beat wildcards, default for wildcards)"""
+    if not accept:
+        return default
+    ranges = []
+    for part in accept.split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((name, quality))
+
+    best, best_score = default, None
+    for preference, (image_format, media_type) in enumerate(STILL_FORMATS.items()):
+        # The most specific range matching the type sets its quality (image/png;q=0 beats */*)
+        matches = [
+            (specificity, quality)
+            for name, quality in ranges
+            for specificity, pattern in enumerate(("*/*", "image/*", media_type))
+            if name == pattern
+        ]
+        if not matches:
+            continue
+        specificity, quality = max(matches)
+        # Wildcards alone select the default, not whichever format happens to be preferred
+        score = (quality, specificity == 2, image_format == default, -preference)
+        if quality > 0 and (best_score is None or score > best_score):
+            best, best_score = image_format, score
+    return best
+
+
+def still_key(options: Dict[str, Any]) -> str:
+    """Cache key and ETag of a still: bundle, composition, frame, props and image options"""
+    return result_key("still-endpoint", options)
+
+
+class StillService:
+    """Renders stills on warm dedicated workers, with single-flight and a disk cache"""
+
+    def __init__(self):
+        # Browsers of the dedicated workers are never closed for being idle
+        self.pool = WorkerPool(size=settings.STILL_WORKERS, browser_idle_seconds=0) if settings.STILL_WORKERS else None
+        self.cache = ResultCache(
+            "still_cache",
+            settings.STILL_CACHE_DIR or str(Path(settings.OUTPUT_DIR) / ".stills"),
+            settings.STILL_CACHE_MAX_BYTES,
+            settings.STILL_CACHE_MAX_AGE_SECONDS,
+        )
+        self._renderer: Optional[NodeRenderer] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def renderer(self) -> NodeRenderer:
+        if self._renderer is None:
+            self._renderer = NodeRenderer(self.pool) if self.pool else get_renderer()
+        return self._renderer
+
+    async def start(self):
+        """Start the dedicated workers and open their browsers"""
+        if self.pool is None:
+            return
+        await self.pool.start()
+        await self.renderer.warm_up()
+
+    async def stop(self):
+        if self.pool is not None:
+            await self.pool.stop()
+
+    async def get(self, key: str, options: Dict[str, Any], max_age: Optional[float] = None) -> Path:
+        """Path of the still rendered with options, rendering it on a miss or if older than max_age"""
+        path = self.cache.lookup(key, max_age)
+        if path is not None:
+            return path
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc("stills_coalesced")
+        else:
+            # A client going away does not cancel the render for the others waiting on it
+            task = asyncio.create_task(self._render(key, options))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Retrieve the error even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    async def _render(self, key: str, options: Dict[str, Any]) -> Path:
+        area = scratch.allocate(f"still-{uuid.uuid4().hex}", "still")
+        started = time.monotonic()
+        try:
+            output = area.path / f"still.{options['imageFormat']}"
+            context = RenderContext(priority_class="interactive")
+            await asyncio.wait_for(
+                self.renderer.render_still(
+                    {**options, "outputPath": str(output), "scratchDir": str(area.path)}, None, context
+                ),
+                timeout=settings.STILL_TIMEOUT_MS / 1000 if settings.STILL_TIMEOUT_MS else None
+            )
+            path = await self.cache.put(key, str(output))
+            if path is None:
+                raise RuntimeError(f"Could not store still {key}")
+        finally:
+            scratch.release(area)
+
+        metrics.observe("still_render_seconds", time.monotonic() - started)
+        return path
+
+
+# Global still service instance
+still_service = StillService()
@@ -1,17 +1,38 @@
 """Storage management for output files"""
+import errno
 import os
+import re
+import shutil
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import AsyncIterator, Dict, Optional
+import aiofiles
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from ..config import settings
 
 
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+async def read_range(path: Path, start: int, end: int, chunk_size: int = 256 * 1024) -> AsyncIterator[bytes]:
+    """Bytes start to end (inclusive) of a file"""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
 class StorageManager:
     """Manage output files and URLs"""
 
     def __init__(self):
+        # Directories are created on startup (ensure_output_dir), not at import time
         self.output_dir = Path(settings.OUTPUT_DIR)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
         self.base_url = settings.BASE_URL.rstrip('/')
 
     def get_output_path(self, job_id: str, extension: str) -> str:
@@ -24,6 +45,71 @@ class StorageManager:
         filename = Path(output_path).name
         return f"{self.base_url}/outputs/{filename}"
 
+    def remove_file(self, path: str):
+        """Remove a (possibly partial) output file if it exists"""
+        try:
+            Path(path).unlink(missing_ok=True)
+        except OSError as e:
+            print(f"DEBUG: Could not remove {path}: {str(e)}", flush=True)
+
+    def store_output(self, source: str, destination: str):
+        """Atomically move a finished file from scratch into the output directory
+
+        Readers never see a partial file: across filesystems the file is
+        copied next to its destination first, then renamed.
+        """
+        target = Path(destination)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            partial = target.with_name(f".{target.name}.partial")
+            shutil.copyfile(source, partial)
+            os.replace(partial, target)
+            os.unlink(source)
+
+    def link_output(self, source: str, destination: str):
+        """Atomically make destination a hardlink of source (a copy across filesystems)"""
+        target = Path(destination)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(f".{target.name}.partial")
+        partial.unlink(missing_ok=True)
+        try:
+            os.link(source, partial)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            shutil.copyfile(source, partial)
+        os.replace(partial, target)
+
+    def file_response(
+        self,
+        path: Path,
+        range_header: Optional[str] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Serve a file, honouring a single byte range (media elements seek with them)"""
+        headers = {**(headers or {}), "Accept-Ranges": "bytes"}
+        match = _BYTE_RANGE.fullmatch((range_header or "").strip())
+        if not match or not any(match.groups()):
+            return FileResponse(path, media_type=media_type, headers=headers)
+
+        size = path.stat().st_size
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            # "bytes=-N": the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        if start > end or start >= size:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(read_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
     def ensure_output_dir(self):
         """Ensure output directory exists"""
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,467 @@
+"""Pool of long-lived Node.js renderer workers"""
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..config import settings
+from .ipc import CODEC_JSON, CODEC_MSGPACK, FrameError, encode_frame, read_frame, resolve_codec
+from .process_tree import signal_pids, signal_process_tree
+
+
+# Maximum size of a single stderr line
+STREAM_LIMIT = 64 * 1024 * 1024
+
+# Cumulative browser counters reported by workers
+BROWSER_COUNTERS = ("launches", "reuses", "evictions", "crashes")
+
+
+def renderer_command() -> tuple[List[str], Path]:
+    """Return the command used to start a Node worker and its working directory"""
+    # Go up from services/ to app/, then to node/
+    node_dir = Path(__file__).parent.parent.parent / "node"
+
+    # Prefer the precompiled bundle (`npm run build`), run with plain node
+    compiled = node_dir / "dist" / "renderer.js"
+    if compiled.exists():
+        return [settings.NODE_BINARY, str(compiled), "--worker"], node_dir
+
+    script = node_dir / "renderer.ts"
+    if not script.exists():
+        raise RuntimeError(f"Node renderer not found at {script}")
+
+    # Fall back to tsx to run TypeScript directly (development)
+    print("DEBUG: node/dist/renderer.js not found, running renderer.ts through tsx", flush=True)
+    tsx_path = node_dir / "node_modules" / ".bin" / "tsx"
+    return [str(tsx_path), str(script), "--worker"], node_dir
+
+
+class NodeWorker:
+    """A long-lived Node.js renderer process
+
+    Requests and responses are length-prefixed frames on stdin/stdout (see ipc.py).
+    Every request carries an ``id`` which is echoed on all messages belonging
+    to it, so the worker can be reused for many jobs.
+    """
+
+    def __init__(
+        self,
+        worker_id: int,
+        command: List[str],
+        cwd: Path,
+        codec: Optional[str] = None,
+        browser_idle_seconds: Optional[int] = None,
+    ):
+        self.id = worker_id
+        self.command = command
+        self.cwd = cwd
+        self.codec = resolve_codec(codec or settings.IPC_CODEC)
+        # Seconds the browser stays open without a job, 0 = until the worker exits
+        self.browser_idle_seconds = settings.MAX_BROWSER_IDLE_SECONDS if browser_idle_seconds is None else browser_idle_seconds
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.jobs_handled = 0
+        self.busy = False
+        # Set when the worker was killed on purpose (cancellation), not crashed
+        self.terminated = False
+        self.browser: Dict[str, Any] = {}
+        # Isolation class last applied to the process tree, possibly only in part (see isolation.py)
+        self.priority_class: Optional[str] = None
+        # Set when the worker must be replaced after its current job
+        self.retire = False
+        # Ring buffer of the job currently using this worker, receives stderr lines
+        self.log_sink: Optional[deque] = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Queue] = {}
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None and not self._closed
+
+    async def start(self):
+        """Spawn the Node process and wait until it reports ready"""
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=str(self.cwd),
+            env={
+                **{"NODE_PATH": os.environ.get("NODE_PATH", "/usr/local/lib/node_modules")},
+                **os.environ,
+                "BROWSER_IDLE_SECONDS": str(self.browser_idle_seconds),
+                "IPC_CODEC": "msgpack" if self.codec == CODEC_MSGPACK else "json",
+            },
+            limit=STREAM_LIMIT,
+            # Own process group, so the whole tree can be signalled on cancellation
+            start_new_session=True,
+        )
+        print(f"DEBUG: Worker {self.id} started with PID: {self.process.pid}", flush=True)
+
+        self._tasks = [
+            asyncio.create_task(self._read_stdout()),
+            asyncio.create_task(self._drain_stderr()),
+        ]
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=settings.WORKER_STARTUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            await self.kill()
+            raise RuntimeError(
+                f"Worker {self.id} did not become ready within {settings.WORKER_STARTUP_TIMEOUT_SECONDS}s"
+            )
+
+        if not self.alive:
+            raise RuntimeError(f"Worker {self.id} exited during startup")
+
+    async def _read_stdout(self):
+        """Route protocol messages to the request they belong to"""
+        try:
+            while True:
+                try:
+                    data = await read_frame(self.process.stdout)
+                except (FrameError, ValueError) as e:
+                    # The stream cannot be resynchronized, treat the worker as dead
+                    print(f"DEBUG: Worker {self.id} - invalid frame: {str(e)}", flush=True)
+                    break
+                if data is None:
+                    break
+
+                if data.get('type') == 'ready':
+                    # Node reports the codec it could load, msgpack is only sent if it can decode it
+                    if (data.get('data') or {}).get('codec') != 'msgpack' and self.codec == CODEC_MSGPACK:
+                        print(f"DEBUG: Worker {self.id} cannot decode msgpack, using JSON frames", flush=True)
+                        self.codec = CODEC_JSON
+                    self._ready.set()
+                    continue
+
+                if data.get('type') == 'browser':
+                    # Browser pool stats, sent after every job and on idle eviction
+                    self.browser = data.get('data') or {}
+                    continue
+
+                pending = self._pending.get(data.get('id'))
+                if pending is not None:
+                    pending.put_nowait(data)
+        finally:
+            # Wake up everyone waiting on this worker
+            self._closed = True
+            self._ready.set()
+            for pending in self._pending.values():
+                pending.put_nowait(None)
+
+    async def _drain_stderr(self):
+        """Keep stderr flowing so the worker never blocks on a full pipe
+
+        Lines are copied into the ring buffer of the job holding the worker.
+        """
+        while True:
+            try:
+                line = await self.process.stderr.readline()
+            except ValueError:
+                # Line longer than the stream limit, the remainder is dropped
+                continue
+            if not line:
+                break
+
+            text = line.decode('utf-8', errors='replace').rstrip()
+            if self.log_sink is not None:
+                self.log_sink.append(text[:settings.JOB_LOG_MAX_LINE_LENGTH])
+            print(f"DEBUG: [worker {self.id}] {text}", flush=True)
+
+    async def send(self, command: str, options: Dict[str, Any]) -> int:
+        """Send a request to the worker and return its request id"""
+        if not self.alive:
+            raise RuntimeError(f"Worker {self.id} is not running")
+
+        request_id = next(self._request_ids)
+        self._pending[request_id] = asyncio.Queue()
+
+        frame = encode_frame({
+            "id": request_id,
+            "command": command,
+            "options": options,
+            # Node coalesces progress events to at most PROGRESS_MAX_HZ per job
+            "progressIntervalMs": int(1000 / settings.PROGRESS_MAX_HZ),
+        }, self.codec)
+        self.process.stdin.write(frame)
+        await self.process.stdin.drain()
+        return request_id
+
+    async def receive(self, request_id: int) -> Optional[Dict[str, Any]]:
+        """Wait for the next message of a request, or None if the worker exited"""
+        pending = self._pending[request_id]
+        if self._closed and pending.empty():
+            return None
+        return await pending.get()
+
+    def finish(self, request_id: int):
+        """Forget about a request once its final message has been consumed"""
+        self._pending.pop(request_id, None)
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        """Check that the worker still answers requests"""
+        if not self.alive:
+            return False
+
+        try:
+            request_id = await self.send("ping", {})
+            try:
+                message = await asyncio.wait_for(self.receive(request_id), timeout=timeout)
+            finally:
+                self.finish(request_id)
+        except Exception:
+            return False
+
+        return message is not None and message.get('type') == 'pong'
+
+    async def stop(self, timeout: float = 5.0):
+        """Ask the worker to exit, killing it if it does not comply"""
+        if self._running_process():
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=timeout)
+            except (asyncio.TimeoutError, ConnectionResetError, BrokenPipeError):
+                await self.kill()
+        await self._cleanup()
+
+    async def kill(self):
+        """Kill the worker and everything it started immediately"""
+        if self._running_process():
+            signal_process_tree(self.process.pid, signal.SIGKILL)
+            await self.process.wait()
+        await self._cleanup()
+
+    async def terminate(self, grace: float):
+        """Stop the worker's whole process tree (Node, Chrome, FFmpeg)
+
+        Sends SIGTERM, then SIGKILL to whatever is left after ``grace`` seconds.
+        """
+        self.terminated = True
+        if self._running_process():
+            pids = signal_process_tree(self.process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=grace)
+            except asyncio.TimeoutError:
+                pass
+            # Children orphaned by Node exiting are no longer part of its tree
+            signal_pids(pids if self.process.returncode is None else pids[1:], signal.SIGKILL)
+            await self.process.wait()
+        await self._cleanup()
+
+    def _running_process(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def _cleanup(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "pid": self.pid,
+            "alive": self.alive,
+            "busy": self.busy,
+            "jobs_handled": self.jobs_handled,
+            "browser": self.browser,
+        }
+
+
+class WorkerPool:
+    """Fixed-size pool of Node workers, leased one job at a time
+
+    Workers are health-checked while idle, replaced when they crash and
+    recycled after ``max_jobs`` jobs to bound memory growth.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_jobs: Optional[int] = None,
+        command: Optional[List[str]] = None,
+        cwd: Optional[Path] = None,
+        codec: Optional[str] = None,
+        browser_idle_seconds: Optional[int] = None,
+    ):
+        self.size = size or settings.MAX_BROWSER_INSTANCES
+        self.max_jobs = max_jobs or settings.WORKER_MAX_JOBS
+        self._command = command
+        self._cwd = cwd
+        self._codec = codec
+        self._browser_idle_seconds = browser_idle_seconds
+        self._worker_ids = itertools.count(1)
+        self._workers: List[NodeWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._background: set = set()
+        self._running = False
+        self.crashes = 0
+        self.recycled = 0
+        # Browser counters of workers that have been replaced
+        self._retired_browser: Dict[str, int] = {}
+
+    def _make_worker(self) -> NodeWorker:
+        if self._command is None:
+            self._command, self._cwd = renderer_command()
+        return NodeWorker(
+            next(self._worker_ids), self._command, self._cwd or Path.cwd(), self._codec, self._browser_idle_seconds
+        )
+
+    async def _spawn(self) -> NodeWorker:
+        """Start a new worker; a failed start yields a dead worker that is retried on lease"""
+        worker = self._make_worker()
+        try:
+            await worker.start()
+        except Exception as e:
+            print(f"DEBUG: Failed to start worker {worker.id}: {str(e)}", flush=True)
+        return worker
+
+    async def start(self):
+        """Start all workers (idempotent)"""
+        if self._running:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._running:
+                return
+
+            print(f"DEBUG: Starting {self.size} Node workers", flush=True)
+            self._idle = asyncio.Queue()
+            self._workers = list(await asyncio.gather(*(self._spawn() for _ in range(self.size))))
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+
+            self._health_task = asyncio.create_task(self._health_check_loop())
+            self._running = True
+
+    async def stop(self):
+        """Stop all workers"""
+        if not self._running:
+            return
+        self._running = False
+
+        tasks = [t for t in [self._health_task, *self._background] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await asyncio.gather(*(w.stop() for w in self._workers), return_exceptions=True)
+        self._workers = []
+
+    async def _replace(self, worker: NodeWorker) -> NodeWorker:
+        """Replace a worker with a freshly started one"""
+        await worker.stop()
+        for key in BROWSER_COUNTERS:
+            self._retired_browser[key] = self._retired_browser.get(key, 0) + worker.browser.get(key, 0)
+        new_worker = await self._spawn()
+        self._workers = [new_worker if w is worker else w for w in self._workers]
+        return new_worker
+
+    async def _recycle(self, worker: NodeWorker):
+        """Replace a worker in the background and hand the new one to the pool"""
+        try:
+            worker = await self._replace(worker)
+        finally:
+            self._idle.put_nowait(worker)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[NodeWorker]:
+        """Borrow a worker for the duration of one job"""
+        await self.start()
+
+        worker = await self._idle.get()
+        if not worker.alive:
+            print(f"DEBUG: Worker {worker.id} is not running, replacing it", flush=True)
+            worker = await self._replace(worker)
+            if not worker.alive:
+                self._idle.put_nowait(worker)
+                raise RuntimeError("No Node worker available: worker failed to start")
+
+        worker.busy = True
+        try:
+            yield worker
+        finally:
+            worker.busy = False
+            worker.jobs_handled += 1
+
+            if worker.terminated:
+                print(f"DEBUG: Worker {worker.id} was terminated, replacing it", flush=True)
+                self._in_background(self._recycle(worker))
+            elif worker.retire:
+                print(f"DEBUG: Worker {worker.id} was retired, replacing it", flush=True)
+                self._in_background(self._recycle(worker))
+            elif not worker.alive:
+                print(f"DEBUG: Worker {worker.id} crashed, replacing it", flush=True)
+                self.crashes += 1
+                self._in_background(self._recycle(worker))
+            elif worker.jobs_handled >= self.max_jobs:
+                print(f"DEBUG: Recycling worker {worker.id} after {worker.jobs_handled} jobs", flush=True)
+                self.recycled += 1
+                self._in_background(self._recycle(worker))
+            else:
+                self._idle.put_nowait(worker)
+
+    def _in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _health_check_loop(self):
+        """Periodically ping idle workers and replace unresponsive ones"""
+        while True:
+            await asyncio.sleep(settings.WORKER_HEALTH_CHECK_SECONDS)
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+
+                try:
+                    if not await worker.ping():
+                        print(f"DEBUG: Worker {worker.id} failed health check, replacing it", flush=True)
+                        self.crashes += 1
+                        worker = await self._replace(worker)
+                finally:
+                    self._idle.put_nowait(worker)
+
+    def browser_stats(self) -> dict:
+        """Aggregate browser pool statistics reported by the workers"""
+        totals = {"max_instances": self.size, "open": 0}
+        for key in BROWSER_COUNTERS:
+            totals[key] = self._retired_browser.get(key, 0) + sum(w.browser.get(key, 0) for w in self._workers)
+        totals["open"] = sum(1 for w in self._workers if w.alive and w.browser.get("open"))
+        totals["idle_timeout_seconds"] = settings.MAX_BROWSER_IDLE_SECONDS
+        return totals
+
+    def stats(self) -> dict:
+        """Pool statistics"""
+        return {
+            "size": self.size,
+            "running": self._running,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "busy": sum(1 for w in self._workers if w.busy),
+            "crashes": self.crashes,
+            "recycled": self.recycled,
+            "workers": [w.to_dict() for w in self._workers],
+            "browsers": self.browser_stats(),
+        }
+
+
+# Global worker pool instance (started lazily on first lease)
+worker_pool = WorkerPool()
@@ -0,0 +1,89 @@
+"""Microbenchmark: renderer progress events decoded per second on one core
+
+Compares the old newline-delimited JSON handling (readline, decode,
+json.loads, DEBUG line formatting) with length-prefixed frames in JSON and,
+if installed, msgpack. Run from packages/fastapi-server:
+
+    python -m benchmarks.ipc_benchmark [events]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from app.config import settings
+from app.services.ipc import CODEC_JSON, CODEC_MSGPACK, encode_frame, msgpack, read_frame
+
+
+def progress_event(i: int, total: int) -> dict:
+    return {
+        "id": 1,
+        "type": "progress",
+        "data": {
+            "renderedFrames": i,
+            "encodedFrames": max(0, i - 4),
+            "progress": i / total,
+            "stitchStage": "encoding",
+        },
+    }
+
+
+def reader_for(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader(limit=len(data) + 1)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def consume_ndjson(data: bytes) -> int:
+    """The pre-framing path: one JSON line per event plus a formatted DEBUG line"""
+    reader = reader_for(data)
+    count = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            return count
+        payload = json.loads(line.decode("utf-8").strip())
+        progress = payload["data"]
+        _ = (f"DEBUG: Progress: {progress['progress'] * 100:.1f}% | Stage: {progress['stitchStage']} | "
+             f"Encoded: {progress['encodedFrames']}/{progress['renderedFrames']}")
+        count += 1
+
+
+async def consume_frames(data: bytes) -> int:
+    reader = reader_for(data)
+    count = 0
+    while await read_frame(reader) is not None:
+        count += 1
+    return count
+
+
+def measure(name: str, consume, data: bytes, events: int):
+    start = time.process_time()
+    decoded = asyncio.run(consume(data))
+    elapsed = time.process_time() - start
+    assert decoded == events
+    print(f"{name:<16} {events / elapsed:>12,.0f} events/s/core  ({len(data) / events:.0f} bytes/event)")
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    messages = [progress_event(i, events) for i in range(events)]
+
+    print(f"Decoding {events:,} progress events")
+    measure("ndjson (old)", consume_ndjson, b"".join(json.dumps(m).encode() + b"\n" for m in messages), events)
+    measure("frames/json", consume_frames, b"".join(encode_frame(m, CODEC_JSON) for m in messages), events)
+    if msgpack is not None:
+        measure("frames/msgpack", consume_frames, b"".join(encode_frame(m, CODEC_MSGPACK) for m in messages), events)
+    else:
+        print("frames/msgpack   skipped (pip install msgpack)")
+
+    # Coalescing bounds events by wall time instead of frame count
+    frames = 60 * 600
+    print(f"\n10 min @ 60 fps: {frames:,} per-frame events vs "
+          f"{settings.PROGRESS_MAX_HZ:g} events/s with coalescing "
+          f"({settings.PROGRESS_MAX_HZ * 600:,.0f} if it renders in real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Microbenchmark: building renderer options from a request with deep input props
+
+Compares the former model_dump + recursive camelCase walk (which also
+re-keyed user props) with the schema-driven alias map. Run from
+packages/fastapi-server:
+
+    python -m benchmarks.options_benchmark [depth] [width]
+"""
+import sys
+import time
+
+from app.models.render import RenderMediaRequest
+from app.services.options import to_node_options
+
+
+def to_camel_case(snake_str: str) -> str:
+    components = snake_str.split('_')
+    return components[0] + ''.join(x.title() for x in components[1:])
+
+
+def convert_dict_to_camel_case(data: dict) -> dict:
+    """The former per-request walk over every nested dict"""
+    result = {}
+    for key, value in data.items():
+        camel_key = to_camel_case(key)
+        if isinstance(value, dict):
+            result[camel_key] = convert_dict_to_camel_case(value)
+        else:
+            result[camel_key] = value
+    return result
+
+
+def walk(request: RenderMediaRequest) -> dict:
+    options = request.model_dump(exclude_none=True)
+    options["codec"] = options["codec"].value
+    options["image_format"] = options["image_format"].value
+    return convert_dict_to_camel_case(options)
+
+
+def deep_props(depth: int, width: int) -> dict:
+    if depth == 0:
+        return {f"leaf_value_{i}": i for i in range(width)}
+    return {f"nested_key_{i}": deep_props(depth - 1, width) for i in range(width)}
+
+
+def measure(name: str, build, request: RenderMediaRequest, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        build(request)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {elapsed / rounds * 1e6:>12,.1f} us/request")
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    request = RenderMediaRequest(
+        serve_url="https://example.com/bundle",
+        composition="MyVideo",
+        input_props=deep_props(depth, width),
+        chromium_options={"disable_web_security": True},
+    )
+    rounds = 20
+
+    print(f"input_props: depth {depth}, width {width} ({width ** (depth + 1):,} leaves)")
+    measure("walk (old)", walk, request, rounds)
+    measure("alias map", to_node_options, request, rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,39 @@
 /**
  * Node.js wrapper for Remotion renderer
- * This script reads JSON from stdin and calls @remotion/renderer functions
+ * This script reads JSON from stdin and calls @remotion/renderer functions.
+ * With --worker it stays alive and serves length-prefixed request frames.
  */
 
-import { renderMedia, renderStill, getCompositions, selectComposition } from '@remotion/renderer';
+import { renderMedia, renderStill, getCompositions, selectComposition, openBrowser, combineChunks } from '@remotion/renderer';
+import type { ChromiumOptions, HeadlessBrowser } from '@remotion/renderer';
+import { promises as dns } from 'dns';
 import { readFileSync } from 'fs';
+import { readFile, writeFile } from 'fs/promises';
+import { join } from 'path';
+
+interface MediaProxyOptions {
+  baseUrl: string;
+  token: string;
+  // Hosts to proxy, empty = all
+  hosts: string[];
+}
+
+// Composition metadata as returned by selectComposition()
+type VideoConfig = Awaited<ReturnType<typeof selectComposition>>;
 
 interface RenderMediaInput {
   serveUrl: string;
   composition: string;
   inputProps: Record<string, unknown>;
+  // Large props are written to a JSON file by the server and passed by path
+  inputPropsPath?: string;
+  // Capture a V8 CPU profile and a Chrome trace into scratchDir
+  profile?: boolean;
+  profileTraceFrames?: number;
+  // Cached selectComposition() result of an earlier render, skips loading the bundle for it
+  compositionMetadata?: VideoConfig;
+  // Fetch remote media in the props through the server's caching proxy
+  mediaProxy?: MediaProxyOptions;
   outputPath: string;
   codec: 'h264' | 'h265' | 'vp8' | 'vp9' | 'prores';
   chromiumOptions?: {
@@ -23,7 +47,10 @@ interface RenderMediaInput {
   jpegQuality: number;
   scale: number;
   everyNthFrame: number;
-  frameRange?: string;
+  // "0-100" or "50" from the API, [start, end] for the segments of a segmented render
+  frameRange?: string | number | [number, number];
+  // Write the audio track to this file instead of muxing it (segments of a segmented render)
+  separateAudioTo?: string;
   envVariables?: Record<string, string>;
   muted: boolean;
   overwrite: boolean;
@@ -40,6 +67,15 @@ interface RenderStillInput {
   serveUrl: string;
   composition: string;
   inputProps: Record<string, unknown>;
+  // Large props are written to a JSON file by the server and passed by path
+  inputPropsPath?: string;
+  // Capture a V8 CPU profile and a Chrome trace into scratchDir
+  profile?: boolean;
+  profileTraceFrames?: number;
+  // Cached selectComposition() result of an earlier render, skips loading the bundle for it
+  compositionMetadata?: VideoConfig;
+  // Fetch remote media in the props through the server's caching proxy
+  mediaProxy?: MediaProxyOptions;
   outputPath: string;
   frame: number;
   imageFormat: 'jpeg' | 'png' | 'webp' | 'pdf';
@@ -54,6 +90,18 @@ interface GetCompositionsInput {
   envVariables?: Record<string, string>;
 }
 
+interface CombineSegmentsInput {
+  videoFiles: string[];
+  audioFiles: string[];
+  outputPath: string;
+  codec: RenderMediaInput['codec'];
+  fps: number;
+  framesPerChunk: number;
+  compositionDurationInFrames: number;
+  frameRange: [number, number];
+  audioBitrate?: number;
+}
+
 interface ProgressData {
   renderedFrames: number;
   encodedFrames: number;
@@ -62,40 +110,605 @@ interface ProgressData {
 }
 
 interface CliInput {
-  command: 'renderMedia' | 'renderStill' | 'getCompositions';
-  options: RenderMediaInput | RenderStillInput | GetCompositionsInput;
+  command:
+    | 'renderMedia'
+    | 'renderStill'
+    | 'getCompositions'
+    | 'selectComposition'
+    | 'combineSegments'
+    | 'warmUp'
+    | 'ping';
+  options: RenderMediaInput | RenderStillInput | GetCompositionsInput | CombineSegmentsInput;
+  // Minimum time between two progress messages (0 = report every frame)
+  progressIntervalMs?: number;
 }
 
-function writeOutput(data: { type: string; data?: unknown; message?: string }): void {
+interface WorkerRequest extends CliInput {
+  id: number;
+}
+
+type OutputMessage = { type: string; data?: unknown; message?: string };
+type Emit = (data: OutputMessage) => void;
+
+function writeOutput(data: OutputMessage): void {
   process.stdout.write(JSON.stringify(data) + '\n');
 }
 
+/**
+ * Worker protocol framing: 4-byte big-endian payload length, 1-byte codec
+ * tag ('j' = JSON, 'm' = msgpack), payload. msgpack is used when the server
+ * asks for it (IPC_CODEC) and @msgpack/msgpack is installed.
+ */
+const FRAME_HEADER_SIZE = 5;
+const CODEC_JSON = 0x6a;
+const CODEC_MSGPACK = 0x6d;
+
+interface MsgpackModule {
+  encode(value: unknown): Uint8Array;
+  decode(buffer: Uint8Array): unknown;
+}
+
+let msgpack: MsgpackModule | null = null;
+
+async function loadMsgpack(): Promise<void> {
+  if (process.env.IPC_CODEC !== 'msgpack') {
+    return;
+  }
+
+  // Optional dependency, resolved at runtime
+  const moduleName = '@msgpack/msgpack';
+  try {
+    msgpack = (await import(moduleName)) as MsgpackModule;
+  } catch {
+    msgpack = null;
+  }
+}
+
+function writeFrame(data: OutputMessage): void {
+  const payload = msgpack ? Buffer.from(msgpack.encode(data)) : Buffer.from(JSON.stringify(data), 'utf-8');
+  const header = Buffer.alloc(FRAME_HEADER_SIZE);
+  header.writeUInt32BE(payload.length, 0);
+  header.writeUInt8(msgpack ? CODEC_MSGPACK : CODEC_JSON, 4);
+  process.stdout.write(Buffer.concat([header, payload]));
+}
+
+function decodeFrame(codec: number, payload: Buffer): unknown {
+  if (codec === CODEC_JSON) {
+    return JSON.parse(payload.toString('utf-8'));
+  }
+  if (codec === CODEC_MSGPACK && msgpack) {
+    return msgpack.decode(payload);
+  }
+  throw new Error(`Unsupported frame codec: ${codec}`);
+}
+
+async function* readFrames(stream: NodeJS.ReadableStream): AsyncGenerator<unknown> {
+  let buffer = Buffer.alloc(0);
+  for await (const chunk of stream) {
+    buffer = Buffer.concat([buffer, chunk as Buffer]);
+    while (buffer.length >= FRAME_HEADER_SIZE) {
+      const length = buffer.readUInt32BE(0);
+      if (buffer.length < FRAME_HEADER_SIZE + length) {
+        break;
+      }
+      const codec = buffer.readUInt8(4);
+      const payload = buffer.subarray(FRAME_HEADER_SIZE, FRAME_HEADER_SIZE + length);
+      buffer = buffer.subarray(FRAME_HEADER_SIZE + length);
+      yield decodeFrame(codec, payload);
+    }
+  }
+}
+
+// Messages not tied to a request (browser stats) go through the active transport
+let writeMessage: (data: OutputMessage) => void = writeOutput;
+
+/**
+ * Time-based progress coalescing: at most one progress message per interval,
+ * the latest value wins. Stage changes and completion are sent immediately.
+ */
+function coalesceProgress(emit: Emit, intervalMs: number) {
+  let lastSent = 0;
+  let lastStage: string | undefined;
+  let pending: ProgressData | null = null;
+  let timer: NodeJS.Timeout | null = null;
+
+  const clearTimer = () => {
+    if (timer) {
+      clearTimeout(timer);
+      timer = null;
+    }
+  };
+
+  const send = (progress: ProgressData) => {
+    clearTimer();
+    pending = null;
+    lastSent = Date.now();
+    lastStage = progress.stitchStage;
+    emit({ type: 'progress', data: progress });
+  };
+
+  return {
+    update(progress: ProgressData) {
+      const elapsed = Date.now() - lastSent;
+      if (elapsed >= intervalMs || progress.stitchStage !== lastStage || progress.progress >= 1) {
+        send(progress);
+        return;
+      }
+
+      pending = progress;
+      if (!timer) {
+        timer = setTimeout(() => {
+          if (pending) {
+            send(pending);
+          }
+        }, intervalMs - elapsed);
+      }
+    },
+    flush() {
+      if (pending) {
+        send(pending);
+      }
+    },
+    dispose: clearTimer,
+  };
+}
+
 function writeError(message: string): void {
   process.stderr.write(JSON.stringify({ type: 'error', message }) + '\n');
 }
 
-async function main() {
+/**
+ * Browser pool: every worker keeps one Chrome instance open between jobs and
+ * passes it as `puppeteerInstance`. It is closed after BROWSER_IDLE_SECONDS
+ * without a job (0 = kept open) and relaunched when it crashed or other Chromium
+ * options are needed.
+ */
+const BROWSER_IDLE_SECONDS = Number(process.env.BROWSER_IDLE_SECONDS ?? 300);
+const BROWSER_HEALTH_TIMEOUT_MS = 2000;
+
+interface BrowserStats {
+  open: boolean;
+  launches: number;
+  reuses: number;
+  evictions: number;
+  crashes: number;
+}
+
+const browserPool = {
+  instance: null as HeadlessBrowser | null,
+  key: null as string | null,
+  idleTimer: null as NodeJS.Timeout | null,
+  stats: { launches: 0, reuses: 0, evictions: 0, crashes: 0 },
+};
+
+function browserStats(): BrowserStats {
+  return { open: browserPool.instance !== null, ...browserPool.stats };
+}
+
+// The CDP methods used here are not in Remotion's typed command list
+interface CdpConnection {
+  send(method: string, params?: object): Promise<{ value: any }>;
+  once(event: string, handler: (params: any) => void): unknown;
+}
+
+function cdp(browser: HeadlessBrowser): CdpConnection {
+  return browser.connection as unknown as CdpConnection;
+}
+
+async function isBrowserHealthy(browser: HeadlessBrowser): Promise<boolean> {
+  let timer: NodeJS.Timeout | undefined;
   try {
-    // Read input from stdin
-    const inputStr = readFileSync(0, 'utf-8').trim();
-    const input: CliInput = JSON.parse(inputStr);
+    await Promise.race([
+      cdp(browser).send('Browser.getVersion'),
+      new Promise((_, reject) => {
+        timer = setTimeout(() => reject(new Error('Browser health check timed out')), BROWSER_HEALTH_TIMEOUT_MS);
+      }),
+    ]);
+    return true;
+  } catch {
+    return false;
+  } finally {
+    clearTimeout(timer);
+  }
+}
 
-    writeOutput({ type: 'info', message: `Received command: ${input.command}` });
+async function closeBrowser(): Promise<void> {
+  const browser = browserPool.instance;
+  browserPool.instance = null;
+  browserPool.key = null;
+  if (browser) {
+    await browser.close({ silent: true }).catch(() => undefined);
+  }
+}
 
-    if (input.command === 'renderMedia') {
-      const opts = input.options as RenderMediaInput;
+// Without chromiumOptions (every command but renderMedia) the open browser is
+// reused whatever it was launched with, so stills do not relaunch it between videos
+async function acquireBrowser(chromiumOptions?: ChromiumOptions): Promise<HeadlessBrowser> {
+  if (browserPool.idleTimer) {
+    clearTimeout(browserPool.idleTimer);
+    browserPool.idleTimer = null;
+  }
 
-      writeOutput({ type: 'info', message: `Starting render for composition ${opts.composition}` });
-      writeOutput({ type: 'info', message: `Input props: ${JSON.stringify(opts.inputProps)}` });
+  const key = JSON.stringify(chromiumOptions ?? {});
+  if (browserPool.instance) {
+    if (chromiumOptions !== undefined && browserPool.key !== key) {
+      await closeBrowser();
+    } else if (!(await isBrowserHealthy(browserPool.instance))) {
+      browserPool.stats.crashes++;
+      await closeBrowser();
+    } else {
+      browserPool.stats.reuses++;
+      return browserPool.instance;
+    }
+  }
 
-      const composition = await selectComposition({
-        serveUrl: opts.serveUrl,
-        id: opts.composition,
-        inputProps: opts.inputProps,
-      });
+  browserPool.stats.launches++;
+  browserPool.instance = await openBrowser('chrome', { chromiumOptions });
+  browserPool.key = key;
+  return browserPool.instance;
+}
+
+function releaseBrowser(): void {
+  if (!browserPool.instance || BROWSER_IDLE_SECONDS <= 0) {
+    return;
+  }
+
+  browserPool.idleTimer = setTimeout(async () => {
+    browserPool.idleTimer = null;
+    browserPool.stats.evictions++;
+    await closeBrowser();
+    writeMessage({ type: 'browser', data: browserStats() });
+  }, BROWSER_IDLE_SECONDS * 1000);
+  browserPool.idleTimer.unref();
+}
+
+function formatError(error: unknown): string {
+  const errorMessage = error instanceof Error ? error.message : String(error);
+  const stack = error instanceof Error ? error.stack : '';
+  return `${errorMessage}\nStack: ${stack}`;
+}
+
+const CPU_PROFILE_FILE = 'renderer.cpuprofile';
+const CHROME_TRACE_FILE = 'chrome-trace.json';
+const TRACE_CATEGORIES = [
+  'devtools.timeline',
+  'disabled-by-default-devtools.timeline',
+  'disabled-by-default-devtools.timeline.frame',
+  'v8.execute',
+  'blink.user_timing',
+  'toplevel',
+].join(',');
+
+interface JobProfiler {
+  onFrame(renderedFrames: number): void;
+  stop(): Promise<void>;
+}
+
+/**
+ * Profile this Node process with the V8 inspector until the returned function is called.
+ * The inspector module is only loaded when profiling is requested.
+ */
+async function startCpuProfile(): Promise<() => Promise<unknown>> {
+  const { Session } = await import('inspector');
+  const session = new Session();
+  session.connect();
+  const post = (method: string, params: object = {}) =>
+    new Promise<any>((resolve, reject) =>
+      session.post(method, params, (error: Error | null, result?: unknown) => (error ? reject(error) : resolve(result))),
+    );
+  await post('Profiler.enable');
+  await post('Profiler.start');
+  return async () => {
+    try {
+      const { profile } = await post('Profiler.stop');
+      return profile;
+    } finally {
+      session.disconnect();
+    }
+  };
+}
+
+/**
+ * Record a Chrome trace of the shared browser until the returned function is called.
+ */
+async function startChromeTrace(browser: HeadlessBrowser): Promise<() => Promise<string>> {
+  const connection = cdp(browser);
+  await connection.send('Tracing.start', { categories: TRACE_CATEGORIES, transferMode: 'ReturnAsStream' });
+  return async () => {
+    const complete = new Promise<{ stream: string }>((resolve) => connection.once('Tracing.tracingComplete', resolve));
+    await connection.send('Tracing.end');
+    const { stream } = await complete;
+    const chunks: string[] = [];
+    for (;;) {
+      const { value } = await connection.send('IO.read', { handle: stream });
+      chunks.push(value.base64Encoded ? Buffer.from(value.data, 'base64').toString('utf-8') : value.data);
+      if (value.eof) {
+        break;
+      }
+    }
+    await connection.send('IO.close', { handle: stream });
+    return chunks.join('');
+  };
+}
+
+/**
+ * CPU profile of the whole job plus a Chrome trace of a window of `traceFrames`
+ * frames starting at the first rendered frame (0 = until the end of the job).
+ * Profiling problems are reported as info messages and never fail the render.
+ */
+async function startProfiler(browser: HeadlessBrowser, dir: string, traceFrames: number, emit: Emit): Promise<JobProfiler> {
+  const report = (error: unknown) => emit({ type: 'info', message: `Profiling failed: ${formatError(error)}` });
+  const stopCpu = await startCpuProfile().catch((error) => {
+    report(error);
+    return null;
+  });
 
-      writeOutput({ type: 'info', message: `Selected composition: ${composition.id}` });
+  let stopTrace: Promise<(() => Promise<string>) | null> | null = null;
+  let traceWritten: Promise<void> = Promise.resolve();
+  let firstFrame = -1;
+  let stopped: Promise<void> | null = null;
 
+  const beginTrace = () => {
+    stopTrace = startChromeTrace(browser).catch((error) => {
+      report(error);
+      return null;
+    });
+  };
+  const endTrace = () => {
+    const pending = stopTrace;
+    stopTrace = null;
+    if (pending) {
+      traceWritten = pending
+        .then(async (stop) => {
+          if (stop) {
+            await writeFile(join(dir, CHROME_TRACE_FILE), await stop());
+          }
+        })
+        .catch(report);
+    }
+  };
+
+  if (traceFrames <= 0) {
+    beginTrace();
+  }
+
+  return {
+    onFrame(renderedFrames: number) {
+      if (traceFrames <= 0) {
+        return;
+      }
+      if (firstFrame < 0) {
+        firstFrame = renderedFrames;
+        beginTrace();
+      } else if (stopTrace && renderedFrames >= firstFrame + traceFrames) {
+        endTrace();
+      }
+    },
+    stop() {
+      stopped ??= (async () => {
+        endTrace();
+        await traceWritten;
+        if (stopCpu) {
+          try {
+            await writeFile(join(dir, CPU_PROFILE_FILE), JSON.stringify(await stopCpu()));
+          } catch (error) {
+            report(error);
+          }
+        }
+      })();
+      return stopped;
+    },
+  };
+}
+
+/**
+ * Read props passed by reference (inputPropsPath) into inputProps.
+ */
+async function loadInputProps(options: CliInput['options']): Promise<void> {
+  const opts = options as RenderMediaInput | RenderStillInput;
+  if (opts.inputPropsPath) {
+    opts.inputProps = JSON.parse(await readFile(opts.inputPropsPath, 'utf-8'));
+    delete opts.inputPropsPath;
+  }
+}
+
+async function handleCommand(input: CliInput, emit: Emit): Promise<void> {
+  if (input.command === 'ping') {
+    emit({ type: 'pong' });
+    return;
+  }
+
+  emit({ type: 'info', message: `Received command: ${input.command}` });
+
+  await loadInputProps(input.options);
+
+  // Only render requests carry browser options, a video without them needs a default browser
+  const chromiumOptions =
+    input.command === 'renderMedia'
+      ? (((input.options as RenderMediaInput).chromiumOptions ?? {}) as ChromiumOptions)
+      : undefined;
+  const browser = await acquireBrowser(chromiumOptions);
+  // Frames and intermediate files go to the job's scratch directory. TMPDIR is
+  // only switched after the shared browser is launched: its profile must outlive the job.
+  const scratchDir = (input.options as { scratchDir?: string }).scratchDir;
+  const previousTmpdir = process.env.TMPDIR;
+  if (scratchDir) {
+    process.env.TMPDIR = scratchDir;
+  }
+  const opts = input.options as RenderMediaInput | RenderStillInput;
+  // Nothing is loaded or started unless profiling is requested
+  const profiler =
+    opts.profile && scratchDir ? await startProfiler(browser, scratchDir, opts.profileTraceFrames ?? 0, emit) : null;
+  try {
+    await runCommand(input, browser, emit, profiler);
+  } finally {
+    await profiler?.stop();
+    if (scratchDir) {
+      if (previousTmpdir === undefined) {
+        delete process.env.TMPDIR;
+      } else {
+        process.env.TMPDIR = previousTmpdir;
+      }
+    }
+    releaseBrowser();
+  }
+}
+
+// "0-100" -> [0, 100], "50" -> 50
+function parseFrameRange(value: RenderMediaInput['frameRange']): number | [number, number] | null {
+  if (value === undefined || value === null || value === '') {
+    return null;
+  }
+  if (typeof value !== 'string') {
+    return value;
+  }
+  const [start, end] = value.split('-').map((part) => Number(part.trim()));
+  return end === undefined ? start : [start, end];
+}
+
+// Composition metadata from the server's cache, or selected from the bundle and
+// reported back so that the next render of the same props can skip it
+async function resolveComposition(
+  opts: RenderMediaInput | RenderStillInput,
+  browser: HeadlessBrowser,
+  emit: Emit,
+): Promise<VideoConfig> {
+  let composition = opts.compositionMetadata;
+  if (!composition) {
+    composition = await selectComposition({
+      serveUrl: opts.serveUrl,
+      id: opts.composition,
+      inputProps: opts.inputProps,
+      puppeteerInstance: browser,
+    });
+    // Reported with the original URLs: proxy URLs are specific to this render
+    emit({ type: 'composition', data: composition });
+  }
+  if (!opts.mediaProxy) {
+    return composition;
+  }
+  const internal = await internalHosts([opts.inputProps, composition.props], opts.mediaProxy);
+  opts.inputProps = proxyMediaUrls(opts.inputProps, opts.mediaProxy, internal);
+  return { ...composition, props: proxyMediaUrls(composition.props, opts.mediaProxy, internal) };
+}
+
+// Loopback, private, link-local, single-label (Docker service) or private-network
+// names, as is_internal_host in http_cache.py
+function isInternalHost(hostname: string): boolean {
+  const host = hostname.toLowerCase().replace(/^\[|\]$/g, '').replace(/\.$/, '');
+  if (host === 'localhost' || /\.(localhost|internal|local|lan|home\.arpa)$/.test(host)) {
+    return true;
+  }
+  if (host.startsWith('::ffff:') && host.includes('.')) {
+    return isInternalHost(host.slice('::ffff:'.length));
+  }
+  if (host.includes(':')) {
+    return /^(::1?$|f[cd]|fe[89ab])/.test(host);
+  }
+  return !host.includes('.') || /^((127|10|0)\.|192\.168\.|169\.254\.|172\.(1[6-9]|2\d|3[01])\.)/.test(host);
+}
+
+function collectHosts(value: unknown, hosts: Set<string>): void {
+  if (typeof value === 'string') {
+    if (/^https?:\/\//.test(value)) {
+      try {
+        hosts.add(new URL(value).hostname);
+      } catch {
+        // Not a URL, never proxied
+      }
+    }
+  } else if (Array.isArray(value)) {
+    value.forEach((item) => collectHosts(item, hosts));
+  } else if (value !== null && typeof value === 'object') {
+    Object.values(value as Record<string, unknown>).forEach((item) => collectHosts(item, hosts));
+  }
+}
+
+// Hosts of props URLs that are internal by name or by the addresses they resolve to.
+// The server refuses them, so they are loaded directly (unresolvable ones too).
+async function internalHosts(values: unknown[], proxy: MediaProxyOptions): Promise<Set<string>> {
+  const hosts = new Set<string>();
+  values.forEach((value) => collectHosts(value, hosts));
+  const local = new URL(proxy.baseUrl).hostname;
+  const candidates = [...hosts].filter(
+    (hostname) => hostname !== local && (proxy.hosts.length === 0 || proxy.hosts.includes(hostname.toLowerCase())),
+  );
+  const internal = new Set<string>();
+  await Promise.all(
+    candidates.map(async (hostname) => {
+      if (isInternalHost(hostname)) {
+        internal.add(hostname);
+        return;
+      }
+      try {
+        const addresses = await dns.lookup(hostname.replace(/^\[|\]$/g, ''), { all: true });
+        if (addresses.some(({ address }) => isInternalHost(address))) {
+          internal.add(hostname);
+        }
+      } catch {
+        internal.add(hostname);
+      }
+    }),
+  );
+  return internal;
+}
+
+// Point the http(s) URLs of props at the media proxy:
+// https://cdn/img.png -> <baseUrl>/<token>/<base64url of the URL>/img.png
+function proxyMediaUrls<T>(value: T, proxy: MediaProxyOptions, internal: Set<string>): T {
+  if (typeof value === 'string') {
+    if (!/^https?:\/\//.test(value)) {
+      return value;
+    }
+    let url: URL;
+    try {
+      url = new URL(value);
+    } catch {
+      return value;
+    }
+    // Files of this server (assets, bundles) are already local
+    if (url.origin === new URL(proxy.baseUrl).origin) {
+      return value;
+    }
+    if (proxy.hosts.length > 0 && !proxy.hosts.includes(url.hostname.toLowerCase())) {
+      return value;
+    }
+    // The server refuses internal hosts, they are loaded directly
+    if (internal.has(url.hostname)) {
+      return value;
+    }
+    // The last path segment keeps the extension, some media types are sniffed from it
+    const name = encodeURIComponent(url.pathname.split('/').pop() || 'file');
+    return `${proxy.baseUrl}/${proxy.token}/${Buffer.from(value).toString('base64url')}/${name}` as T;
+  }
+  if (Array.isArray(value)) {
+    return value.map((item) => proxyMediaUrls(item, proxy, internal)) as T;
+  }
+  if (value !== null && typeof value === 'object') {
+    return Object.fromEntries(
+      Object.entries(value as Record<string, unknown>).map(([key, item]) => [key, proxyMediaUrls(item, proxy, internal)]),
+    ) as T;
+  }
+  return value;
+}
+
+async function runCommand(
+  input: CliInput,
+  browser: HeadlessBrowser,
+  emit: Emit,
+  profiler: JobProfiler | null = null,
+): Promise<void> {
+  if (input.command === 'renderMedia') {
+    const opts = input.options as RenderMediaInput;
+
+    emit({ type: 'info', message: `Starting render for composition ${opts.composition}` });
+
+    const composition = await resolveComposition(opts, browser, emit);
+
+    emit({ type: 'info', message: `Selected composition: ${composition.id}` });
+
+    const progress = coalesceProgress(emit, input.progressIntervalMs ?? 0);
+    try {
       await renderMedia({
         serveUrl: opts.serveUrl,
         composition,
@@ -107,6 +720,8 @@ async function main() {
         jpegQuality: opts.jpegQuality,
         scale: opts.scale,
         everyNthFrame: opts.everyNthFrame,
+        frameRange: parseFrameRange(opts.frameRange),
+        separateAudioTo: opts.separateAudioTo,
         envVariables: opts.envVariables,
         muted: opts.muted,
         overwrite: opts.overwrite,
@@ -114,6 +729,7 @@ async function main() {
         videoBitrate: opts.videoBitrate,
         fps: opts.fps,
         enforceAudioTrack: opts.enforceAudioTrack,
+        puppeteerInstance: browser,
         // Add FFmpeg optimization flags automatically
         ffmpegCraneflag: [
           // Use multiple threads for faster encoding
@@ -124,63 +740,142 @@ async function main() {
           // User-specified flags take precedence
           ...(opts.ffmpegCraneflag || [])
         ],
-        onProgress: (progress: ProgressData) => {
-          writeOutput({ type: 'progress', data: progress });
+        onProgress: (data: ProgressData) => {
+          profiler?.onFrame(data.renderedFrames);
+          progress.update(data);
         },
       });
+      progress.flush();
+    } finally {
+      progress.dispose();
+    }
 
-      writeOutput({ type: 'complete' });
-    } else if (input.command === 'renderStill') {
-      const opts = input.options as RenderStillInput;
+    // Profile files must be written before the server collects the job's files
+    await profiler?.stop();
+    emit({ type: 'complete' });
+  } else if (input.command === 'renderStill') {
+    const opts = input.options as RenderStillInput;
 
-      const composition = await selectComposition({
-        serveUrl: opts.serveUrl,
-        id: opts.composition,
-        inputProps: opts.inputProps,
-      });
+    const composition = await resolveComposition(opts, browser, emit);
 
-      await renderStill({
-        serveUrl: opts.serveUrl,
-        composition,
-        inputProps: opts.inputProps,
-        output: opts.outputPath,
-        frame: opts.frame,
-        imageFormat: opts.imageFormat,
-        jpegQuality: opts.jpegQuality,
-        scale: opts.scale,
-        overwrite: opts.overwrite,
-      });
+    await renderStill({
+      serveUrl: opts.serveUrl,
+      composition,
+      inputProps: opts.inputProps,
+      output: opts.outputPath,
+      frame: opts.frame,
+      imageFormat: opts.imageFormat,
+      jpegQuality: opts.jpegQuality,
+      scale: opts.scale,
+      overwrite: opts.overwrite,
+      puppeteerInstance: browser,
+    });
 
-      writeOutput({ type: 'complete' });
-    } else if (input.command === 'getCompositions') {
-      const opts = input.options as GetCompositionsInput;
+    await profiler?.stop();
+    emit({ type: 'complete' });
+  } else if (input.command === 'selectComposition') {
+    // Reports the metadata (a 'composition' message) unless the server already had it
+    await resolveComposition(input.options as RenderMediaInput, browser, emit);
+    emit({ type: 'complete' });
+  } else if (input.command === 'combineSegments') {
+    const opts = input.options as CombineSegmentsInput;
 
-      const comps = await getCompositions(opts.serveUrl, {
-        inputProps: opts.inputProps,
-        envVariables: opts.envVariables,
-      });
+    // Video is concatenated without re-encoding, audio seamlessly where the codec allows it
+    await combineChunks({
+      outputLocation: opts.outputPath,
+      videoFiles: opts.videoFiles,
+      audioFiles: opts.audioFiles,
+      codec: opts.codec,
+      fps: opts.fps,
+      framesPerChunk: opts.framesPerChunk,
+      compositionDurationInFrames: opts.compositionDurationInFrames,
+      frameRange: opts.frameRange,
+      preferLossless: false,
+      audioBitrate: opts.audioBitrate ? String(opts.audioBitrate) : null,
+    });
+    emit({ type: 'complete' });
+  } else if (input.command === 'warmUp') {
+    // The browser was launched by acquireBrowser, the next job finds it open
+    emit({ type: 'complete' });
+  } else if (input.command === 'getCompositions') {
+    const opts = input.options as GetCompositionsInput;
 
-      writeOutput({
-        type: 'compositions',
-        data: comps.map((c) => ({
-          id: c.id,
-          width: c.width,
-          height: c.height,
-          fps: c.fps,
-          durationInFrames: c.durationInFrames,
-          defaultOutput: c.defaultProps,
-        })),
-      });
-    } else {
-      writeError(`Unknown command: ${input.command}`);
-      process.exit(1);
+    const comps = await getCompositions(opts.serveUrl, {
+      inputProps: opts.inputProps,
+      envVariables: opts.envVariables,
+      puppeteerInstance: browser,
+    });
+
+    emit({
+      type: 'compositions',
+      data: comps.map((c) => ({
+        id: c.id,
+        width: c.width,
+        height: c.height,
+        fps: c.fps,
+        durationInFrames: c.durationInFrames,
+        defaultOutput: c.defaultProps,
+      })),
+    });
+  } else {
+    throw new Error(`Unknown command: ${input.command}`);
+  }
+}
+
+/**
+ * Worker mode: stay alive and serve length-prefixed request frames.
+ * Requests are handled one at a time; every message is tagged with the request id.
+ */
+async function runWorker() {
+  // stdout is reserved for the protocol, send library logging to stderr
+  console.log = console.error;
+  console.info = console.error;
+
+  await loadMsgpack();
+  writeMessage = writeFrame;
+  // The server only sends msgpack frames if this worker can decode them
+  writeFrame({ type: 'ready', data: { codec: msgpack ? 'msgpack' : 'json' } });
+
+  try {
+    for await (const frame of readFrames(process.stdin)) {
+      const request = frame as WorkerRequest;
+      const emit: Emit = (data) => writeFrame({ id: request.id, ...data } as OutputMessage);
+      try {
+        await handleCommand(request, emit);
+      } catch (error) {
+        emit({ type: 'error', message: formatError(error) });
+      }
+      writeFrame({ type: 'browser', data: browserStats() });
     }
   } catch (error) {
-    const errorMessage = error instanceof Error ? error.message : String(error);
-    const stack = error instanceof Error ? error.stack : '';
-    writeError(`${errorMessage}\nStack: ${stack}`);
+    // A corrupted request stream cannot be resynchronized
+    writeError(`Invalid request stream: ${formatError(error)}`);
+    await closeBrowser();
+    process.exit(1);
+  }
+
+  // stdin closed: the server asked us to exit
+  await closeBrowser();
+  process.exit(0);
+}
+
+async function main() {
+  try {
+    // Read input from stdin
+    const inputStr = readFileSync(0, 'utf-8').trim();
+    const input: CliInput = JSON.parse(inputStr);
+
+    await handleCommand(input, writeOutput);
+    await closeBrowser();
+  } catch (error) {
+    writeError(formatError(error));
+    await closeBrowser();
     process.exit(1);
   }
 }
 
-main();
+if (process.argv.includes('--worker')) {
+  runWorker();
+} else {
+  main();
+}
@@ -2,8 +2,16 @@
 import pytest
 import asyncio
 from httpx import AsyncClient
+from app.config import settings
 from app.main import app
+from app.services.composition_cache import composition_cache
+from app.services.props_store import props_store
 from app.services.queue import RenderQueue
+from app.services.result_cache import result_cache
+from app.services.scratch import scratch
+from app.services.segments import segment_cache
+from app.services.stills import still_service
+from app.services.storage import storage
 
 
 @pytest.fixture(scope="session")
@@ -14,6 +22,27 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def isolated_dirs(monkeypatch, tmp_path):
+    """Outputs and caches of each test go to tmp_path instead of the working tree"""
+    outputs = tmp_path / "outputs"
+    monkeypatch.setattr(settings, "OUTPUT_DIR", str(outputs))
+    monkeypatch.setattr(settings, "COMPOSITION_CACHE_DIR", str(tmp_path / "compositions"))
+    monkeypatch.setattr(storage, "output_dir", outputs)
+    monkeypatch.setattr(scratch, "fallback_root", outputs / ".scratch")
+    monkeypatch.setattr(props_store, "props_dir", tmp_path / "props")
+    caches = [
+        (composition_cache, tmp_path / "compositions"),
+        (result_cache, outputs / ".results"),
+        (segment_cache, outputs / ".segments"),
+        (still_service.cache, outputs / ".stills"),
+    ]
+    for cache, directory in caches:
+        monkeypatch.setattr(cache, "directory", directory)
+        monkeypatch.setattr(cache, "entries", type(cache.entries)())
+        monkeypatch.setattr(cache, "_loaded", False)
+
+
 @pytest.fixture
 async def client():
     """Create async HTTP client for testing"""
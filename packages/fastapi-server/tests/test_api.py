@@ -61,3 +61,182 @@ async def test_list_jobs(client: AsyncClient):
     assert response.status_code == 200
     assert "jobs" in response.json()
     assert "total" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(client: AsyncClient):
+    """Test worker and browser pool stats endpoint"""
+    response = await client.get("/api/v1/pool")
+    assert response.status_code == 200
+    assert "browsers" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_startup_report(client: AsyncClient):
+    """Test startup report records the first accepted request"""
+    response = await client.get("/api/v1/startup")
+    assert response.status_code == 200
+    assert response.json()["first_request"] is not None
+
+
+@pytest.mark.asyncio
+async def test_large_input_props_are_passed_by_path(client: AsyncClient, monkeypatch, tmp_path):
+    """Large props are stored once by content hash and referenced by path"""
+    import json
+    from app.config import settings
+    from app.services.props_store import props_store
+    from app.services.queue import get_queue
+
+    monkeypatch.setattr(settings, "INPUT_PROPS_INLINE_MAX_BYTES", 1024)
+    monkeypatch.setattr(props_store, "props_dir", tmp_path)
+    props = {"rows": [{"some_value": i} for i in range(500)]}
+    payload = {"serve_url": "https://example.com/bundle", "composition": "MyVideo", "input_props": props}
+
+    job_ids = []
+    for _ in range(2):
+        response = await client.post("/api/v1/render/media", json=payload)
+        assert response.status_code == 200
+        job_ids.append(response.json()["job_id"])
+
+    options = [get_queue().get_job(job_id).options for job_id in job_ids]
+    assert "inputProps" not in options[0]
+    assert options[0]["inputPropsPath"] == options[1]["inputPropsPath"]
+    assert json.loads(open(options[0]["inputPropsPath"]).read()) == props
+
+    # Measured on the props themselves, a chunked body has no Content-Length
+    body = json.dumps(payload).encode()
+
+    async def chunks():
+        for i in range(0, len(body), 512):
+            yield body[i:i + 512]
+
+    response = await client.post(
+        "/api/v1/render/media",
+        content=chunks(),
+        headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 200
+    job_ids.append(response.json()["job_id"])
+    assert get_queue().get_job(job_ids[-1]).options["inputPropsPath"] == options[0]["inputPropsPath"]
+
+    for job_id in job_ids:
+        await get_queue().cancel(job_id)
+
+
+@pytest.mark.asyncio
+async def test_compositions_are_cached_and_coalesced(client: AsyncClient, monkeypatch):
+    """Concurrent identical listings share one evaluation, then revalidate with ETag"""
+    import asyncio
+    from app.routes import compositions
+    from app.services.composition_list import CompositionListCache
+
+    calls = []
+
+    class FakeRenderer:
+        async def get_compositions(self, options):
+            calls.append(options)
+            await asyncio.sleep(0.05)
+            return [{"id": "Main", "width": 1920, "height": 1080, "fps": 30, "durationInFrames": 90}]
+
+    monkeypatch.setattr(compositions, "composition_lists", CompositionListCache())
+    monkeypatch.setattr(compositions, "get_renderer", lambda: FakeRenderer())
+    payload = {"serve_url": "https://example.com/site/", "input_props": {"a": 1}}
+
+    responses = await asyncio.gather(*[client.post("/api/v1/compositions", json=payload) for _ in range(3)])
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len(calls) == 1
+    etag = responses[0].headers["etag"]
+
+    response = await client.post("/api/v1/compositions", json=payload, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    response = await client.post("/api/v1/compositions", json={**payload, "input_props": {"a": 2}})
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_uploaded_assets_are_served_and_referenced(client: AsyncClient, monkeypatch, tmp_path):
+    """asset:// references in input props point at the uploaded file"""
+    from app.services.assets import asset_store
+    from app.services.queue import get_queue
+
+    monkeypatch.setattr(asset_store, "root", tmp_path)
+    content = bytes(range(256)) * 4
+    response = await client.post("/api/v1/assets", files={"file": ("clip.mp4", content, "video/mp4")})
+    assert response.status_code == 200
+    asset = response.json()
+    assert asset["size"] == len(content)
+
+    response = await client.get(f"/api/v1/assets/{asset['asset_id']}", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+    assert response.headers["content-type"] == "video/mp4"
+
+    payload = {"serve_url": "https://example.com/bundle", "composition": "MyVideo", "input_props": {"clips": [{"src": asset["ref"]}]}}
+    response = await client.post("/api/v1/render/media", json=payload)
+    assert response.status_code == 200
+    job = get_queue().get_job(response.json()["job_id"])
+    assert job.options["inputProps"] == {"clips": [{"src": asset["url"]}]}
+    await get_queue().cancel(job.id)
+
+    payload["input_props"] = {"src": "asset://" + "0" * 64}
+    response = await client.post("/api/v1/render/media", json=payload)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_still_endpoint_renders_once_and_revalidates(client: AsyncClient, monkeypatch, tmp_path):
+    """Identical stills are rendered once, negotiated from Accept and answered 304 on a matching ETag"""
+    import asyncio
+    from app.config import settings
+    from app.services.result_cache import ResultCache
+    from app.services.stills import still_service
+
+    calls = []
+
+    class FakeRenderer:
+        async def render_still(self, options, on_progress=None, context=None):
+            calls.append(options)
+            await asyncio.sleep(0.05)
+            open(options["outputPath"], "wb").write(options["imageFormat"].encode())
+
+    monkeypatch.setattr(still_service, "_renderer", FakeRenderer())
+    monkeypatch.setattr(still_service, "cache", ResultCache("still_cache", str(tmp_path / "stills"), 0, 0))
+    url = "/api/v1/still/Card?serve_url=https://example.com/site/&props=%7B%22title%22%3A%22Hi%22%7D"
+
+    responses = await asyncio.gather(*[client.get(url, headers={"Accept": "image/webp,*/*;q=0.8"}) for _ in range(3)])
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len(calls) == 1
+    assert calls[0]["inputProps"] == {"title": "Hi"}
+    assert responses[0].headers["content-type"] == "image/webp"
+    assert responses[0].headers["vary"] == "Accept"
+    # A serve_url can be redeployed, its stills are only cached briefly
+    assert responses[0].headers["cache-control"] == f"public, max-age={settings.STILL_MUTABLE_MAX_AGE_SECONDS}"
+    assert responses[0].content == b"webp"
+    etag = responses[0].headers["etag"]
+
+    response = await client.get(url, headers={"Accept": "image/webp", "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.get(url + "&format=png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] != etag
+    assert len(calls) == 2
+
+    response = await client.get("/api/v1/still/Card?serve_url=https://example.com/site/&props=%5B")
+    assert response.status_code == 400
+
+
+def test_still_format_negotiation():
+    """Explicit types win by quality, wildcards alone get the default format"""
+    from app.services.stills import negotiate_format
+
+    assert negotiate_format(None) == "png"
+    assert negotiate_format("*/*") == "png"
+    assert negotiate_format("image/*") == "png"
+    assert negotiate_format("image/avif,image/webp,*/*;q=0.8") == "webp"
+    assert negotiate_format("image/jpeg;q=0.5,image/webp;q=0.4") == "jpeg"
+    assert negotiate_format("image/png;q=0,*/*") == "webp"
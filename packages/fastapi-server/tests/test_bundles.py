@@ -0,0 +1,94 @@
+"""Bundle upload and registry tests"""
+import io
+import zipfile
+import pytest
+from httpx import AsyncClient
+
+from app.services.bundles import BundleRegistry
+
+
+INDEX_HTML = '''<html><head><script>window.remotion_publicPath = "/";</script></head>
+<body><script src="/bundle.js"></script></body></html>'''
+
+
+def make_zip(bundle_js: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("build/index.html", INDEX_HTML)
+        archive.writestr("build/bundle.js", bundle_js)
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_uploaded_bundles_are_versioned_and_served_immutable(client: AsyncClient, monkeypatch, tmp_path):
+    registry = BundleRegistry()
+    registry.root = tmp_path
+    monkeypatch.setattr("app.services.bundles.bundle_registry", registry)
+    monkeypatch.setattr("app.routes.bundles.bundle_registry", registry)
+    monkeypatch.setattr("app.services.sources.bundle_registry", registry)
+
+    uploads = []
+    for source in ("v1", "v2", "v2"):
+        response = await client.post(
+            "/api/v1/bundles",
+            files={"file": ("bundle.zip", make_zip(source), "application/zip")},
+            data={"name": "promo"}
+        )
+        assert response.status_code == 200
+        uploads.append(response.json())
+
+    assert [upload["version"] for upload in uploads] == [1, 2, 2]
+    assert uploads[1]["bundle_id"] == uploads[2]["bundle_id"]
+    bundle_id = uploads[0]["bundle_id"]
+    assert registry.resolve("promo") == uploads[1]["bundle_id"]
+    assert registry.resolve("promo@1") == bundle_id
+
+    response = await client.get(f"/api/v1/bundles/{bundle_id}/index.html")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    assert f'src="/api/v1/bundles/{bundle_id}/bundle.js"' in response.text
+
+    response = await client.post("/api/v1/render/still", json={"bundle_id": "promo@1", "composition": "Main"})
+    assert response.status_code == 200
+
+    response = await client.post("/api/v1/render/still", json={"bundle_id": "missing", "composition": "Main"})
+    assert response.status_code == 404
+
+    bad = await client.post("/api/v1/bundles", files={"file": ("x.zip", b"not a zip", "application/zip")})
+    assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bundle_public_path_rewrite_and_limits(client: AsyncClient, monkeypatch, tmp_path):
+    """Only the bundle's own URLs are rewritten, lazy chunks and oversized archives are refused"""
+    from app.config import settings
+
+    registry = BundleRegistry()
+    registry.root = tmp_path
+    monkeypatch.setattr("app.routes.bundles.bundle_registry", registry)
+
+    def upload(files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+        return client.post("/api/v1/bundles", files={"file": ("bundle.zip", buffer.getvalue(), "application/zip")})
+
+    index = INDEX_HTML.replace("</head>", '<link href="//fonts.example.com/font.css"></head>')
+    response = await upload({"index.html": index, "bundle.js": "", "public/lib.js": ""})
+    assert response.status_code == 200
+    html = (tmp_path / response.json()["bundle_id"] / "index.html").read_text()
+    assert 'href="//fonts.example.com/font.css"' in html
+    assert f'src="/api/v1/bundles/{response.json()["bundle_id"]}/bundle.js"' in html
+
+    response = await upload({"index.html": INDEX_HTML, "bundle.js": "", "42.bundle.js": ""})
+    assert response.status_code == 400
+    assert "42.bundle.js" in response.json()["detail"]
+
+    relative = INDEX_HTML.replace('"/"', '"./"').replace('src="/bundle.js"', 'src="./bundle.js"')
+    response = await upload({"index.html": relative, "bundle.js": "", "42.bundle.js": ""})
+    assert response.status_code == 200
+
+    monkeypatch.setattr(settings, "BUNDLE_UPLOAD_MAX_BYTES", 100)
+    response = await upload({"index.html": INDEX_HTML, "bundle.js": "x" * 200})
+    assert response.status_code == 413
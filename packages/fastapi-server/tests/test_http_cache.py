@@ -0,0 +1,196 @@
+"""HTTP disk cache tests (with a mocked origin)"""
+import asyncio
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.http_cache import HttpCache
+
+
+def make_cache(tmp_path, handler, max_bytes=0, revalidate_seconds=60) -> HttpCache:
+    cache = HttpCache("test_cache", str(tmp_path), max_bytes, revalidate_seconds)
+    cache._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_misses_are_coalesced_and_stale_entries_revalidated(tmp_path):
+    requests = []
+
+    async def handler(request: httpx.Request):
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"bundle", headers={"etag": '"v1"', "content-type": "text/javascript"})
+
+    cache = make_cache(tmp_path, handler, revalidate_seconds=0)
+    entries = await asyncio.gather(*(cache.get("https://cdn.test/site/bundle.js") for _ in range(5)))
+    assert len(requests) == 1
+    assert cache.blob_path(entries[0]).read_bytes() == b"bundle"
+
+    entry = await cache.get("https://cdn.test/site/bundle.js")
+    assert len(requests) == 2
+    assert requests[1].headers["if-none-match"] == '"v1"'
+    assert entry.blob == entries[0].blob
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted(tmp_path):
+    def handler(request: httpx.Request):
+        return httpx.Response(200, content=request.url.path.encode() * 10)
+
+    cache = make_cache(tmp_path, handler, max_bytes=120)
+    first = await cache.get("https://cdn.test/a.js")
+    await cache.get("https://cdn.test/b.js")
+    await cache.get("https://cdn.test/a.js")  # hit, a is now the most recently used
+    await cache.get("https://cdn.test/c.js")
+
+    assert set(cache.entries) == {"https://cdn.test/a.js", "https://cdn.test/c.js"}
+    assert cache.blob_path(first).exists()
+    assert (tmp_path / "index.json").exists()
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_control_sets_freshness_and_outcomes_are_counted(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        cache_control = "max-age=3600" if request.url.path == "/fresh.png" else "no-cache"
+        return httpx.Response(200, content=b"image", headers={"etag": '"v1"', "cache-control": cache_control})
+
+    # The cache default would revalidate at once, the origin says the image is fresh for an hour
+    cache = make_cache(tmp_path, handler, revalidate_seconds=0)
+    outcomes = {}
+    await cache.get("https://cdn.test/fresh.png", outcomes)
+    await cache.get("https://cdn.test/fresh.png", outcomes)
+    await cache.get("https://cdn.test/live.png", outcomes)
+    await cache.get("https://cdn.test/live.png", outcomes)
+
+    assert len(requests) == 3
+    assert requests[-1].headers["if-none-match"] == '"v1"'
+    assert outcomes == {"misses": 3, "hits": 1}
+    await cache.close()
+
+
+def test_media_urls_round_trip_through_proxy_paths():
+    from app.services.media_proxy import decode_url, encode_url, hit_ratio
+
+    url = "https://cdn.test/videos/clip.mp4?sig=a+b/c"
+    assert decode_url(encode_url(url)) == url
+    assert decode_url(encode_url("file:///etc/passwd")) is None
+    assert decode_url("not base64!") is None
+    assert hit_ratio({"hits": 3, "misses": 1}) == 0.75
+
+
+@pytest.mark.asyncio
+async def test_media_proxy_refuses_unknown_tokens_and_internal_hosts(monkeypatch, tmp_path):
+    from app.services.media_proxy import MediaProxy, MediaProxyError, encode_url
+
+    monkeypatch.setattr(settings, "MEDIA_PROXY_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "MEDIA_PROXY_HOSTS", "cdn.test")
+    proxy = MediaProxy()
+    session = proxy.open_session({})
+
+    for token, url, code in (
+        ("unknown", "https://cdn.test/a.png", 404),
+        (session["token"], "http://169.254.169.254/latest/meta-data/", 403),
+        (session["token"], "https://other.test/a.png", 403),
+    ):
+        with pytest.raises(MediaProxyError) as error:
+            await proxy.fetch(token, encode_url(url))
+        assert error.value.status_code == code
+    await proxy.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_no_store_responses_are_streamed_through(tmp_path):
+    from app.services.http_cache import Uncacheable
+
+    requests = []
+
+    async def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, stream=httpx.ByteStream(b"secret"), headers={"cache-control": "private, max-age=60"})
+
+    cache = make_cache(tmp_path, handler)
+    for _ in range(2):
+        with pytest.raises(Uncacheable):
+            await cache.get("https://cdn.test/me.png")
+    assert len(requests) == 1
+    assert cache.entries == {}
+    assert list(cache.blob_dir.iterdir()) == []
+
+    response = await cache.stream("https://cdn.test/me.png")
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    await response.background()
+    assert body == b"secret"
+    assert response.headers["cache-control"] == "private, max-age=60"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_coalesced_fetch(tmp_path):
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, content=b"clip")
+
+    cache = make_cache(tmp_path, handler)
+    owner = asyncio.create_task(cache.get("https://cdn.test/clip.mp4"))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(cache.get("https://cdn.test/clip.mp4"))
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    entry = await follower
+    assert cache.blob_path(entry).read_bytes() == b"clip"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_hosts_resolving_to_internal_addresses_are_refused(monkeypatch, tmp_path):
+    from app.services import http_cache
+    from app.services.http_cache import UpstreamError, is_internal_host
+
+    assert is_internal_host("metadata.google.internal")
+    assert is_internal_host("db.corp.internal")
+    assert not is_internal_host("cdn.test")
+
+    async def resolve(host, port):
+        return {"cdn.test": ["93.184.216.34"], "db.cdn.test": ["10.0.0.5"]}[host]
+
+    monkeypatch.setattr(http_cache, "resolve_addresses", resolve)
+    cache = HttpCache("test_cache", str(tmp_path), 0, 60, url_filter=lambda url: True)
+    await cache._check_request(httpx.Request("GET", "https://cdn.test/a.png"))
+    with pytest.raises(UpstreamError) as error:
+        await cache._check_request(httpx.Request("GET", "https://db.cdn.test/a.png"))
+    assert error.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_bundle_mirror_skips_root_relative_bundles_and_internal_hosts(monkeypatch, tmp_path):
+    from app.services.bundle_mirror import BundleMirror
+
+    pages = {
+        "/default/index.html": b'<script>window.remotion_publicPath = "/";</script><script src="/bundle.js"></script>',
+        "/site/index.html": b'<script>window.remotion_publicPath = "./";</script>'
+                            b'<script src="./bundle.js"></script><link href="//fonts.test/a.css">',
+    }
+
+    def handler(request: httpx.Request):
+        return httpx.Response(200, content=pages[request.url.path], headers={"content-type": "text/html"})
+
+    monkeypatch.setattr(settings, "BUNDLE_MIRROR_ENABLED", True)
+    monkeypatch.setattr(settings, "BUNDLE_MIRROR_DIR", str(tmp_path))
+    mirror = BundleMirror()
+    mirror.cache._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Remotion's default public path "/" would resolve against this server
+    assert await mirror.local_url("https://cdn.test/default/") == "https://cdn.test/default/"
+    assert (await mirror.local_url("https://cdn.test/site/")).startswith(mirror.local_base)
+    assert await mirror.local_url("http://169.254.169.254/latest/") == "http://169.254.169.254/latest/"
+    assert list(mirror.origins.values()) == ["https://cdn.test/site/"]
+    await mirror.cache.close()
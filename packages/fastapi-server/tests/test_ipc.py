@@ -0,0 +1,43 @@
+"""Worker protocol framing tests"""
+import asyncio
+import pytest
+
+from app.services.ipc import CODEC_JSON, CODEC_MSGPACK, FrameError, encode_frame, msgpack, read_frame
+
+
+def reader_for(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec", [
+    CODEC_JSON,
+    pytest.param(CODEC_MSGPACK, marks=pytest.mark.skipif(msgpack is None, reason="msgpack not installed")),
+])
+async def test_frames_round_trip(codec):
+    messages = [
+        {"id": 1, "type": "progress", "data": {"progress": 0.25, "renderedFrames": 10}},
+        {"id": 1, "type": "info", "message": "line\nwith newline and ünicode"},
+    ]
+    reader = reader_for(b"".join(encode_frame(m, codec) for m in messages))
+
+    assert await read_frame(reader) == messages[0]
+    assert await read_frame(reader) == messages[1]
+    assert await read_frame(reader) is None
+
+
+@pytest.mark.asyncio
+async def test_truncated_frame_is_end_of_stream():
+    frame = encode_frame({"type": "complete"})
+    assert await read_frame(reader_for(frame[:-2])) is None
+
+
+@pytest.mark.asyncio
+async def test_unknown_codec_is_rejected():
+    frame = bytearray(encode_frame({"type": "complete"}))
+    frame[4] = ord("x")
+    with pytest.raises(FrameError):
+        await read_frame(reader_for(bytes(frame)))
@@ -0,0 +1,61 @@
+"""Process isolation tests"""
+import os
+import signal
+import subprocess
+import time
+from types import SimpleNamespace
+import pytest
+
+from app.services import renderer as renderer_module
+from app.services.isolation import IsolationPolicy, ProcessIsolation, parse_cpus, parse_ionice
+from app.services.process_tree import process_tree, signal_process_tree
+
+
+def test_policy_is_applied_to_the_whole_tree():
+    """Nice level and CPU affinity reach the descendants of the worker"""
+    cpu = min(os.sched_getaffinity(0))
+    isolation = ProcessIsolation()
+    isolation.policies["batch"] = IsolationPolicy(
+        name="batch", nice=os.getpriority(os.PRIO_PROCESS, 0) + 5,
+        ioprio=parse_ionice("idle"), cpus={cpu}, cpu_weight=50
+    )
+
+    parent = subprocess.Popen(["sh", "-c", "sleep 30 & wait"])
+    try:
+        time.sleep(0.2)
+        assert isolation.apply(parent.pid, "batch")
+        pids = process_tree(parent.pid)
+        assert len(pids) == 2
+        for pid in pids:
+            assert os.getpriority(os.PRIO_PROCESS, pid) == isolation.policies["batch"].nice
+            assert os.sched_getaffinity(pid) == {cpu}
+    finally:
+        signal_process_tree(parent.pid, signal.SIGKILL)
+        parent.wait()
+
+
+def test_parse_cpus_and_ionice():
+    """CPU lists and I/O priorities use the taskset/ionice notation"""
+    assert parse_cpus("0-2,5") == {0, 1, 2, 5}
+    assert parse_cpus("") == set()
+    assert parse_ionice("best-effort:4") == (2 << 13) | 4
+    assert parse_ionice("") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("first_applied", [True, False])
+async def test_worker_that_cannot_leave_its_class_is_retired(monkeypatch, first_applied):
+    """A failed apply after an earlier one, even a partial one, replaces the worker after the job"""
+    monkeypatch.setattr(renderer_module.isolation, "enabled", True)
+    # Partial failures, e.g. a cgroup that is not delegated, still raise the nice level
+    results = iter([first_applied, False])
+    monkeypatch.setattr(renderer_module.isolation, "apply", lambda pid, priority_class: next(results))
+    worker = SimpleNamespace(id=1, pid=os.getpid(), priority_class=None, retire=False)
+    renderer = renderer_module.NodeRenderer()
+
+    await renderer._isolate(worker, "batch")
+    assert worker.priority_class == "batch" and not worker.retire
+    await renderer._isolate(worker, "batch")
+    assert not worker.retire
+    await renderer._isolate(worker, "interactive")
+    assert worker.retire
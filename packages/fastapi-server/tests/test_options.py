@@ -0,0 +1,25 @@
+"""Renderer option mapping tests"""
+from app.models.render import RenderMediaRequest
+from app.services.options import to_node_options
+
+
+def test_known_fields_are_renamed_and_props_untouched():
+    """Option names come from serialization_alias, user props keep their keys and identity"""
+    request = RenderMediaRequest(
+        serve_url="https://example.com/bundle",
+        composition="MyVideo",
+        input_props={"user_name": {"first_name": "Ada"}},
+        chromium_options={"disable_web_security": True},
+        timeout_ms=1000,
+    )
+
+    options = to_node_options(request, exclude=("timeout_ms",))
+
+    assert options["serveUrl"] == "https://example.com/bundle"
+    assert options["codec"] == "h264"
+    assert options["imageFormat"] == "jpeg"
+    assert options["chromiumOptions"] == {"disableWebSecurity": True}
+    assert options["inputProps"] is request.input_props
+    assert options["inputProps"] == {"user_name": {"first_name": "Ada"}}
+    assert "timeout_ms" not in options
+    assert "frameRange" not in options
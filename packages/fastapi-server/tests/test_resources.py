@@ -0,0 +1,40 @@
+"""Process tree resource accounting tests"""
+import signal
+import subprocess
+import sys
+import time
+
+from app.services.process_tree import signal_process_tree
+from app.services.resources import ResourceTracker, UsageByComposition
+
+
+BUSY_CHILD = r'''
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; data = bytearray(64 * 1024 * 1024); time.sleep(30)"])
+end = time.time() + 0.5
+while time.time() < end:
+    pass
+child.wait()
+'''
+
+
+def test_tracker_accounts_for_the_whole_tree():
+    """CPU time and memory of descendants are included in the job's usage"""
+    parent = subprocess.Popen([sys.executable, "-c", BUSY_CHILD])
+    try:
+        tracker = ResourceTracker(parent.pid)
+        time.sleep(1.0)
+        usage = tracker.sample()
+    finally:
+        signal_process_tree(parent.pid, signal.SIGKILL)
+        parent.wait()
+
+    assert usage.cpu_seconds >= 0.2
+    assert usage.peak_rss_bytes >= 64 * 1024 * 1024
+    assert usage.max_processes == 2
+    assert usage.max_threads >= 2
+
+    by_composition = UsageByComposition()
+    by_composition.record("Main", usage)
+    by_composition.record("Main", usage)
+    assert by_composition.report()["Main"]["jobs"] == 2
@@ -0,0 +1,49 @@
+"""Priority scheduling tests"""
+import asyncio
+import random
+import pytest
+
+from app.config import settings
+from app.services.queue import JOB_TYPES, JobStatus, RenderQueue
+from app.services.scheduler import IndexedHeap, resolve_priority
+
+
+def test_indexed_heap_pops_in_key_order_after_removals():
+    heap = IndexedHeap()
+    keys = {f"job-{i}": random.random() for i in range(200)}
+    for item, key in keys.items():
+        heap.push(item, key)
+    for item in random.sample(sorted(keys), 50):
+        assert heap.remove(item)
+        del keys[item]
+    assert not heap.remove("job-missing")
+
+    popped = [heap.pop() for _ in range(len(heap))]
+    assert popped == sorted(keys, key=keys.get)
+
+
+@pytest.mark.asyncio
+async def test_queue_orders_by_priority_with_aging(monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_AGING_SECONDS", 0.02)
+    queue = RenderQueue(max_concurrent=1)
+    old_batch = await queue.enqueue("media", {"composition": "A"}, priority=5)
+    # Waiting longer than 5 levels of aging puts it ahead of newer urgent jobs
+    await asyncio.sleep(0.15)
+    batch = await queue.enqueue("media", {"composition": "B"}, priority=5)
+    cancelled = await queue.enqueue("still", {"composition": "C"}, priority=0)
+    urgent = await queue.enqueue("still", {"composition": "D"}, priority=0)
+
+    assert await queue.cancel(cancelled)
+    assert queue.get_job(cancelled).status == JobStatus.CANCELLED
+    assert queue.queue.qsize() == 3
+    assert [await queue.queue.get(JOB_TYPES) for _ in range(3)] == [old_batch, urgent, batch]
+
+
+def test_priority_is_capped_per_api_key(monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_PRIORITY_KEY_CAPS", "partner:0,free:7")
+    monkeypatch.setattr(settings, "QUEUE_PRIORITY_CAP", 3)
+
+    assert resolve_priority(0, "batch", "partner") == 0
+    assert resolve_priority(0, "batch", "free") == 7
+    assert resolve_priority(0, "batch", None) == 3
+    assert resolve_priority(None, "batch", None) == settings.QUEUE_PRIORITY_BATCH
@@ -0,0 +1,39 @@
+"""Scratch space tests"""
+from app.services.scratch import ScratchSpace
+from app.services.storage import storage
+
+
+def test_jobs_fall_back_to_disk_when_scratch_is_full(tmp_path):
+    """Reservations beyond SCRATCH_MAX_BYTES are placed on disk, outputs are moved out"""
+    space = ScratchSpace()
+    space.root = tmp_path / "ram"
+    space.fallback_root = tmp_path / "disk"
+    space.max_bytes = 100 * 1024 ** 2
+
+    first = space.allocate("first", "still")
+    second = space.allocate("second", "still")
+    assert first.in_memory and first.path.parent == space.root
+    assert not second.in_memory and second.path.parent == space.fallback_root
+
+    (first.path / "out.png").write_text("frame")
+    storage.store_output(str(first.path / "out.png"), str(tmp_path / "outputs" / "out.png"))
+    assert (tmp_path / "outputs" / "out.png").read_text() == "frame"
+
+    space.release(first)
+    space.release(second)
+    assert not first.path.exists() and not second.path.exists()
+    assert space.reserved == 0
+
+
+def test_clear_only_removes_job_directories(tmp_path):
+    """Other files in a shared SCRATCH_DIR such as /dev/shm survive a restart"""
+    space = ScratchSpace()
+    space.root = tmp_path / "ram"
+    space.fallback_root = tmp_path / "disk"
+    space.max_bytes = 0
+
+    leftover = space.allocate("leftover", "still")
+    (space.root / "other-service").mkdir()
+    space.clear()
+    assert not leftover.path.exists()
+    assert (space.root / "other-service").is_dir()
@@ -0,0 +1,418 @@
+"""Node worker pool tests (using a Python stand-in for the Node worker)"""
+import asyncio
+import sys
+import time
+import pytest
+from pathlib import Path
+
+from app.config import settings
+from app.services.composition_cache import CompositionCache
+from app.services.metrics import metrics
+from app.services.queue import JobStatus, RenderQueue
+from app.services.renderer import NodeRenderer, RenderContext
+from app.services.worker_pool import WorkerPool
+
+
+FAKE_WORKER = r'''
+import json, struct, sys
+
+def send(message):
+    payload = json.dumps(message).encode()
+    sys.stdout.buffer.write(struct.pack(">IB", len(payload), ord("j")) + payload)
+    sys.stdout.buffer.flush()
+
+def requests():
+    while True:
+        header = sys.stdin.buffer.read(5)
+        if len(header) < 5:
+            return
+        length, _ = struct.unpack(">IB", header)
+        yield json.loads(sys.stdin.buffer.read(length))
+
+send({"type": "ready"})
+jobs = 0
+for request in requests():
+    rid = request["id"]
+    command = request["command"]
+    if command == "ping":
+        send({"id": rid, "type": "pong"})
+    elif command == "crash":
+        sys.exit(1)
+    elif command == "fail":
+        # More than a pipe buffer worth of stderr before answering
+        for i in range(5000):
+            sys.stderr.write("chrome log line %d\n" % i)
+        sys.stderr.flush()
+        send({"id": rid, "type": "error", "message": "boom"})
+    elif request["options"].get("composition") == "Slow":
+        # Simulate Chrome: a child in its own process group, then hang
+        import subprocess
+        child = subprocess.Popen(["sleep", "60"], start_new_session=True)
+        sys.stderr.write("child pid %d\n" % child.pid)
+        sys.stderr.flush()
+        child.wait()
+    elif command == "getCompositions":
+        send({"id": rid, "type": "compositions", "data": [{"id": "Main"}]})
+    elif command == "combineSegments":
+        with open(request["options"]["outputPath"], "w") as output:
+            for name in request["options"]["videoFiles"]:
+                output.write(open(name).read())
+        send({"id": rid, "type": "complete"})
+    else:
+        if "serveUrl" in request["options"] and "compositionMetadata" not in request["options"]:
+            send({"id": rid, "type": "composition", "data": {"id": request["options"]["composition"], "fps": 30, "durationInFrames": 90}})
+        if "outputPath" in request["options"]:
+            open(request["options"]["outputPath"], "w").write("%s\n" % request["options"].get("frameRange", "output"))
+        if request["options"].get("profile"):
+            for name in ("renderer.cpuprofile", "chrome-trace.json"):
+                open(request["options"]["scratchDir"] + "/" + name, "w").write("{}")
+        send({"id": rid, "type": "progress", "data": {"progress": 0.5}})
+        send({"id": rid, "type": "complete"})
+    if command != "ping":
+        jobs += 1
+        send({"type": "browser", "data": {"open": True, "launches": 1, "reuses": jobs - 1, "evictions": 0, "crashes": 0}})
+'''
+
+
+def is_running(pid: int) -> bool:
+    """True if the process exists and is not a zombie"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def make_pool(size: int = 1, max_jobs: int = 10) -> WorkerPool:
+    return WorkerPool(size=size, max_jobs=max_jobs, command=[sys.executable, "-c", FAKE_WORKER], codec="json")
+
+
+async def wait_for_status(job, *statuses, timeout: float = 5.0):
+    """Poll a job until it reaches one of the statuses (COMPLETED or FAILED by default)"""
+    statuses = statuses or (JobStatus.COMPLETED, JobStatus.FAILED)
+    deadline = time.monotonic() + timeout
+    while job.status not in statuses and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return job
+
+
+@pytest.fixture
+async def make_queue():
+    """Start a RenderQueue on a stand-in worker pool, both stopped after the test"""
+    started = []
+
+    async def factory(size: int = 1, **kwargs):
+        pool = make_pool(size=size)
+        queue = RenderQueue(**kwargs)
+        queue.renderer = NodeRenderer(pool)
+        await queue.start()
+        started.append((queue, pool))
+        return queue, pool
+
+    yield factory
+    for queue, pool in started:
+        await queue.stop()
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_is_reused_between_jobs():
+    pool = make_pool()
+    renderer = NodeRenderer(pool)
+    try:
+        progress = []
+
+        async def on_progress(data):
+            progress.append(data["progress"])
+
+        await renderer.render_still({"composition": "Main"}, on_progress)
+        pid = pool.stats()["workers"][0]["pid"]
+        comps = await renderer.get_compositions({})
+
+        assert progress == [0.5]
+        assert comps == [{"id": "Main"}]
+        assert pool.stats()["workers"][0]["pid"] == pid
+        assert pool.stats()["workers"][0]["jobs_handled"] == 2
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_crashed_worker_is_replaced():
+    pool = make_pool()
+    renderer = NodeRenderer(pool)
+    try:
+        with pytest.raises(RuntimeError):
+            await renderer._execute({"command": "crash", "options": {}})
+
+        await renderer.render_still({})
+        assert pool.crashes == 1
+        assert pool.stats()["workers"][0]["alive"]
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_is_recycled_after_max_jobs():
+    pool = make_pool(max_jobs=2)
+    renderer = NodeRenderer(pool)
+    try:
+        for _ in range(3):
+            await renderer.render_still({})
+
+        assert pool.recycled == 1
+        assert pool.stats()["workers"][0]["jobs_handled"] == 1
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_browser_stats_survive_recycling():
+    pool = make_pool(max_jobs=2)
+    renderer = NodeRenderer(pool)
+    try:
+        for _ in range(3):
+            await renderer.render_still({})
+            await asyncio.sleep(0.05)
+
+        browsers = pool.stats()["browsers"]
+        assert browsers["launches"] == 2
+        assert browsers["reuses"] == 1
+        assert browsers["open"] == 1
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_stderr_is_drained_into_job_log():
+    pool = make_pool()
+    renderer = NodeRenderer(pool)
+    try:
+        context = RenderContext()
+        log = context.log
+        with pytest.raises(RuntimeError) as excinfo:
+            await renderer._execute({"command": "fail", "options": {}}, None, context)
+
+        assert len(log) == log.maxlen
+        assert log[-1] == "chrome log line 4999"
+        assert "boom" in str(excinfo.value)
+        assert "chrome log line 4999" in str(excinfo.value)
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_process_tree_and_frees_slot(make_queue):
+    queue, pool = await make_queue(max_concurrent=1)
+    job_id = await queue.enqueue("still", {"composition": "Slow"})
+    job = queue.get_job(job_id)
+
+    child_pid = None
+    for _ in range(100):
+        lines = [line for line in job.logs if line.startswith("child pid")]
+        if lines:
+            child_pid = int(lines[0].split()[-1])
+            break
+        await asyncio.sleep(0.05)
+    assert child_pid is not None
+
+    assert await queue.cancel(job_id)
+    await wait_for_status(job, JobStatus.CANCELLED)
+
+    assert job.status == JobStatus.CANCELLED
+    assert metrics.histograms["cancel_to_slot_free_seconds"].count >= 1
+    await asyncio.sleep(0.1)
+    assert not is_running(child_pid)
+
+    # The slot is free again and the pool replaced the killed worker
+    other = await wait_for_status(queue.get_job(await queue.enqueue("still", {"composition": "Main"})))
+    assert other.status == JobStatus.COMPLETED
+    assert pool.crashes == 0
+
+
+@pytest.mark.asyncio
+async def test_watchdog_fails_stalled_job(monkeypatch, make_queue):
+    monkeypatch.setattr(settings, "WATCHDOG_INTERVAL_SECONDS", 0.05)
+    # Two queue workers sharing one Node worker: the second job waits for it
+    queue, _ = await make_queue(max_concurrent=2)
+    job = queue.get_job(await queue.enqueue("still", {"composition": "Slow"}, stall_timeout_ms=500))
+    waiting = queue.get_job(await queue.enqueue("still", {"composition": "Main"}, stall_timeout_ms=200, timeout_ms=200))
+    await wait_for_status(waiting)
+
+    assert job.status == JobStatus.FAILED
+    assert "no progress for 500 ms" in job.error
+    # The wait for the worker counted towards neither of its deadlines
+    assert waiting.status == JobStatus.COMPLETED, waiting.error
+
+
+@pytest.mark.asyncio
+async def test_profile_files_are_linked_from_job_status(make_queue):
+    queue, _ = await make_queue(max_concurrent=1)
+    job_id = await queue.enqueue("still", {"composition": "Main", "profile": True})
+    job = await wait_for_status(queue.get_job(job_id))
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.options["profileTraceFrames"] == settings.PROFILE_TRACE_FRAMES
+    profile = job.to_dict()["profile"]
+    assert profile["cpuprofile"].endswith(f"/outputs/{job_id}.cpuprofile")
+    assert profile["trace"].endswith(f"/outputs/{job_id}.trace.json")
+
+
+@pytest.mark.asyncio
+async def test_composition_metadata_is_reused(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "COMPOSITION_CACHE_DIR", str(tmp_path))
+    cache = CompositionCache()
+    monkeypatch.setattr("app.services.renderer.composition_cache", cache)
+    pool = make_pool()
+    renderer = NodeRenderer(pool)
+    try:
+        options = {"serveUrl": "https://example.com/site/", "composition": "Main", "inputProps": {"a": 1}}
+        first, second = RenderContext(), RenderContext()
+        await renderer.render_still(dict(options), context=first)
+        hits = metrics.counters.get("composition_cache_hits", 0)
+        await renderer.render_still(dict(options), context=second)
+
+        assert first.composition == {"id": "Main", "fps": 30, "durationInFrames": 90}
+        # The second render received the metadata and did not select the composition again
+        assert second.composition == first.composition
+        assert metrics.counters["composition_cache_hits"] == hits + 1
+        assert list(tmp_path.glob("*.json"))
+        # Persisted entries are found by a new instance
+        assert CompositionCache().get(next(iter(cache.entries))) == first.composition
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_identical_render_is_answered_from_result_cache(monkeypatch, tmp_path, make_queue):
+    from app.services.bundles import bundle_registry
+    from app.services.result_cache import ResultCache
+
+    cache = ResultCache("result_cache", str(tmp_path / "results"), 0, 0)
+    monkeypatch.setattr("app.services.queue.result_cache", cache)
+    queue, _ = await make_queue(max_concurrent=1)
+    options = {"serveUrl": bundle_registry.serve_url("0" * 64), "composition": "Main", "inputProps": {"a": 1}}
+
+    async def render(name: str, **overrides):
+        job_id = await queue.enqueue("still", {**options, **overrides, "output_path": str(tmp_path / name)})
+        return await wait_for_status(queue.get_job(job_id))
+
+    await render("first.png")
+
+    second = queue.get_job(await queue.enqueue("still", {**options, "output_path": str(tmp_path / "second.png")}))
+    assert second.status == JobStatus.COMPLETED
+    assert second.cached
+    # Same file, linked to the path the second job asked for
+    assert (tmp_path / "second.png").stat().st_ino == (tmp_path / "first.png").stat().st_ino
+
+    third = queue.get_job(await queue.enqueue("still", {**options, "inputProps": {"a": 2}}))
+    assert not third.cached
+
+    # A serve_url may be redeployed, its renders are not cached
+    site = await render("site.png", serveUrl="https://example.com/site/")
+    assert not (await render("site-again.png", serveUrl="https://example.com/site/")).cached
+    # Nor stored, where it would only take space from usable entries
+    assert site.result_key and site.result_key not in cache.entries
+
+
+@pytest.mark.asyncio
+async def test_identical_jobs_share_one_render(tmp_path, make_queue):
+    queue, pool = await make_queue(max_concurrent=1)
+    options = {"composition": "Main", "inputProps": {"a": 1}}
+    first = queue.get_job(await queue.enqueue("still", {**options, "output_path": str(tmp_path / "a.png")}))
+    second = queue.get_job(await queue.enqueue("still", {**options, "output_path": str(tmp_path / "b.png")}))
+    assert second.leader_id == first.id
+    await wait_for_status(second)
+
+    assert first.status == second.status == JobStatus.COMPLETED
+    assert pool.stats()["workers"][0]["jobs_handled"] == 1
+    assert (tmp_path / "b.png").stat().st_ino == (tmp_path / "a.png").stat().st_ino
+
+
+@pytest.mark.asyncio
+async def test_shared_render_runs_until_every_subscriber_cancels(make_queue):
+    queue, _ = await make_queue(max_concurrent=1)
+    first = queue.get_job(await queue.enqueue("still", {"composition": "Slow"}))
+    second = queue.get_job(await queue.enqueue("still", {"composition": "Slow"}))
+    for _ in range(100):
+        if first.context.worker is not None:
+            break
+        await asyncio.sleep(0.05)
+
+    assert await queue.cancel(first.id)
+    assert first.to_dict()["status"] == JobStatus.CANCELLED
+    await asyncio.sleep(0.1)
+    assert not first.task.done()
+    assert second.status == JobStatus.IN_PROGRESS
+
+    assert await queue.cancel(second.id)
+    await asyncio.wait_for(asyncio.wait([first.task]), timeout=10)
+    assert first.status == second.status == JobStatus.CANCELLED
+
+
+@pytest.mark.asyncio
+async def test_segmented_render_only_rerenders_changed_segments(monkeypatch, tmp_path, make_queue):
+    from app.services.bundles import bundle_registry
+    from app.services.result_cache import ResultCache
+
+    monkeypatch.setattr("app.services.segments.segment_cache", ResultCache("segment_cache", str(tmp_path / "segments"), 0, 0))
+    queue, _ = await make_queue(max_concurrent=1)
+
+    async def render(outro: str, serve_url: str = bundle_registry.serve_url("0" * 64)) -> str:
+        job = await wait_for_status(queue.get_job(await queue.enqueue("media", {
+            "serveUrl": serve_url,
+            "composition": "Main",
+            "inputProps": {"title": "Hello", "outro": outro},
+            "muted": True,
+            "segmentFrames": 30,
+            "propFrameRanges": {"outro": [60, 89]},
+            "output_path": str(tmp_path / f"{outro}.mp4"),
+        })))
+        assert job.status == JobStatus.COMPLETED, job.error
+        return open(job.output_path).read()
+
+    rendered = metrics.counters.get("segments_rendered", 0)
+    assert await render("Bye") == "[0, 29]\n[30, 59]\n[60, 89]\n"
+    assert metrics.counters["segments_rendered"] == rendered + 3
+
+    reused = metrics.counters.get("segments_reused", 0)
+    await render("Ciao")
+    assert metrics.counters["segments_rendered"] == rendered + 4
+    assert metrics.counters["segments_reused"] == reused + 2
+
+    # A serve_url may be redeployed between renders, its segments are not reused
+    await render("Hola", "https://example.com/site/")
+    await render("Hola", "https://example.com/site/")
+    assert metrics.counters["segments_rendered"] == rendered + 10
+    assert metrics.counters["segments_reused"] == reused + 2
+
+
+@pytest.mark.asyncio
+async def test_stills_are_not_held_up_by_videos(tmp_path, make_queue):
+    queue, _ = await make_queue(size=2, pools={"still": 1, "media": 1})
+    video = queue.get_job(await queue.enqueue("media", {"composition": "Slow"}))
+    queued_video = queue.get_job(await queue.enqueue("media", {"composition": "Main", "output_path": str(tmp_path / "a.mp4")}))
+    still = await wait_for_status(queue.get_job(await queue.enqueue("still", {"composition": "Main", "output_path": str(tmp_path / "a.png")})))
+
+    assert still.status == JobStatus.COMPLETED
+    assert video.status == JobStatus.IN_PROGRESS
+    assert queued_video.status == JobStatus.QUEUED
+    assert metrics.histograms["queue_wait_seconds_still"].count >= 1
+    await queue.cancel(video.id)
+
+
+@pytest.mark.asyncio
+async def test_worker_falls_back_to_json_when_node_lacks_msgpack():
+    from app.services.ipc import CODEC_JSON, CODEC_MSGPACK
+    from app.services.worker_pool import NodeWorker
+
+    worker = NodeWorker(1, [sys.executable, "-c", FAKE_WORKER], Path.cwd(), codec="json")
+    # As if msgpack were installed here
+    worker.codec = CODEC_MSGPACK
+    await worker.start()
+    try:
+        # The stand-in reports no codec in its ready frame, as a Node worker without @msgpack/msgpack
+        assert worker.codec == CODEC_JSON
+        assert await worker.ping()
+    finally:
+        await worker.stop()